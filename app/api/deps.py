@@ -2,27 +2,83 @@
 Dependencies для API эндпоинтов.
 """
 
-from typing import Optional, Annotated
-from fastapi import Depends, HTTPException, status
+from typing import AsyncGenerator, List, Optional, Annotated, Tuple
+from fastapi import Depends, HTTPException, Query, status
+from fastapi.requests import HTTPConnection
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.db.database import get_db
 from app.core.security import decode_access_token
 from app.crud.user import user as user_crud
+from app.db.database import finish_session, track_request_session
+from app.db.models import User
+from app.db.sharding import shards
+from app.core.config import settings
+from app.core.logs import set_user_id
+from app.schemas.note import NOTE_FIELDS, normalize_tag
 
 security = HTTPBearer()
 
 
+def get_token_payload(connection: HTTPConnection) -> Optional[dict]:
+    """
+    Данные JWT токена запроса (декодируются один раз за запрос).
+
+    Токен берется из заголовка Authorization или из query-параметра token
+    (WebSocket).
+
+    Args:
+        connection: Запрос или WebSocket
+
+    Returns:
+        Optional[dict]: Данные из токена или None если токена нет или он
+            невалидный
+    """
+    if not hasattr(connection.state, "token_payload"):
+        scheme, _, token = connection.headers.get("Authorization", "").partition(" ")
+        if scheme.lower() != "bearer":
+            token = connection.query_params.get("token", "")
+        connection.state.token_payload = decode_access_token(token) if token else None
+
+    return connection.state.token_payload
+
+
+async def get_user_db(
+    connection: HTTPConnection,
+) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependency для получения сессии шарда текущего пользователя.
+
+    При невалидном токене выдается сессия шарда по умолчанию, а ошибку
+    401 возвращает get_current_user. Сессия ленивая, как в get_db.
+
+    Yields:
+        AsyncSession: Асинхронная сессия шарда пользователя
+    """
+    shard = None
+    payload = get_token_payload(connection)
+    if payload is not None and payload.get("user_id") is not None:
+        shard = await shards.resolve(payload["user_id"])
+
+    async with shards.session(shard or shards.default) as session:
+        track_request_session(connection, session)
+        try:
+            yield session
+            await finish_session(session)
+        except Exception:
+            await session.rollback()
+            raise
+
+
 async def get_current_user(
     credentials: Annotated[HTTPAuthorizationCredentials, Depends(security)],
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_user_db)],
 ) -> Optional[dict]:
     """
     Получает текущего аутентифицированного пользователя из JWT токена.
 
     Args:
         credentials: HTTP Bearer токен
-        db: Сессия БД
+        db: Сессия шарда пользователя
 
     Returns:
         Optional[dict]: Данные пользователя
@@ -30,22 +86,131 @@ async def get_current_user(
     Raises:
         HTTPException: Если токен невалидный или пользователь не найден
     """
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+    db_user = await get_user_by_token(db, credentials.credentials)
+    if db_user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    set_user_id(db_user.id)
+
+    return db_user
+
+
+async def get_current_admin(
+    current_user: Annotated[User, Depends(get_current_user)],
+) -> User:
+    """
+    Проверяет, что текущий пользователь - администратор (ADMIN_EMAILS).
+
+    Args:
+        current_user: Текущий пользователь
+
+    Returns:
+        User: Администратор
+
+    Raises:
+        HTTPException: Если пользователь не администратор
+    """
+    if current_user.email not in settings.ADMIN_EMAILS:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required"
+        )
+
+    return current_user
+
+
+async def get_user_by_token(db: AsyncSession, token: str) -> Optional[User]:
+    """
+    Находит пользователя по JWT токену.
+
+    Используется и там, где заголовок Authorization недоступен
+    (например, WebSocket из браузера передает токен в query).
+
+    Args:
+        db: Сессия БД
+        token: JWT токен
+
+    Returns:
+        Optional[User]: Пользователь или None если токен невалидный
+    """
     # Декодируем токен
-    payload = decode_access_token(credentials.credentials)
+    payload = decode_access_token(token)
     if payload is None:
-        raise credentials_exception
+        return None
     # Получаем ID пользователя из токена
     user_id: Optional[int] = payload.get("user_id")
     if user_id is None:
-        raise credentials_exception
+        return None
     # Ищем пользователя в БД
-    db_user = await user_crud.get_by_id(db, user_id=user_id)
-    if db_user is None:
-        raise credentials_exception
+    return await user_crud.get_by_id(db, user_id=user_id)
 
-    return db_user
+
+def get_note_fields(
+    fields: Annotated[
+        Optional[str],
+        Query(description="Поля ответа через запятую, например id,title"),
+    ] = None,
+) -> Optional[Tuple[str, ...]]:
+    """
+    Разбирает параметр fields для выборки подмножества полей заметки.
+
+    Args:
+        fields: Список полей через запятую
+
+    Returns:
+        Optional[Tuple[str, ...]]: Поля в каноническом порядке или None
+
+    Raises:
+        HTTPException: Если запрошены неизвестные поля
+    """
+    if fields is None:
+        return None
+
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = requested - set(NOTE_FIELDS)
+
+    if not requested or unknown:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}",
+        )
+    # Канонический порядок: одинаковые наборы полей делят кеш схем
+    return tuple(field for field in NOTE_FIELDS if field in requested)
+
+
+def get_note_tags(
+    tag: Annotated[
+        Optional[List[str]],
+        Query(description="Фильтр по тегам, например ?tag=work&tag=urgent"),
+    ] = None,
+) -> Optional[Tuple[str, ...]]:
+    """
+    Разбирает параметры tag для фильтрации заметок.
+
+    Args:
+        tag: Теги из query
+
+    Returns:
+        Optional[Tuple[str, ...]]: Различные нормализованные теги или None
+
+    Raises:
+        HTTPException: Если тег невалидный или тегов слишком много
+    """
+    if not tag:
+        return None
+
+    try:
+        tags = tuple(dict.fromkeys(normalize_tag(value) for value in tag))
+    except ValueError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(exc)
+        )
+
+    if len(tags) > settings.NOTE_TAG_FILTER_MAX:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"At most {settings.NOTE_TAG_FILTER_MAX} tags per filter",
+        )
+    return tags
@@ -0,0 +1,66 @@
+"""
+Классы маршрутов API.
+"""
+
+from typing import Callable, Coroutine, Any
+
+from fastapi import HTTPException
+from fastapi.routing import APIRoute
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app.api.deps import get_token_payload
+from app.core.admission import AdmissionRejected, admission
+from app.core.config import settings
+from app.db.database import release_request_sessions
+
+# Методы, расходующие квоту изменений пользователя
+WRITE_METHODS = frozenset({"POST", "PUT", "PATCH", "DELETE"})
+
+
+class SessionRoute(APIRoute):
+    """
+    Маршрут, возвращающий соединения БД сразу после работы обработчика.
+
+    Teardown yield-зависимостей выполняется уже после отправки ответа,
+    поэтому без этого соединение занято на время передачи ответа клиенту.
+    Здесь сессии запроса завершаются (COMMIT при изменениях) после того,
+    как ответ сформирован, но до его отправки; ошибка коммита
+    превращается в обычный ответ 500, а не в оборванное соединение.
+
+    До вызова обработчика запрос проходит контроль нагрузки
+    (app/core/admission.py): отклоненный запрос получает 429/503,
+    не заняв соединение из пула.
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+
+        async def route_handler(request: Request) -> Response:
+            if not settings.ADMISSION_ENABLED:
+                response = await handler(request)
+                await release_request_sessions(request)
+                return response
+
+            payload = get_token_payload(request) or {}
+            try:
+                async with admission.admit(
+                    self.name,
+                    payload.get("user_id"),
+                    write=request.method in WRITE_METHODS,
+                ):
+                    response = await handler(request)
+                    await release_request_sessions(request)
+            except AdmissionRejected as rejected:
+                raise HTTPException(
+                    status_code=rejected.status_code,
+                    detail=(
+                        "Too many requests"
+                        if rejected.status_code == 429
+                        else "Service overloaded"
+                    ),
+                    headers={"Retry-After": str(rejected.retry_after)},
+                )
+            return response
+
+        return route_handler
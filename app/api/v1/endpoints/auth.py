@@ -7,13 +7,22 @@ from typing import Annotated
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.routing import SessionRoute
 from app.db.database import get_db
 from app.core.config import settings
-from app.core.security import verify_password, create_access_token
+from app.core.security import (
+    verify_password,
+    create_access_token,
+    password_needs_rehash,
+)
 from app.schemas.user import Token, UserCreate, UserResponse
 from app.crud.user import user as user_crud
+from app.crud.user_directory import user_directory as user_directory_crud
+from app.db.sharding import shards
+from app.services.jobs import audit_event, rehash_password
+from app.services.tasks import task_queue
 
-router = APIRouter()
+router = APIRouter(route_class=SessionRoute)
 
 
 @router.post(
@@ -25,9 +34,12 @@ async def signup(
     """
     Регистрация нового пользователя.
 
+    Пользователь регистрируется в глобальном каталоге основной БД
+    и создается на шарде, выбранном по email.
+
     Args:
         user_in: Данные пользователя
-        db: Сессия БД
+        db: Сессия основной БД
 
     Returns:
         dict: Созданный пользователь
@@ -41,8 +53,20 @@ async def signup(
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered"
         )
-    # Создаем пользователя
-    user = await user_crud.create(db, user_in=user_in)
+    # Создаем пользователя с глобальным ID на его шарде
+    entry = await user_directory_crud.create(db, email=user_in.email)
+    async with shards.use(entry.shard, db) as shard_db:
+        user = await user_crud.create(shard_db, user_in=user_in, user_id=entry.id)
+        try:
+            await db.commit()
+        except Exception:
+            # Пользователь на другом шарде уже закоммичен: без записи
+            # каталога его email нельзя было бы зарегистрировать снова
+            await db.rollback()
+            if shard_db is not db:
+                await user_crud.delete(shard_db, user)
+            raise
+    task_queue.enqueue(audit_event, "user.signup", user_id=user.id)
 
     return user
 
@@ -57,7 +81,7 @@ async def login(
 
     Args:
         form_data: Данные формы (username=email, password)
-        db: Сессия БД
+        db: Сессия основной БД (с каталогом пользователей)
 
     Returns:
         dict: JWT токен доступа
@@ -85,6 +109,9 @@ async def login(
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Inactive user"
         )
+    # Хеш со старыми параметрами пересчитываем вне запроса
+    if password_needs_rehash(db_user.hashed_password):
+        task_queue.enqueue(rehash_password, db_user.id, form_data.password)
     # Создаем токен
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
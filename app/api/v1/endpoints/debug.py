@@ -0,0 +1,135 @@
+"""
+Отладочные эндпоинты (только для администраторов).
+"""
+
+from typing import Annotated, Any, Dict, List, Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.deps import get_current_admin, get_user_db
+from app.api.routing import SessionRoute
+from app.core.admission import admission
+from app.core.config import settings
+from app.core.profiling import Profile, profiler
+from app.db.models import User
+
+router = APIRouter(route_class=SessionRoute)
+
+ProfileFormat = Literal["speedscope", "collapsed"]
+
+
+def require_profiling() -> None:
+    """
+    Скрывает эндпоинты профилирования, если оно выключено.
+
+    Raises:
+        HTTPException: Если PROFILING_ENABLED выключен
+    """
+    if not settings.PROFILING_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+
+
+def _export(profile: Profile, format: ProfileFormat) -> Response:
+    """Отдает профиль файлом в выбранном формате."""
+    if format == "collapsed":
+        return PlainTextResponse(
+            profile.to_collapsed(),
+            headers={
+                "Content-Disposition": (
+                    f'attachment; filename="profile-{profile.id}.folded"'
+                )
+            },
+        )
+
+    return JSONResponse(
+        profile.to_speedscope(),
+        headers={
+            "Content-Disposition": (
+                f'attachment; filename="profile-{profile.id}.speedscope.json"'
+            )
+        },
+    )
+
+
+@router.get("/profile", dependencies=[Depends(require_profiling)])
+async def profile_worker(
+    db: Annotated[AsyncSession, Depends(get_user_db)],
+    admin: Annotated[User, Depends(get_current_admin)],
+    seconds: Annotated[float, Query(gt=0, le=settings.PROFILING_MAX_SECONDS)] = 10,
+    format: ProfileFormat = "speedscope",
+) -> Response:
+    """
+    Профилирует все потоки воркера в течение seconds секунд.
+
+    Args:
+        db: Сессия БД
+        admin: Текущий администратор
+        seconds: Длительность сбора
+        format: speedscope (JSON) или collapsed (flamegraph)
+
+    Returns:
+        Response: Файл профиля
+    """
+    # Соединение не должно быть занято на время сбора
+    await db.close()
+
+    profile = await profiler.capture(seconds)
+
+    return _export(profile, format)
+
+
+@router.get(
+    "/profiles",
+    response_model=List[Dict],
+    dependencies=[Depends(require_profiling), Depends(get_current_admin)],
+)
+async def read_profiles() -> List[Dict]:
+    """
+    Получает список сохраненных профилей (новые первыми).
+
+    Returns:
+        List[Dict]: ID, имя, время начала, длительность и число сэмплов
+    """
+    return [profile.summary() for profile in profiler.profiles()]
+
+
+@router.get(
+    "/profiles/{profile_id}",
+    dependencies=[Depends(require_profiling), Depends(get_current_admin)],
+)
+async def read_profile(
+    profile_id: int, format: ProfileFormat = "speedscope"
+) -> Response:
+    """
+    Выгружает сохраненный профиль.
+
+    Args:
+        profile_id: ID профиля (заголовок X-Profile-Id ответа)
+        format: speedscope (JSON) или collapsed (flamegraph)
+
+    Returns:
+        Response: Файл профиля
+
+    Raises:
+        HTTPException: Если профиль не найден или вытеснен из буфера
+    """
+    profile = profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found"
+        )
+
+    return _export(profile, format)
+
+
+@router.get("/admission", dependencies=[Depends(get_current_admin)])
+async def read_admission_stats() -> Dict[str, Any]:
+    """
+    Метрики контроля нагрузки текущего воркера.
+
+    Returns:
+        Dict[str, Any]: По маршрутам - лимит, занятые слоты, очередь,
+            принятые и отброшенные (по причинам) запросы
+    """
+    return admission.stats()
@@ -2,72 +2,523 @@
 Эндпоинты для заметок.
 """
 
-from typing import Annotated, List
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+import asyncio
+import json
+from typing import (
+    Annotated,
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    List,
+    Literal,
+    Optional,
+    Tuple,
+    Union,
+)
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    status,
+    Query,
+    Response,
+    WebSocket,
+    WebSocketDisconnect,
+)
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.db.database import get_db
-from app.api.deps import get_current_user
-from app.db.models import User
-from app.schemas.note import NoteCreate, NoteUpdate, NoteResponse
+from sqlalchemy.orm.exc import StaleDataError
+from app.api.deps import (
+    get_current_user,
+    get_note_fields,
+    get_note_tags,
+    get_user_by_token,
+    get_user_db,
+)
+from app.api.routing import SessionRoute
+from app.core.config import settings
+from app.db.models import Note, User
+from app.schemas.note import (
+    NoteBatchCreate,
+    NoteCreate,
+    NoteTagsResult,
+    NoteTagsUpdate,
+    NoteUpdate,
+    NoteResponse,
+    NoteRevisionInfo,
+    NoteRevisionResponse,
+    NoteStats,
+    NoteSummary,
+    TagCountResponse,
+    NOTE_FIELDS,
+    note_projection_adapter,
+)
 from app.crud.note import note as note_crud
+from app.crud.note_archive import note_archive as note_archive_crud
+from app.crud.note_revision import note_revision as note_revision_crud
+from app.crud.note_stats import note_stats as note_stats_crud
+from app.crud.note_tag import note_tag as note_tag_crud
+from app.services.change_feed import change_feed
+from app.services.idempotency import (
+    SaveResponse,
+    idempotency,
+    request_fingerprint,
+)
+from app.services.jobs import audit_event
+from app.services.tasks import task_queue
 
-router = APIRouter()
+router = APIRouter(route_class=SessionRoute)
+
+
+def _project(fields: Tuple[str, ...], rows: List[Dict[str, Any]]) -> List[dict]:
+    """Сериализует строки через кешированную схему проекции."""
+    adapter = note_projection_adapter(fields)
+
+    return adapter.dump_python(adapter.validate_python(rows), mode="json")
+
+
+async def _set_total_count(
+    response: Response, db: AsyncSession, owner_id: int, include_archived: bool
+) -> None:
+    """Добавляет заголовок X-Total-Count из статистики (без COUNT(*))."""
+    stats = await note_stats_crud.get(db, owner_id=owner_id)
+    total = stats.note_count + (stats.archived_count if include_archived else 0)
+    response.headers["X-Total-Count"] = str(total)
 
 
 @router.get("/", response_model=List[NoteResponse])
 async def read_notes(
-    db: Annotated[AsyncSession, Depends(get_db)],
+    response: Response,
+    db: Annotated[AsyncSession, Depends(get_user_db)],
     current_user: Annotated[User, Depends(get_current_user)],
+    fields: Annotated[Optional[Tuple[str, ...]], Depends(get_note_fields)],
+    tags: Annotated[Optional[Tuple[str, ...]], Depends(get_note_tags)],
     skip: Annotated[int, Query(ge=0)] = 0,
     limit: Annotated[int, Query(ge=1, le=100)] = 100,
-) -> List[dict]:
+    include_archived: bool = False,
+    tag_mode: Literal["all", "any"] = "all",
+) -> Union[List[dict], JSONResponse]:
     """
     Получает список заметок текущего пользователя.
 
+    Без фильтра по тегам общее количество заметок возвращается
+    в заголовке X-Total-Count.
+
     Args:
+        response: Ответ (для заголовков)
         db: Сессия БД
         current_user: Текущий пользователь
+        fields: Запрошенные поля (None - все поля)
+        tags: Фильтр по тегам (None - без фильтра)
         skip: Сколько записей пропустить
         limit: Максимальное количество записей
+        include_archived: Включать ли архивные заметки
+        tag_mode: all - заметки со всеми тегами, any - с любым из них
 
     Returns:
-        List[dict]: Список заметок
+        Union[List[dict], JSONResponse]: Список заметок
     """
+    if fields is not None or include_archived or tags:
+        rows = await note_crud.get_multi_fields(
+            db,
+            owner_id=current_user.id,
+            fields=fields or NOTE_FIELDS,
+            skip=skip,
+            limit=limit,
+            include_archived=include_archived,
+            tags=tags,
+            match_all=tag_mode == "all",
+        )
+        if tags is None:
+            await _set_total_count(response, db, current_user.id, include_archived)
+        if fields is None:
+            return rows
+        return JSONResponse(_project(fields, rows), headers=response.headers)
+
     notes = await note_crud.get_multi(
         db, owner_id=current_user.id, skip=skip, limit=limit
     )
+    await _set_total_count(response, db, current_user.id, include_archived)
 
     return notes
 
 
+@router.get("/summary", response_model=List[NoteSummary])
+async def read_notes_summary(
+    response: Response,
+    db: Annotated[AsyncSession, Depends(get_user_db)],
+    current_user: Annotated[User, Depends(get_current_user)],
+    skip: Annotated[int, Query(ge=0)] = 0,
+    limit: Annotated[int, Query(ge=1, le=100)] = 100,
+    include_archived: bool = False,
+) -> List[dict]:
+    """
+    Получает краткий список заметок (без полного содержимого).
+
+    Общее количество заметок возвращается в заголовке X-Total-Count.
+
+    Args:
+        response: Ответ (для заголовков)
+        db: Сессия БД
+        current_user: Текущий пользователь
+        skip: Сколько записей пропустить
+        limit: Максимальное количество записей
+        include_archived: Включать ли архивные заметки
+
+    Returns:
+        List[dict]: Список заметок с превью
+    """
+    await _set_total_count(response, db, current_user.id, include_archived)
+    if include_archived:
+        return await note_crud.get_multi_fields(
+            db,
+            owner_id=current_user.id,
+            fields=tuple(NoteSummary.model_fields),
+            skip=skip,
+            limit=limit,
+            include_archived=True,
+        )
+
+    notes = await note_crud.get_multi_summary(
+        db, owner_id=current_user.id, skip=skip, limit=limit
+    )
+
+    return notes
+
+
+@router.get("/stats", response_model=NoteStats)
+async def read_notes_stats(
+    db: Annotated[AsyncSession, Depends(get_user_db)],
+    current_user: Annotated[User, Depends(get_current_user)],
+) -> NoteStats:
+    """
+    Получает статистику заметок: количество, время изменения и объем.
+
+    Читается из таблицы user_note_stats (с кешем), а не агрегатом по notes.
+
+    Args:
+        db: Сессия БД
+        current_user: Текущий пользователь
+
+    Returns:
+        NoteStats: Статистика заметок пользователя
+    """
+    return await note_stats_crud.get(db, owner_id=current_user.id)
+
+
+@router.get("/tags", response_model=List[TagCountResponse])
+async def read_tags(
+    db: Annotated[AsyncSession, Depends(get_user_db)],
+    current_user: Annotated[User, Depends(get_current_user)],
+) -> List[dict]:
+    """
+    Получает теги пользователя с количеством заметок.
+
+    Args:
+        db: Сессия БД
+        current_user: Текущий пользователь
+
+    Returns:
+        List[dict]: Теги, самые частые первыми
+    """
+    return await note_tag_crud.get_counts(db, owner_id=current_user.id)
+
+
+@router.post("/tags/add", response_model=NoteTagsResult)
+async def add_tags(
+    tags_in: NoteTagsUpdate,
+    db: Annotated[AsyncSession, Depends(get_user_db)],
+    current_user: Annotated[User, Depends(get_current_user)],
+) -> dict:
+    """
+    Добавляет теги нескольким заметкам.
+
+    Args:
+        tags_in: ID заметок и теги
+        db: Сессия БД
+        current_user: Текущий пользователь
+
+    Returns:
+        dict: Количество добавленных пар (заметка, тег)
+
+    Raises:
+        HTTPException: Если какая-то заметка не найдена или нет прав доступа
+    """
+    found = await note_tag_crud.get_owned_note_ids(
+        db, owner_id=current_user.id, note_ids=tags_in.note_ids
+    )
+    if found != set(tags_in.note_ids):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Note not found"
+        )
+
+    changed = await note_tag_crud.add(
+        db, owner_id=current_user.id, note_ids=tags_in.note_ids, tags=tags_in.tags
+    )
+    task_queue.enqueue(
+        audit_event,
+        "note.tag",
+        user_id=current_user.id,
+        note_ids=tags_in.note_ids,
+        tags=tags_in.tags,
+    )
+
+    return {"changed": changed}
+
+
+@router.post("/tags/remove", response_model=NoteTagsResult)
+async def remove_tags(
+    tags_in: NoteTagsUpdate,
+    db: Annotated[AsyncSession, Depends(get_user_db)],
+    current_user: Annotated[User, Depends(get_current_user)],
+) -> dict:
+    """
+    Снимает теги с нескольких заметок.
+
+    Args:
+        tags_in: ID заметок и теги
+        db: Сессия БД
+        current_user: Текущий пользователь
+
+    Returns:
+        dict: Количество снятых пар (заметка, тег)
+    """
+    changed = await note_tag_crud.remove(
+        db, owner_id=current_user.id, note_ids=tags_in.note_ids, tags=tags_in.tags
+    )
+    task_queue.enqueue(
+        audit_event,
+        "note.untag",
+        user_id=current_user.id,
+        note_ids=tags_in.note_ids,
+        tags=tags_in.tags,
+    )
+
+    return {"changed": changed}
+
+
+async def _sse_events(user_id: int) -> AsyncIterator[str]:
+    """Генерирует события SSE для пользователя с периодическим heartbeat."""
+    async with change_feed.subscribe(user_id) as subscription:
+        yield ": connected\n\n"
+        while True:
+            change = await subscription.get(timeout=settings.CHANGE_FEED_HEARTBEAT)
+            if change is None:
+                yield ": heartbeat\n\n"
+            else:
+                yield f"event: {change['type']}\ndata: {json.dumps(change)}\n\n"
+
+
+@router.get("/stream")
+async def stream_note_changes(
+    db: Annotated[AsyncSession, Depends(get_user_db)],
+    current_user: Annotated[User, Depends(get_current_user)],
+) -> StreamingResponse:
+    """
+    Поток изменений заметок текущего пользователя (Server-Sent Events).
+
+    Args:
+        db: Сессия БД
+        current_user: Текущий пользователь
+
+    Returns:
+        StreamingResponse: Поток text/event-stream
+    """
+    user_id = current_user.id
+    # Соединение с БД не нужно на все время жизни потока
+    await db.close()
+
+    return StreamingResponse(
+        _sse_events(user_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _wait_disconnect(websocket: WebSocket) -> None:
+    """Читает входящие сообщения до отключения клиента."""
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            return
+
+
+@router.websocket("/ws")
+async def notes_websocket(
+    websocket: WebSocket,
+    db: Annotated[AsyncSession, Depends(get_user_db)],
+    token: Annotated[str, Query()],
+) -> None:
+    """
+    Поток изменений заметок через WebSocket.
+
+    Токен передается в query, так как браузеры не позволяют задать
+    заголовок Authorization для WebSocket.
+
+    Args:
+        websocket: Соединение WebSocket
+        db: Сессия БД
+        token: JWT токен
+    """
+    db_user = await get_user_by_token(db, token)
+    await db.close()
+
+    if db_user is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+
+    async with change_feed.subscribe(db_user.id) as subscription:
+        disconnected = asyncio.create_task(_wait_disconnect(websocket))
+        try:
+            while not disconnected.done():
+                change_task = asyncio.create_task(
+                    subscription.get(timeout=settings.CHANGE_FEED_HEARTBEAT)
+                )
+                await asyncio.wait(
+                    {change_task, disconnected}, return_when=asyncio.FIRST_COMPLETED
+                )
+                if disconnected.done():
+                    change_task.cancel()
+                    break
+
+                change = change_task.result()
+                await websocket.send_json(change or {"type": "heartbeat"})
+        except WebSocketDisconnect:
+            pass
+        finally:
+            disconnected.cancel()
+
+
 @router.post("/", response_model=NoteResponse, status_code=status.HTTP_201_CREATED)
 async def create_note(
     note_in: NoteCreate,
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_user_db)],
     current_user: Annotated[User, Depends(get_current_user)],
-) -> dict:
+    idempotency_key: Annotated[Optional[str], Header(max_length=255)] = None,
+) -> Union[dict, JSONResponse]:
     """
     Создает новую заметку.
 
+    С заголовком Idempotency-Key повторный запрос возвращает
+    сохраненный ответ и не создает дубликат.
+
     Args:
         note_in: Данные для заметки
         db: Сессия БД
         current_user: Текущий пользователь
+        idempotency_key: Ключ идемпотентности клиента
 
     Returns:
-        dict: Созданная заметка
+        Union[dict, JSONResponse]: Созданная заметка
     """
-    note = await note_crud.create(db, note_in=note_in, owner_id=current_user.id)
 
-    return note
+    async def create(before_commit: Optional[Callable[[Note], None]] = None) -> Note:
+        note = await note_crud.create(
+            db, note_in=note_in, owner_id=current_user.id, before_commit=before_commit
+        )
+        task_queue.enqueue(
+            audit_event, "note.create", user_id=current_user.id, note_id=note.id
+        )
+        return note
+
+    if idempotency_key is None:
+        return await create()
+
+    async def handler(save: SaveResponse) -> None:
+        # Ответ сохраняется в транзакции, создающей заметку
+        await create(
+            lambda note: save(
+                status.HTTP_201_CREATED,
+                NoteResponse.model_validate(note).model_dump(mode="json"),
+            )
+        )
+
+    return await idempotency.execute(
+        db,
+        user_id=current_user.id,
+        key=idempotency_key,
+        request_hash=request_fingerprint(
+            "POST", "/notes", note_in.model_dump(mode="json")
+        ),
+        handler=handler,
+    )
+
+
+@router.post(
+    "/batch", response_model=List[NoteResponse], status_code=status.HTTP_201_CREATED
+)
+async def create_notes_batch(
+    batch_in: NoteBatchCreate,
+    db: Annotated[AsyncSession, Depends(get_user_db)],
+    current_user: Annotated[User, Depends(get_current_user)],
+    idempotency_key: Annotated[Optional[str], Header(max_length=255)] = None,
+) -> Union[List[dict], JSONResponse]:
+    """
+    Создает несколько заметок в одной транзакции.
+
+    Args:
+        batch_in: Данные для заметок
+        db: Сессия БД
+        current_user: Текущий пользователь
+        idempotency_key: Ключ идемпотентности клиента
+
+    Returns:
+        Union[List[dict], JSONResponse]: Созданные заметки
+    """
+
+    async def create(
+        before_commit: Optional[Callable[[List[Note]], None]] = None,
+    ) -> List[Note]:
+        notes = await note_crud.create_many(
+            db,
+            notes_in=batch_in.notes,
+            owner_id=current_user.id,
+            before_commit=before_commit,
+        )
+        task_queue.enqueue(
+            audit_event,
+            "note.create_batch",
+            user_id=current_user.id,
+            note_ids=[note.id for note in notes],
+        )
+        return notes
+
+    if idempotency_key is None:
+        return await create()
+
+    async def handler(save: SaveResponse) -> None:
+        await create(
+            lambda notes: save(
+                status.HTTP_201_CREATED,
+                [
+                    NoteResponse.model_validate(note).model_dump(mode="json")
+                    for note in notes
+                ],
+            )
+        )
+
+    return await idempotency.execute(
+        db,
+        user_id=current_user.id,
+        key=idempotency_key,
+        request_hash=request_fingerprint(
+            "POST", "/notes/batch", batch_in.model_dump(mode="json")
+        ),
+        handler=handler,
+    )
 
 
 @router.get("/{note_id}", response_model=NoteResponse)
 async def read_note(
     note_id: int,
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_user_db)],
     current_user: Annotated[User, Depends(get_current_user)],
-) -> dict:
+    fields: Annotated[Optional[Tuple[str, ...]], Depends(get_note_fields)],
+) -> Union[dict, JSONResponse]:
     """
     Получает заметку по ID.
 
@@ -75,14 +526,30 @@ async def read_note(
         note_id: ID заметки
         db: Сессия БД
         current_user: Текущий пользователь
+        fields: Запрошенные поля (None - все поля)
 
     Returns:
-        dict: Заметка
+        Union[dict, JSONResponse]: Заметка
 
     Raises:
         HTTPException: Если заметка не найдена или нет прав доступа
     """
+    if fields is not None:
+        row = await note_crud.get_by_id_fields(
+            db, note_id=note_id, owner_id=current_user.id, fields=fields
+        )
+        if row is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Note not found"
+            )
+        return JSONResponse(_project(fields, [row])[0])
+
     note = await note_crud.get_by_id(db, note_id=note_id, owner_id=current_user.id)
+    # Заметки, не найденные в горячей таблице, ищем в архиве
+    if not note:
+        note = await note_archive_crud.get_by_id(
+            db, note_id=note_id, owner_id=current_user.id
+        )
 
     if not note:
         raise HTTPException(
@@ -92,19 +559,84 @@ async def read_note(
     return note
 
 
+@router.get("/{note_id}/revisions", response_model=List[NoteRevisionInfo])
+async def read_note_revisions(
+    note_id: int,
+    db: Annotated[AsyncSession, Depends(get_user_db)],
+    current_user: Annotated[User, Depends(get_current_user)],
+    skip: Annotated[int, Query(ge=0)] = 0,
+    limit: Annotated[int, Query(ge=1, le=100)] = 100,
+) -> List[Any]:
+    """
+    Получает историю изменений заметки, новые версии первыми.
+
+    Версии записываются пачками в фоне, поэтому последняя правка
+    появляется в истории с задержкой до NOTE_REVISION_FLUSH_INTERVAL.
+
+    Args:
+        note_id: ID заметки
+        db: Сессия БД
+        current_user: Текущий пользователь
+        skip: Сколько версий пропустить
+        limit: Максимальное количество версий
+
+    Returns:
+        List[Any]: Версии заметки (без содержимого)
+    """
+    return await note_revision_crud.get_multi(
+        db, owner_id=current_user.id, note_id=note_id, skip=skip, limit=limit
+    )
+
+
+@router.get("/{note_id}/revisions/{version}", response_model=NoteRevisionResponse)
+async def read_note_revision(
+    note_id: int,
+    version: int,
+    db: Annotated[AsyncSession, Depends(get_user_db)],
+    current_user: Annotated[User, Depends(get_current_user)],
+) -> Any:
+    """
+    Восстанавливает версию заметки из истории изменений.
+
+    Args:
+        note_id: ID заметки
+        version: Номер версии
+        db: Сессия БД
+        current_user: Текущий пользователь
+
+    Returns:
+        Any: Версия заметки с содержимым
+
+    Raises:
+        HTTPException: 404 если версии нет в истории
+    """
+    revision = await note_revision_crud.get_content(
+        db, owner_id=current_user.id, note_id=note_id, version=version
+    )
+    if revision is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Revision not found"
+        )
+
+    return revision
+
+
 @router.put("/{note_id}", response_model=NoteResponse)
 async def update_note(
     note_id: int,
     note_in: NoteUpdate,
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_user_db)],
     current_user: Annotated[User, Depends(get_current_user)],
 ) -> dict:
     """
     Обновляет заметку.
 
+    Если в теле передана version, заметка обновляется только при
+    совпадении версии; параллельное изменение тоже дает 409.
+
     Args:
         note_id: ID заметки
-        note_in: Новые данные
+        note_in: Новые данные и ожидаемая версия
         db: Сессия БД
         current_user: Текущий пользователь
 
@@ -112,26 +644,43 @@ async def update_note(
         dict: Обновленная заметка
 
     Raises:
-        HTTPException: Если заметка не найдена или нет прав доступа
+        HTTPException: 404 если заметка не найдена или нет прав доступа,
+            409 если заметку уже изменили
     """
-    # Получаем заметку
-    note = await note_crud.get_by_id(db, note_id=note_id, owner_id=current_user.id)
+    try:
+        note = await note_crud.update_owned(
+            db, note_id=note_id, owner_id=current_user.id, note_in=note_in
+        )
+        # Изменение архивной заметки возвращает ее в горячую таблицу
+        if note is None and await note_archive_crud.restore(
+            db, note_id=note_id, owner_id=current_user.id
+        ):
+            note = await note_crud.update_owned(
+                db, note_id=note_id, owner_id=current_user.id, note_in=note_in
+            )
+    except StaleDataError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Note was modified by another request",
+        )
 
-    if not note:
+    if note is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Note not found"
         )
-    # Обновляем заметку
-    updated_note = await note_crud.update(db, db_note=note, note_in=note_in)
+    task_queue.enqueue(
+        audit_event, "note.update", user_id=current_user.id, note_id=note_id
+    )
 
-    return updated_note
+    return note
 
 
 @router.delete("/{note_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_note(
     note_id: int,
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_user_db)],
     current_user: Annotated[User, Depends(get_current_user)],
+    version: Annotated[Optional[int], Query(ge=1)] = None,
 ) -> None:
     """
     Удаляет заметку.
@@ -139,17 +688,29 @@ async def delete_note(
     Args:
         note_id: ID заметки
         db: Сессия БД
-        current_user: Текучный пользователь
+        current_user: Текущий пользователь
+        version: Ожидаемая версия заметки (None - без проверки)
 
     Raises:
-        HTTPException: Если заметка не найдена или нет прав доступа
+        HTTPException: 404 если заметка не найдена или нет прав доступа,
+            409 если заметку уже изменили
     """
-    # Получаем заметку
-    note = await note_crud.get_by_id(db, note_id=note_id, owner_id=current_user.id)
+    try:
+        deleted = await note_crud.delete_owned(
+            db, note_id=note_id, owner_id=current_user.id, version=version
+        ) or await note_archive_crud.delete_owned(
+            db, note_id=note_id, owner_id=current_user.id, version=version
+        )
+    except StaleDataError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Note was modified by another request",
+        )
 
-    if not note:
+    if not deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Note not found"
         )
-    # Удаляем заметку
-    await note_crud.delete(db, db_note=note)
+    task_queue.enqueue(
+        audit_event, "note.delete", user_id=current_user.id, note_id=note_id
+    )
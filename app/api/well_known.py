@@ -0,0 +1,36 @@
+"""
+Эндпоинты /.well-known (вне версии API).
+"""
+
+from fastapi import APIRouter, Request, Response, status
+
+from app.core.config import settings
+from app.core.keys import get_key_ring
+
+router = APIRouter()
+
+
+@router.get("/.well-known/jwks.json", tags=["Authentication"])
+async def jwks(request: Request) -> Response:
+    """
+    Открытые ключи проверки JWT (JWK Set).
+
+    Тело готовится один раз при загрузке ключей. Ответ кешируется
+    клиентами на JWT_JWKS_MAX_AGE секунд, а повторный запрос с
+    If-None-Match получает 304 без тела.
+
+    Args:
+        request: Текущий запрос
+
+    Returns:
+        Response: JWKS или 304 Not Modified
+    """
+    ring = get_key_ring()
+    headers = {
+        "Cache-Control": f"public, max-age={settings.JWT_JWKS_MAX_AGE}",
+        "ETag": ring.etag,
+    }
+    if request.headers.get("If-None-Match") == ring.etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    return Response(ring.jwks, media_type="application/json", headers=headers)
@@ -0,0 +1,267 @@
+"""
+Контроль нагрузки: квоты пользователей и лимиты маршрутов.
+
+Решение о приеме запроса принимается в SessionRoute до вызова
+обработчика, то есть до того, как запрос займет соединение из пула.
+Лишние запросы отбрасываются сразу, а не ждут в очереди пула
+(pool_timeout), занимая воркер:
+
+- пользователь превысил квоту изменений (token bucket) или число
+  одновременных запросов - 429;
+- все слоты маршрута заняты, а очередь к ним полна или ожидание
+  дольше ADMISSION_QUEUE_TIMEOUT - 503.
+
+Лимит одновременных запросов пользователя не дает одному клиенту
+занять все слоты маршрута, поэтому остальные пользователи продолжают
+работать и под нагрузкой. Состояние хранится в процессе (на воркер).
+"""
+
+import asyncio
+import math
+import time
+from collections import Counter, OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, Optional
+
+from app.core.config import settings
+
+# Причины отказа (метки метрик)
+USER_RATE = "user_rate"
+USER_CONCURRENCY = "user_concurrency"
+ROUTE_QUEUE_FULL = "route_queue_full"
+ROUTE_TIMEOUT = "route_timeout"
+
+
+class AdmissionRejected(Exception):
+    """
+    Запрос отклонен контролем нагрузки.
+
+    Attributes:
+        status_code: 429 (квота пользователя) или 503 (перегрузка маршрута)
+        reason: Причина отказа
+        retry_after: Через сколько секунд повторить запрос
+    """
+
+    def __init__(self, status_code: int, reason: str, retry_after: int) -> None:
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+@dataclass
+class _Bucket:
+    """Token bucket квоты изменений пользователя."""
+
+    tokens: float
+    updated_at: float
+
+
+@dataclass
+class _RouteState:
+    """Слоты маршрута и его счетчики."""
+
+    limit: int
+    semaphore: asyncio.Semaphore
+    in_flight: int = 0
+    waiting: int = 0
+    admitted: int = 0
+    shed: Counter = field(default_factory=Counter)
+
+
+class AdmissionController:
+    """Квоты пользователей и семафоры маршрутов одного воркера."""
+
+    def __init__(
+        self,
+        user_concurrency: int = 8,
+        write_rate: float = 20.0,
+        write_burst: int = 40,
+        route_concurrency: Optional[int] = None,
+        route_limits: Optional[Dict[str, int]] = None,
+        queue_size: int = 50,
+        queue_timeout: float = 1.0,
+        max_users: int = 10_000,
+    ) -> None:
+        self.user_concurrency = user_concurrency
+        self.write_rate = write_rate
+        self.write_burst = write_burst
+        self.route_concurrency = route_concurrency
+        self.route_limits = route_limits or {}
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.max_users = max_users
+        self.reset()
+
+    def reset(self) -> None:
+        """Сбрасывает состояние и счетчики (лимиты читаются заново)."""
+        self._routes: Dict[str, _RouteState] = {}
+        self._user_requests: Counter = Counter()
+        self._buckets: "OrderedDict[int, _Bucket]" = OrderedDict()
+
+    def route_limit(self, route: str) -> int:
+        """
+        Число одновременных запросов маршрута.
+
+        Args:
+            route: Имя маршрута (имя обработчика)
+
+        Returns:
+            int: Лимит из ADMISSION_ROUTE_LIMITS, ADMISSION_ROUTE_CONCURRENCY
+                или размер пула воркера
+        """
+        limit = self.route_limits.get(route, self.route_concurrency)
+        return limit or settings.pool_size_per_worker()
+
+    def _route(self, route: str) -> _RouteState:
+        state = self._routes.get(route)
+        if state is None:
+            limit = self.route_limit(route)
+            state = self._routes[route] = _RouteState(limit, asyncio.Semaphore(limit))
+        return state
+
+    def _reject(
+        self, state: _RouteState, status_code: int, reason: str, retry_after: int = 1
+    ) -> AdmissionRejected:
+        state.shed[reason] += 1
+        return AdmissionRejected(status_code, reason, retry_after)
+
+    def _take_write_token(self, user_id: int) -> Optional[int]:
+        """
+        Списывает токен квоты изменений.
+
+        Returns:
+            Optional[int]: None или через сколько секунд появится токен
+        """
+        now = time.monotonic()
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            bucket = self._buckets[user_id] = _Bucket(self.write_burst, now)
+            # Вытесняем давно не писавших: их квота и так восстановлена
+            if len(self._buckets) > self.max_users:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(user_id)
+            bucket.tokens = min(
+                self.write_burst,
+                bucket.tokens + (now - bucket.updated_at) * self.write_rate,
+            )
+            bucket.updated_at = now
+
+        if bucket.tokens < 1:
+            return max(1, math.ceil((1 - bucket.tokens) / self.write_rate))
+        bucket.tokens -= 1
+        return None
+
+    def _refund_write_token(self, user_id: int) -> None:
+        """Возвращает токен квоты запросу, отброшенному маршрутом."""
+        bucket = self._buckets.get(user_id)
+        if bucket is not None:
+            bucket.tokens = min(self.write_burst, bucket.tokens + 1)
+
+    async def _acquire_slot(self, state: _RouteState) -> None:
+        if not state.semaphore.locked():
+            await state.semaphore.acquire()
+            return
+        if state.waiting >= self.queue_size:
+            raise self._reject(state, 503, ROUTE_QUEUE_FULL)
+
+        state.waiting += 1
+        try:
+            await asyncio.wait_for(state.semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise self._reject(state, 503, ROUTE_TIMEOUT)
+        finally:
+            state.waiting -= 1
+
+    @asynccontextmanager
+    async def admit(
+        self, route: str, user_id: Optional[int], write: bool
+    ) -> AsyncIterator[None]:
+        """
+        Пропускает запрос или отклоняет его до работы с БД.
+
+        Args:
+            route: Имя маршрута
+            user_id: ID пользователя из токена (None - без квот пользователя)
+            write: Запрос изменяет данные (расходует квоту изменений)
+
+        Yields:
+            None: Пока запрос занимает слот маршрута
+
+        Raises:
+            AdmissionRejected: Если запрос нужно отбросить
+        """
+        state = self._route(route)
+        charged: Optional[int] = None
+        if user_id is not None:
+            if self.user_concurrency and (
+                self._user_requests[user_id] >= self.user_concurrency
+            ):
+                raise self._reject(state, 429, USER_CONCURRENCY)
+            if write and self.write_rate:
+                retry_after = self._take_write_token(user_id)
+                if retry_after is not None:
+                    raise self._reject(state, 429, USER_RATE, retry_after)
+                charged = user_id
+            self._user_requests[user_id] += 1
+
+        try:
+            try:
+                await self._acquire_slot(state)
+            except AdmissionRejected:
+                # Запрос не выполнялся: квота изменений не расходуется
+                if charged is not None:
+                    self._refund_write_token(charged)
+                raise
+            state.in_flight += 1
+            state.admitted += 1
+            try:
+                yield
+            finally:
+                state.in_flight -= 1
+                state.semaphore.release()
+        finally:
+            if user_id is not None:
+                self._user_requests[user_id] -= 1
+                if not self._user_requests[user_id]:
+                    del self._user_requests[user_id]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Метрики контроля нагрузки.
+
+        Returns:
+            Dict[str, Any]: По маршрутам - лимит, занятые слоты, очередь,
+                принятые и отброшенные (по причинам) запросы; итоги отказов
+        """
+        shed: Counter = Counter()
+        routes: Dict[str, Dict[str, Any]] = {}
+        for name, state in sorted(self._routes.items()):
+            shed.update(state.shed)
+            routes[name] = {
+                "limit": state.limit,
+                "in_flight": state.in_flight,
+                "waiting": state.waiting,
+                "admitted": state.admitted,
+                "shed": dict(state.shed),
+            }
+
+        return {
+            "routes": routes,
+            "shed": dict(shed),
+            "active_users": len(self._user_requests),
+        }
+
+
+admission = AdmissionController(
+    user_concurrency=settings.ADMISSION_USER_CONCURRENCY,
+    write_rate=settings.ADMISSION_USER_WRITE_RATE,
+    write_burst=settings.ADMISSION_USER_WRITE_BURST,
+    route_concurrency=settings.ADMISSION_ROUTE_CONCURRENCY,
+    route_limits=settings.ADMISSION_ROUTE_LIMITS,
+    queue_size=settings.ADMISSION_QUEUE_SIZE,
+    queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT,
+    max_users=settings.ADMISSION_MAX_TRACKED_USERS,
+)
@@ -0,0 +1,288 @@
+"""
+Middleware для сжатия HTTP-ответов (gzip, а также brotli/zstd при наличии).
+"""
+
+import zlib
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, Optional, Protocol, Tuple, cast
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:  # pragma: no cover - зависит от окружения
+    import brotli  # type: ignore[import-not-found]
+except ImportError:  # pragma: no cover
+    brotli = None
+
+try:  # pragma: no cover - зависит от окружения
+    import zstandard  # type: ignore[import-not-found]
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+
+class _Compressor(Protocol):
+    """Общий интерфейс инкрементального компрессора."""
+
+    def compress(self, data: bytes) -> bytes:
+        """Сжимает очередную часть тела (результат может быть пустым)."""
+        ...
+
+    def flush(self) -> bytes:
+        """Выдает все сжатое до этого момента, не завершая поток."""
+        ...
+
+    def finish(self) -> bytes:
+        """Завершает поток сжатия."""
+        ...
+
+
+class _GzipCompressor(_Compressor):
+    def __init__(self, level: int) -> None:
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data)
+
+    def flush(self) -> bytes:
+        return self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._obj.flush(zlib.Z_FINISH)
+
+
+class _BrotliCompressor(_Compressor):
+    def __init__(self, level: int) -> None:
+        self._obj = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return cast(bytes, self._obj.process(data))
+
+    def flush(self) -> bytes:
+        return cast(bytes, self._obj.flush())
+
+    def finish(self) -> bytes:
+        return cast(bytes, self._obj.finish())
+
+
+class _ZstdCompressor(_Compressor):
+    def __init__(self, level: int) -> None:
+        self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return cast(bytes, self._obj.compress(data))
+
+    def flush(self) -> bytes:
+        return cast(bytes, self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK))
+
+    def finish(self) -> bytes:
+        return cast(bytes, self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH))
+
+
+def available_encodings() -> Tuple[str, ...]:
+    """
+    Возвращает поддерживаемые кодировки в порядке предпочтения сервера.
+
+    Returns:
+        Tuple[str, ...]: Имена кодировок для Content-Encoding
+    """
+    encodings = []
+    if brotli is not None:
+        encodings.append("br")
+    if zstandard is not None:
+        encodings.append("zstd")
+    encodings.append("gzip")
+    return tuple(encodings)
+
+
+@lru_cache(maxsize=256)
+def negotiate_encoding(
+    accept_encoding: str, supported: Tuple[str, ...]
+) -> Optional[str]:
+    """
+    Выбирает кодировку по заголовку Accept-Encoding.
+
+    Результат кешируется: клиенты присылают ограниченный набор значений
+    заголовка, поэтому разбор выполняется один раз на уникальную строку.
+
+    Args:
+        accept_encoding: Значение заголовка Accept-Encoding
+        supported: Кодировки сервера в порядке предпочтения
+
+    Returns:
+        Optional[str]: Выбранная кодировка или None
+    """
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[name] = q
+
+    wildcard = weights.get("*")
+    best: Optional[str] = None
+    best_q = 0.0
+    for encoding in supported:
+        q = weights.get(encoding, wildcard if wildcard is not None else 0.0)
+        # При равных весах побеждает кодировка, более приоритетная для сервера
+        if q > best_q:
+            best, best_q = encoding, q
+
+    return best
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware для сжатия ответов.
+
+    Сжимает только ответы с разрешенным Content-Type и размером не меньше
+    порога. Потоковые ответы (StreamingResponse) сжимаются инкрементально:
+    каждый фрагмент сразу отправляется клиенту после flush.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 500,
+        content_types: Iterable[str] = ("application/json",),
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        zstd_level: int = 3,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.content_types = tuple(ct.lower() for ct in content_types)
+        self.encodings = available_encodings()
+        self.factories: Dict[str, Callable[[], _Compressor]] = {
+            "gzip": lambda: _GzipCompressor(gzip_level),
+            "br": lambda: _BrotliCompressor(brotli_quality),
+            "zstd": lambda: _ZstdCompressor(zstd_level),
+        }
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = Headers(scope=scope).get("accept-encoding", "")
+        encoding = negotiate_encoding(accept_encoding, self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(
+            self.app,
+            send,
+            encoding=encoding,
+            factory=self.factories[encoding],
+            minimum_size=self.minimum_size,
+            content_types=self.content_types,
+        )
+        await responder(scope, receive)
+
+
+class _CompressionResponder:
+    """Обрабатывает один ответ: буферизует начало тела и решает, сжимать ли."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        send: Send,
+        encoding: str,
+        factory: Callable[[], _Compressor],
+        minimum_size: int,
+        content_types: Tuple[str, ...],
+    ) -> None:
+        self.app = app
+        self.send = send
+        self.encoding = encoding
+        self.factory = factory
+        self.minimum_size = minimum_size
+        self.content_types = content_types
+        self.start_message: Optional[Message] = None
+        self.compressor: Optional[_Compressor] = None
+        self.passthrough = False
+        self.buffer = bytearray()
+
+    async def __call__(self, scope: Scope, receive: Receive) -> None:
+        await self.app(scope, receive, self.send_wrapper)
+
+    def _is_compressible(self, headers: Headers) -> bool:
+        if "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+        # SSE: события должны уходить клиенту сразу, без буферизации порогом
+        if content_type == "text/event-stream":
+            return False
+        return any(content_type.startswith(ct) for ct in self.content_types)
+
+    async def _send_start(self, content_length: Optional[int]) -> None:
+        assert self.start_message is not None
+        headers = MutableHeaders(raw=self.start_message["headers"])
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        if content_length is None:
+            del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(content_length)
+        self.start_message["headers"] = headers.raw
+        await self.send(self.start_message)
+
+    async def send_wrapper(self, message: Message) -> None:
+        message_type = message["type"]
+
+        if message_type == "http.response.start":
+            self.start_message = message
+            if not self._is_compressible(Headers(raw=message["headers"])):
+                self.passthrough = True
+                await self.send(message)
+            return
+
+        if message_type != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.compressor is None:
+            # Копим начало тела, пока не станет ясно, превышен ли порог
+            self.buffer.extend(body)
+            if len(self.buffer) < self.minimum_size:
+                if not more_body:
+                    self.passthrough = True
+                    await self.send(self.start_message)
+                    await self.send(
+                        {"type": "http.response.body", "body": bytes(self.buffer)}
+                    )
+                return
+
+            body = bytes(self.buffer)
+            self.buffer.clear()
+            self.compressor = self.factory()
+
+            if not more_body:
+                # Ответ целиком в одном сообщении: размер известен заранее
+                chunk = self.compressor.compress(body) + self.compressor.finish()
+                await self._send_start(content_length=len(chunk))
+                await self.send({"type": "http.response.body", "body": chunk})
+                return
+
+            await self._send_start(content_length=None)
+
+        if more_body:
+            chunk = self.compressor.compress(body) + self.compressor.flush()
+        else:
+            chunk = self.compressor.compress(body) + self.compressor.finish()
+
+        await self.send(
+            {"type": "http.response.body", "body": chunk, "more_body": more_body}
+        )
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Dict, List, Literal, Optional
 from pydantic_settings import BaseSettings
 from pydantic import PostgresDsn, field_validator, ValidationInfo
 
@@ -13,11 +13,138 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # Ключи подписи JWT: kid -> PEM или путь к PEM (RSA/EC, см. app/core/keys.py).
+    # Без JWT_ACTIVE_KID токены подписываются SECRET_KEY (ALGORITHM)
+    JWT_KEYS: Dict[str, str] = {}
+    JWT_ACTIVE_KID: Optional[str] = None
+    # Принимать токены без kid, подписанные SECRET_KEY (переход на ключи)
+    JWT_ACCEPT_SECRET_KEY: bool = True
+    # Время кеширования /.well-known/jwks.json клиентами (секунды)
+    JWT_JWKS_MAX_AGE: int = 300
     POSTGRES_SERVER: str
     POSTGRES_USER: str
     POSTGRES_PASSWORD: str
     POSTGRES_DB: str
     DATABASE_URL: Optional[PostgresDsn] = None
+    # Заметки: лимиты, превью и сжатие содержимого
+    NOTE_CONTENT_MAX_LENGTH: int = 100_000
+    # Не больше ширины колонки preview (NOTE_PREVIEW_COLUMN_LENGTH в
+    # app/db/models.py): длинное превью требует миграции этой колонки
+    NOTE_PREVIEW_LENGTH: int = 200
+    NOTE_COMPRESSION_ENABLED: bool = True
+    NOTE_COMPRESSION_THRESHOLD: int = 1024
+    # Теги заметок
+    NOTE_TAG_MAX_LENGTH: int = 64
+    NOTE_TAG_FILTER_MAX: int = 10
+    # История изменений заметок: дельты к предыдущей версии и полный снимок
+    # не реже чем через NOTE_REVISION_SNAPSHOT_EVERY версий; запись пачками
+    NOTE_REVISIONS_ENABLED: bool = True
+    NOTE_REVISION_SNAPSHOT_EVERY: int = 20
+    NOTE_REVISION_BATCH_SIZE: int = 100
+    NOTE_REVISION_FLUSH_INTERVAL: float = 1.0
+    NOTE_REVISION_QUEUE_SIZE: int = 1000
+    # Сжатие истории: у заметки остаются NOTE_REVISION_KEEP последних версий
+    NOTE_REVISION_KEEP: int = 100
+    NOTE_REVISION_COMPACT_INTERVAL_SECONDS: int = 3600
+    # Кеш статистики заметок в процессе (секунды, записей)
+    NOTE_STATS_CACHE_TTL: float = 5.0
+    NOTE_STATS_CACHE_SIZE: int = 10_000
+    # Фоновые задачи
+    TASK_QUEUE_CONCURRENCY: int = 4
+    TASK_QUEUE_MAX_SIZE: int = 10_000
+    TASK_MAX_RETRIES: int = 3
+    TASK_RETRY_BACKOFF: float = 0.5
+    TASK_DRAIN_TIMEOUT: float = 10.0
+    TASK_DURABLE_ENABLED: bool = False
+    TASK_DURABLE_BATCH_SIZE: int = 10
+    TASK_DURABLE_POLL_INTERVAL: float = 1.0
+    # Лента изменений заметок (LISTEN/NOTIFY)
+    CHANGE_FEED_ENABLED: bool = True
+    CHANGE_FEED_CHANNEL: str = "note_changes"
+    CHANGE_FEED_QUEUE_SIZE: int = 100
+    CHANGE_FEED_HEARTBEAT: float = 15.0
+    # DSN для LISTEN в обход PgBouncer: имя шарда -> DSN (по умолчанию - DSN
+    # шардов). При DB_POOL_MODE=pgbouncer обязателен для каждого шарда
+    CHANGE_FEED_DSNS: Dict[str, str] = {}
+    # Idempotency-Key
+    IDEMPOTENCY_TTL_SECONDS: int = 86_400
+    IDEMPOTENCY_CACHE_SIZE: int = 10_000
+    # Аренда ключа "в процессе": после сбоя процесса повтор перехватывает
+    # ключ через столько секунд (больше времени самого долгого запроса)
+    IDEMPOTENCY_LEASE_SECONDS: float = 120.0
+    IDEMPOTENCY_PURGE_INTERVAL_SECONDS: int = 3600
+    # Архивация старых заметок
+    ARCHIVE_ENABLED: bool = False
+    ARCHIVE_AFTER_DAYS: int = 365
+    ARCHIVE_BATCH_SIZE: int = 500
+    ARCHIVE_INTERVAL_SECONDS: int = 3600
+    # Пул соединений: бюджет делится между всеми воркерами
+    DB_POOL_SIZE: int = 20
+    DB_MAX_OVERFLOW: int = 0
+    DB_MAX_CONNECTIONS: int = 100
+    DB_RESERVED_CONNECTIONS: int = 10
+    # Кеши подготовленных запросов asyncpg (0 отключает)
+    DB_PREPARED_STATEMENT_CACHE_SIZE: int = 100
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    # pgbouncer: PgBouncer в режиме transaction перед Postgres - без локального
+    # пула, pre-ping и кешей подготовленных запросов
+    DB_POOL_MODE: Literal["default", "pgbouncer"] = "default"
+    # Шарды пользователей: имя -> DSN (пусто - один шард на DATABASE_URL).
+    # Каталог email -> (user_id, шард) всегда хранится в DATABASE_URL
+    DB_SHARDS: Dict[str, str] = {}
+    DB_SHARD_VNODES: int = 64
+    DB_SHARD_CACHE_SIZE: int = 100_000
+    # Сервер (python -m app.serve)
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = 8000
+    WEB_CONCURRENCY: Optional[int] = None
+    SERVER_GRACEFUL_TIMEOUT: int = 30
+    SERVER_KEEPALIVE: int = 5
+    # Сжатие ответов
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MINIMUM_SIZE: int = 500
+    COMPRESSION_CONTENT_TYPES: List[str] = [
+        "application/json",
+        "text/",
+        "application/javascript",
+    ]
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+    COMPRESSION_ZSTD_LEVEL: int = 3
+    # Логирование: JSON в stdout через очередь и фоновый поток
+    LOG_LEVEL: str = "INFO"
+    LOG_JSON: bool = True
+    # Access-лог: ошибки и медленные запросы всегда, успешные - доля
+    LOG_ACCESS_ENABLED: bool = True
+    LOG_ACCESS_SAMPLE_RATE: float = 1.0
+    LOG_SLOW_REQUEST_MS: float = 1000.0
+    # Контроль нагрузки (на воркер): квоты пользователей и лимиты маршрутов
+    ADMISSION_ENABLED: bool = True
+    # Одновременных запросов одного пользователя (0 - без ограничения)
+    ADMISSION_USER_CONCURRENCY: int = 8
+    # Изменений в секунду на пользователя и запас для всплесков (0 - без квоты)
+    ADMISSION_USER_WRITE_RATE: float = 20.0
+    ADMISSION_USER_WRITE_BURST: int = 40
+    # Одновременных запросов маршрута (None - размер пула воркера) и лимиты
+    # отдельных маршрутов по имени обработчика, например {"create_note": 5}
+    ADMISSION_ROUTE_CONCURRENCY: Optional[int] = None
+    ADMISSION_ROUTE_LIMITS: Dict[str, int] = {}
+    # Сколько запросов ждут слот маршрута и сколько секунд, дальше - 503
+    ADMISSION_QUEUE_SIZE: int = 50
+    ADMISSION_QUEUE_TIMEOUT: float = 1.0
+    ADMISSION_MAX_TRACKED_USERS: int = 10_000
+    # Администраторы (доступ к /debug)
+    ADMIN_EMAILS: List[str] = []
+    # Сэмплирующий профилировщик: 1 из N запросов (0 - только по заголовку)
+    PROFILING_ENABLED: bool = False
+    PROFILING_SAMPLE_RATE: int = 0
+    PROFILING_HEADER: str = "X-Profile"
+    # Значение заголовка профилирования (None - заголовок не действует)
+    PROFILING_HEADER_SECRET: Optional[str] = None
+    PROFILING_INTERVAL: float = 0.005
+    PROFILING_BUFFER_SIZE: int = 50
+    PROFILING_MAX_CONCURRENT: int = 4
+    PROFILING_MAX_SECONDS: float = 60.0
 
     @field_validator("DATABASE_URL", mode="before")
     @classmethod
@@ -37,6 +164,77 @@ class Settings(BaseSettings):
             )
         )
 
+    def connections_per_worker(self) -> int:
+        """
+        Доля бюджета соединений одного воркера.
+
+        Returns:
+            int: (max_connections - резерв) // число воркеров; меньше 1 -
+                бюджет не выполним (см. app/serve.py)
+        """
+        workers = self.WEB_CONCURRENCY or 1
+        budget = self.DB_MAX_CONNECTIONS - self.DB_RESERVED_CONNECTIONS
+        return budget // workers
+
+    def pool_size_per_worker(self) -> int:
+        """
+        Размер пула соединений одного воркера.
+
+        Вместе с max_overflow_per_worker не превышает доли воркера, поэтому
+        общее число соединений всех воркеров не превышает max_connections
+        Postgres за вычетом резерва.
+
+        Returns:
+            int: Размер пула для одного процесса
+        """
+        per_worker = self.connections_per_worker() - self.DB_MAX_OVERFLOW
+        return max(1, min(self.DB_POOL_SIZE, per_worker))
+
+    def max_overflow_per_worker(self) -> int:
+        """
+        Переполнение пула одного воркера: DB_MAX_OVERFLOW, урезанное до
+        остатка доли воркера после pool_size.
+
+        Returns:
+            int: max_overflow для одного процесса
+        """
+        spare = self.connections_per_worker() - self.pool_size_per_worker()
+        return max(0, min(self.DB_MAX_OVERFLOW, spare))
+
+    def shard_urls(self) -> Dict[str, str]:
+        """
+        DSN всех шардов пользователей.
+
+        Returns:
+            Dict[str, str]: Имя шарда -> DSN
+        """
+        return dict(self.DB_SHARDS) or {"default": str(self.DATABASE_URL)}
+
+    def change_feed_dsns(self) -> List[str]:
+        """
+        DSN LISTEN-соединений ленты изменений, по одному на шард.
+
+        LISTEN держит соединение и не переживает пулинг транзакций, поэтому
+        за PgBouncer каждому шарду нужен прямой DSN из CHANGE_FEED_DSNS.
+
+        Returns:
+            List[str]: DSN в формате asyncpg (postgresql://...)
+
+        Raises:
+            ValueError: Если в режиме pgbouncer для шарда не задан прямой DSN
+        """
+        shards = self.shard_urls()
+        missing = sorted(set(shards) - set(self.CHANGE_FEED_DSNS))
+        if self.DB_POOL_MODE == "pgbouncer" and missing:
+            raise ValueError(
+                f"CHANGE_FEED_DSNS has no direct DSN for shards {missing}: "
+                "LISTEN does not work through PgBouncer"
+            )
+        return [
+            self.CHANGE_FEED_DSNS.get(name, url).replace("+asyncpg", "")
+            for name, url in shards.items()
+        ]
+
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -0,0 +1,170 @@
+"""
+Связка ключей подписи JWT: несколько ключей по kid, асимметричная подпись, JWKS.
+
+Ключи задаются в JWT_KEYS (kid -> PEM или путь к PEM-файлу). Токены
+подписываются закрытым ключом JWT_ACTIVE_KID с заголовком kid, а
+проверяются ключом, выбранным по kid; для ключа, выведенного из ротации,
+достаточно открытой части. Открытые ключи публикуются в
+/.well-known/jwks.json, и другие сервисы проверяют токены сами.
+
+Ротация без разлогинивания:
+    1. добавить новый ключ в JWT_KEYS (он появится в JWKS);
+    2. через время кеширования JWKS сделать его JWT_ACTIVE_KID;
+    3. через ACCESS_TOKEN_EXPIRE_MINUTES удалить старый ключ.
+
+python-jose и cryptography импортируются при загрузке связки.
+"""
+
+import hashlib
+import json
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+
+# Алгоритм подписи по кривой EC
+EC_ALGORITHMS = {"secp256r1": "ES256", "secp384r1": "ES384", "secp521r1": "ES512"}
+
+
+@dataclass(frozen=True)
+class SigningKey:
+    """
+    Ключ связки, разобранный один раз при загрузке.
+
+    Attributes:
+        kid: Идентификатор ключа (заголовок kid токена)
+        algorithm: Алгоритм JWS (RS256, ES256, ...)
+        verifier: Открытый ключ python-jose
+        signer: Закрытый ключ python-jose (None - только проверка)
+        jwk: Открытый ключ в формате JWK
+    """
+
+    kid: str
+    algorithm: str
+    verifier: Any
+    signer: Optional[Any]
+    jwk: Dict[str, Any]
+
+
+def read_pem(value: str) -> bytes:
+    """
+    Возвращает PEM из значения настройки: сам PEM или путь к файлу.
+
+    Args:
+        value: PEM-текст или путь
+
+    Returns:
+        bytes: PEM
+    """
+    if value.lstrip().startswith("-----BEGIN"):
+        return value.encode()
+    return Path(value).read_bytes()
+
+
+def load_key(kid: str, pem: bytes) -> SigningKey:
+    """
+    Разбирает PEM ключа RSA или EC (закрытого или только открытого).
+
+    Args:
+        kid: Идентификатор ключа
+        pem: Ключ в PEM
+
+    Returns:
+        SigningKey: Ключ связки
+
+    Raises:
+        ValueError: Если тип ключа не поддерживается
+    """
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ec, rsa
+    from jose import jwk
+
+    if b"PRIVATE KEY" in pem:
+        public_key = serialization.load_pem_private_key(pem, password=None).public_key()
+    else:
+        public_key = serialization.load_pem_public_key(pem)
+
+    if isinstance(public_key, rsa.RSAPublicKey):
+        algorithm = "RS256"
+    elif (
+        isinstance(public_key, ec.EllipticCurvePublicKey)
+        and public_key.curve.name in EC_ALGORITHMS
+    ):
+        algorithm = EC_ALGORITHMS[public_key.curve.name]
+    else:
+        raise ValueError(
+            f"JWT key {kid!r}: only RSA and EC P-256/P-384/P-521 keys are supported"
+        )
+
+    verifier = jwk.construct(public_key, algorithm)
+    signer = jwk.construct(pem, algorithm) if b"PRIVATE KEY" in pem else None
+    public_jwk = {**verifier.to_dict(), "kid": kid, "use": "sig"}
+    return SigningKey(kid, algorithm, verifier, signer, public_jwk)
+
+
+class KeyRing:
+    """
+    Ключи по kid, активный ключ подписи и готовый ответ JWKS.
+
+    Args:
+        keys: kid -> ключ
+        active_kid: Ключ подписи новых токенов (None - подпись SECRET_KEY)
+
+    Raises:
+        ValueError: Если активного ключа нет в связке или он без закрытой части
+    """
+
+    def __init__(self, keys: Dict[str, SigningKey], active_kid: Optional[str]):
+        if active_kid is not None and (
+            active_kid not in keys or keys[active_kid].signer is None
+        ):
+            raise ValueError(
+                f"JWT_ACTIVE_KID {active_kid!r} must name a private key in JWT_KEYS"
+            )
+
+        self.keys = keys
+        self.active = keys[active_kid] if active_kid is not None else None
+        # Тело и ETag JWKS считаются один раз: ключи меняются только с настройками
+        self.jwks = json.dumps(
+            {"keys": [key.jwk for key in keys.values()]}, separators=(",", ":")
+        ).encode()
+        self.etag = f'"{hashlib.sha256(self.jwks).hexdigest()[:32]}"'
+
+    @classmethod
+    def from_settings(cls) -> "KeyRing":
+        """
+        Загружает ключи из JWT_KEYS и JWT_ACTIVE_KID.
+
+        Returns:
+            KeyRing: Связка ключей
+        """
+        keys = {
+            kid: load_key(kid, read_pem(value))
+            for kid, value in settings.JWT_KEYS.items()
+        }
+        return cls(keys, settings.JWT_ACTIVE_KID)
+
+    def get(self, kid: str) -> Optional[SigningKey]:
+        """
+        Ключ проверки по kid.
+
+        Args:
+            kid: Заголовок kid токена
+
+        Returns:
+            Optional[SigningKey]: Ключ или None, если он не в связке
+        """
+        return self.keys.get(kid)
+
+
+@lru_cache(maxsize=None)
+def get_key_ring() -> KeyRing:
+    """
+    Связка ключей процесса (загружается при первом вызове, см. lifespan).
+
+    Returns:
+        KeyRing: Связка ключей из настроек
+    """
+    return KeyRing.from_settings()
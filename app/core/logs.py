@@ -0,0 +1,254 @@
+"""
+Структурированное логирование и access-лог запросов.
+
+Обработчики с вводом-выводом работают в отдельном потоке QueueListener:
+в event loop запись лога - это подготовка записи и queue.put_nowait.
+Контекст запроса (ID запроса, пользователь, маршрут, время и число
+запросов к БД) хранится в contextvar и добавляется ко всем записям,
+сделанным во время обработки запроса.
+"""
+
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import re
+import sys
+import time
+import uuid
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Optional, TextIO
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+access_logger = logging.getLogger("app.access")
+
+# Атрибуты стандартной LogRecord - остальные пришли через extra
+_RECORD_ATTRS = frozenset(
+    vars(logging.LogRecord("", 0, "", 0, "", (), None)).keys()
+) | {"message", "asctime"}
+
+# Допустимый ID запроса от клиента или прокси
+_REQUEST_ID = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+
+
+@dataclass
+class RequestContext:
+    """Данные текущего запроса для логов."""
+
+    request_id: str
+    user_id: Optional[int] = None
+    db_time: float = 0.0
+    db_queries: int = 0
+
+
+request_context: ContextVar[Optional[RequestContext]] = ContextVar(
+    "request_context", default=None
+)
+
+
+def set_user_id(user_id: int) -> None:
+    """
+    Запоминает пользователя текущего запроса для логов.
+
+    Args:
+        user_id: ID аутентифицированного пользователя
+    """
+    context = request_context.get()
+    if context is not None:
+        context.user_id = user_id
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _query_started(conn, cursor, statement, parameters, context, executemany):
+    if request_context.get() is not None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _query_finished(conn, cursor, statement, parameters, context, executemany):
+    request = request_context.get()
+    started = conn.info.get("query_started")
+    if request is not None and started:
+        request.db_time += time.perf_counter() - started.pop()
+        request.db_queries += 1
+
+
+class ContextFilter(logging.Filter):
+    """Добавляет к записи ID запроса и пользователя (в потоке вызова)."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = request_context.get()
+        if context is not None:
+            record.request_id = context.request_id
+            if context.user_id is not None:
+                record.user_id = context.user_id
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Форматирует запись одной строкой JSON, включая поля из extra."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data: dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                data[key] = value
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data["exc_info"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler, откладывающий форматирование до потока записи.
+
+    В потоке вызова только подставляются аргументы сообщения
+    и текст исключения; JSON собирается в QueueListener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def setup_logging(
+    level: str = "INFO", json_format: bool = True, stream: Optional[TextIO] = None
+) -> None:
+    """
+    Настраивает корневой логгер: очередь в памяти и поток записи в stdout.
+
+    Повторный вызов перенастраивает логирование.
+
+    Args:
+        level: Уровень корневого логгера
+        json_format: JSON (True) или обычный текст
+        stream: Куда писать (по умолчанию stdout)
+    """
+    global _listener
+    shutdown_logging()
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(
+        JsonFormatter()
+        if json_format
+        else logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s")
+    )
+    records: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    handler = _QueueHandler(records)
+    handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(records, output)
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """Дописывает записи из очереди и останавливает поток записи."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class AccessLogMiddleware:
+    """
+    Middleware access-лога: одна запись на запрос.
+
+    Ошибки (статус >= 400) и медленные запросы пишутся всегда,
+    успешные - с вероятностью sample_rate. ID запроса берется из
+    заголовка X-Request-ID или генерируется и возвращается в ответе.
+
+    Args:
+        app: ASGI-приложение
+        sample_rate: Доля успешных запросов в логе (0..1)
+        slow_request_ms: Порог медленного запроса в миллисекундах
+    """
+
+    def __init__(
+        self, app: ASGIApp, sample_rate: float = 1.0, slow_request_ms: float = 1000.0
+    ) -> None:
+        self.app = app
+        self.sample_rate = sample_rate
+        self.slow_request = slow_request_ms / 1000
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = next(
+            (
+                value.decode("latin-1")
+                for name, value in scope["headers"]
+                if name == b"x-request-id"
+            ),
+            "",
+        )
+        if not _REQUEST_ID.match(request_id):
+            request_id = uuid.uuid4().hex
+        context = RequestContext(request_id=request_id)
+        token = request_context.set(context)
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_with_id(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                MutableHeaders(scope=message)["X-Request-ID"] = request_id
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            duration = time.perf_counter() - started
+            if (
+                status_code >= 400
+                or duration >= self.slow_request
+                or random.random() < self.sample_rate
+            ):
+                route = scope.get("route")
+                access_logger.info(
+                    "%s %s %d",
+                    scope["method"],
+                    scope["path"],
+                    status_code,
+                    extra={
+                        "request_id": request_id,
+                        "user_id": context.user_id,
+                        "method": scope["method"],
+                        "path": scope["path"],
+                        "route": getattr(route, "path", None),
+                        "status": status_code,
+                        "duration_ms": round(duration * 1000, 3),
+                        "db_time_ms": round(context.db_time * 1000, 3),
+                        "db_queries": context.db_queries,
+                    },
+                )
+            request_context.reset(token)
@@ -0,0 +1,400 @@
+"""
+Сэмплирующий профилировщик запросов и всего воркера.
+
+Отдельный поток с заданным интервалом снимает стеки через
+sys._current_frames(), поэтому код приложения не инструментируется.
+Поток работает только пока идет хотя бы один сбор: без активных
+профилей накладные расходы - проверка счетчика в middleware.
+
+Для запроса учитывается и время ожидания: если корутина запроса
+не выполняется, стек строится по цепочке cr_await до точки await.
+Профили хранятся в кольцевом буфере и выгружаются в форматах
+speedscope (JSON) и collapsed stacks (flamegraph.pl, inferno).
+"""
+
+import abc
+import asyncio
+import hmac
+import itertools
+import sys
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from types import FrameType
+from typing import Any, Deque, Dict, Iterator, List, Optional, Set, Tuple
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+
+# Кадр стека: (функция, файл, строка начала функции)
+StackFrame = Tuple[str, str, int]
+Stack = Tuple[StackFrame, ...]
+
+# Запрос ждет ввода-вывода или другой корутины
+AWAIT_FRAME: StackFrame = ("<await>", "", 0)
+
+
+def _frame_key(frame: FrameType) -> StackFrame:
+    code = frame.f_code
+    return (code.co_qualname, code.co_filename, code.co_firstlineno)
+
+
+def _thread_stack(frame: Optional[FrameType], stop: Optional[FrameType]) -> Stack:
+    """Стек от stop (или корня) до frame."""
+    frames = []
+    while frame is not None:
+        frames.append(_frame_key(frame))
+        if frame is stop:
+            break
+        frame = frame.f_back
+    frames.reverse()
+    return tuple(frames)
+
+
+def _await_chain(awaitable: Any) -> Iterator[FrameType]:
+    """Кадры приостановленных корутин по цепочке await."""
+    while awaitable is not None:
+        frame = getattr(awaitable, "cr_frame", None) or getattr(
+            awaitable, "gi_frame", None
+        )
+        if frame is None:
+            return
+        yield frame
+        awaitable = getattr(awaitable, "cr_await", None) or getattr(
+            awaitable, "gi_yieldfrom", None
+        )
+
+
+@dataclass
+class Profile:
+    """Результат профилирования: число сэмплов по стекам."""
+
+    id: int
+    name: str
+    interval: float
+    started_at: datetime = field(default_factory=datetime.now)
+    duration: float = 0.0
+    samples: Counter = field(default_factory=Counter)
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Описание профиля без стеков.
+
+        Returns:
+            Dict[str, Any]: ID, имя, время начала, длительность и число сэмплов
+        """
+        return {
+            "id": self.id,
+            "name": self.name,
+            "started_at": self.started_at.isoformat(),
+            "duration": round(self.duration, 6),
+            "samples": sum(self.samples.values()),
+        }
+
+    def to_collapsed(self) -> str:
+        """
+        Экспорт в формат collapsed stacks ("a;b;c 12" на строку).
+
+        Returns:
+            str: Текст для flamegraph.pl / inferno / speedscope
+        """
+        return "".join(
+            ";".join(name for name, _, _ in stack) + f" {count}\n"
+            for stack, count in self.samples.most_common()
+        )
+
+    def to_speedscope(self) -> Dict[str, Any]:
+        """
+        Экспорт в формат speedscope (тип профиля sampled, вес - секунды).
+
+        Returns:
+            Dict[str, Any]: JSON для https://www.speedscope.app
+        """
+        index: Dict[StackFrame, int] = {}
+        samples, weights = [], []
+        for stack, count in self.samples.items():
+            samples.append([index.setdefault(frame, len(index)) for frame in stack])
+            weights.append(count * self.interval)
+
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": self.name,
+            "exporter": "notes-api",
+            "shared": {
+                "frames": [
+                    {"name": name, "file": file, "line": line}
+                    for name, file, line in index
+                ]
+            },
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": self.name,
+                    "unit": "seconds",
+                    "startValue": 0,
+                    "endValue": sum(weights),
+                    "samples": samples,
+                    "weights": weights,
+                }
+            ],
+        }
+
+
+class _Capture(abc.ABC):
+    """Активный сбор сэмплов в профиль."""
+
+    def __init__(self, profile: Profile) -> None:
+        self.profile = profile
+        self.started = time.perf_counter()
+
+    @abc.abstractmethod
+    def sample(self, frames: Dict[int, FrameType]) -> None:
+        """
+        Добавляет в профиль стеки из одного снимка потоков.
+
+        Args:
+            frames: Текущие кадры потоков (sys._current_frames())
+        """
+
+
+class _RequestCapture(_Capture):
+    """Сбор стеков одного запроса (корутины с кадром anchor)."""
+
+    def __init__(self, profile: Profile, anchor: FrameType, task: asyncio.Task) -> None:
+        super().__init__(profile)
+        self.anchor = anchor
+        self.task = task
+        self.thread_id = threading.get_ident()
+
+    def sample(self, frames: Dict[int, FrameType]) -> None:
+        frame = frames.get(self.thread_id)
+        while frame is not None and frame is not self.anchor:
+            frame = frame.f_back
+        if frame is not None:
+            # Запрос выполняется на CPU
+            stack = _thread_stack(frames[self.thread_id], self.anchor)
+        else:
+            chain = list(_await_chain(self.task.get_coro()))
+            if self.anchor not in chain:
+                return
+            stack = tuple(
+                _frame_key(frame) for frame in chain[chain.index(self.anchor) :]
+            ) + (AWAIT_FRAME,)
+        self.profile.samples[stack] += 1
+
+
+class _WorkerCapture(_Capture):
+    """Сбор стеков всех потоков процесса."""
+
+    def sample(self, frames: Dict[int, FrameType]) -> None:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        sampler = threading.get_ident()
+        for thread_id, frame in frames.items():
+            if thread_id == sampler:
+                continue
+            thread = (f"thread {names.get(thread_id, thread_id)}", "", 0)
+            self.profile.samples[(thread,) + _thread_stack(frame, None)] += 1
+
+
+class Profiler:
+    """
+    Сэмплирующий профилировщик с кольцевым буфером профилей.
+
+    Args:
+        interval: Интервал между сэмплами в секундах
+        buffer_size: Сколько последних профилей хранить
+        sample_rate: Профилировать каждый N-й запрос (0 - только по заголовку)
+        header: Заголовок, включающий профилирование запроса
+        header_secret: Значение заголовка, без которого он не действует
+            (None - профилирование по заголовку выключено)
+        max_concurrent: Максимум одновременно профилируемых запросов
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.005,
+        buffer_size: int = 50,
+        sample_rate: int = 0,
+        header: str = "X-Profile",
+        header_secret: Optional[str] = None,
+        max_concurrent: int = 4,
+    ) -> None:
+        self.interval = interval
+        self.sample_rate = sample_rate
+        self.header = header.lower().encode("latin-1")
+        self.header_secret = (
+            header_secret.encode("latin-1") if header_secret is not None else None
+        )
+        self.max_concurrent = max_concurrent
+        self._profiles: Deque[Profile] = deque(maxlen=buffer_size)
+        self._ids = itertools.count(1)
+        self._requests = itertools.count(1)
+        self._captures: Set[_Capture] = set()
+        self._active_requests = 0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def should_profile(self, scope: Scope) -> bool:
+        """
+        Нужно ли профилировать запрос (по заголовку или 1 из N).
+
+        Заголовок проверяется до аутентификации, поэтому действует только
+        с секретным значением: иначе любой клиент занимал бы слоты
+        профилирования и замедлял воркер.
+
+        Args:
+            scope: ASGI scope запроса
+
+        Returns:
+            bool: True, если запрос профилируется
+        """
+        if self._active_requests >= self.max_concurrent:
+            return False
+        if self.sample_rate and next(self._requests) % self.sample_rate == 0:
+            return True
+        if self.header_secret is None:
+            return False
+        return any(
+            name == self.header and hmac.compare_digest(value, self.header_secret)
+            for name, value in scope["headers"]
+        )
+
+    def start_request(self, name: str, anchor: FrameType) -> Profile:
+        """
+        Начинает профилирование запроса текущей задачи asyncio.
+
+        Args:
+            name: Имя профиля (метод и путь)
+            anchor: Кадр, с которого начинаются стеки запроса
+
+        Returns:
+            Profile: Профиль (заполняется до stop)
+        """
+        profile = Profile(id=next(self._ids), name=name, interval=self.interval)
+        capture = _RequestCapture(profile, anchor, asyncio.current_task())
+        self._active_requests += 1
+        self._start(capture)
+        return profile
+
+    def stop_request(self, profile: Profile) -> None:
+        """
+        Завершает профилирование запроса и сохраняет профиль в буфер.
+
+        Args:
+            profile: Профиль из start_request
+        """
+        self._active_requests -= 1
+        self._stop(profile)
+
+    async def capture(self, seconds: float) -> Profile:
+        """
+        Профилирует все потоки воркера в течение заданного времени.
+
+        Args:
+            seconds: Длительность сбора
+
+        Returns:
+            Profile: Профиль (также сохраняется в буфер)
+        """
+        profile = Profile(
+            id=next(self._ids), name=f"worker {seconds:g}s", interval=self.interval
+        )
+        self._start(_WorkerCapture(profile))
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            self._stop(profile)
+        return profile
+
+    def profiles(self) -> List[Profile]:
+        """Сохраненные профили, новые первыми."""
+        return list(reversed(self._profiles))
+
+    def get(self, profile_id: int) -> Optional[Profile]:
+        """
+        Находит профиль в буфере.
+
+        Args:
+            profile_id: ID профиля
+
+        Returns:
+            Optional[Profile]: Профиль или None, если он вытеснен из буфера
+        """
+        return next((p for p in self._profiles if p.id == profile_id), None)
+
+    def _start(self, capture: _Capture) -> None:
+        with self._lock:
+            self._captures.add(capture)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="profiler", daemon=True
+                )
+                self._thread.start()
+
+    def _stop(self, profile: Profile) -> None:
+        with self._lock:
+            capture = next(c for c in self._captures if c.profile is profile)
+            self._captures.discard(capture)
+        profile.duration = time.perf_counter() - capture.started
+        self._profiles.append(profile)
+
+    def _run(self) -> None:
+        """Цикл потока сэмплирования; завершается, когда сборов нет."""
+        while True:
+            with self._lock:
+                if not self._captures:
+                    self._thread = None
+                    return
+                captures = list(self._captures)
+
+            frames = sys._current_frames()
+            for capture in captures:
+                capture.sample(frames)
+            del frames
+            time.sleep(self.interval)
+
+
+class ProfilingMiddleware:
+    """
+    Middleware, профилирующее выбранные запросы.
+
+    ID профиля возвращается в заголовке X-Profile-Id.
+    """
+
+    def __init__(self, app: ASGIApp, profiler: Profiler) -> None:
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.profiler.should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = self.profiler.start_request(
+            f"{scope['method']} {scope['path']}", sys._getframe()
+        )
+
+        async def send_with_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers["X-Profile-Id"] = str(profile.id)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            self.profiler.stop_request(profile)
+
+
+profiler = Profiler(
+    interval=settings.PROFILING_INTERVAL,
+    buffer_size=settings.PROFILING_BUFFER_SIZE,
+    sample_rate=settings.PROFILING_SAMPLE_RATE,
+    header=settings.PROFILING_HEADER,
+    header_secret=settings.PROFILING_HEADER_SECRET,
+    max_concurrent=settings.PROFILING_MAX_CONCURRENT,
+)
@@ -1,15 +1,32 @@
 """
 Утилиты для безопасности: JWT и хеширование паролей.
+
+python-jose (с бэкендом cryptography) и passlib импортируются при первом
+использовании: запуск приложения и CLI не платят за их загрузку.
+Ключи подписи JWT - в app/core/keys.py.
 """
 
 from datetime import datetime, timedelta
-from typing import Optional
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+from functools import lru_cache
+from typing import TYPE_CHECKING, Optional
 from app.core.config import settings
+from app.core.keys import get_key_ring
+
+if TYPE_CHECKING:
+    from passlib.context import CryptContext
+
+
+@lru_cache(maxsize=None)
+def get_pwd_context() -> "CryptContext":
+    """
+    Контекст для хеширования паролей (создается при первом вызове).
+
+    Returns:
+        CryptContext: Контекст passlib с bcrypt
+    """
+    from passlib.context import CryptContext
 
-# Контекст для хеширования паролей
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -23,7 +40,7 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     Returns:
         bool: True если пароль верный
     """
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
@@ -36,13 +53,29 @@ def get_password_hash(password: str) -> str:
     Returns:
         str: Хешированный пароль
     """
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
+
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """
+    Проверяет, устарели ли параметры хеша (схема или число раундов).
+
+    Args:
+        hashed_password: Хешированный пароль
+
+    Returns:
+        bool: True если хеш нужно пересчитать
+    """
+    return get_pwd_context().needs_update(hashed_password)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """
     Создает JWT токен доступа.
 
+    Токен подписывается активным ключом связки (с заголовком kid),
+    а если он не задан - SECRET_KEY.
+
     Args:
         data: Данные для кодирования в токен
         expires_delta: Время жизни токена
@@ -50,6 +83,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     Returns:
         str: Закодированный JWT токен
     """
+    from jose import jwt
+
     to_encode = data.copy()
 
     if expires_delta:
@@ -60,6 +95,12 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
         )
 
     to_encode.update({"exp": expire})
+    key = get_key_ring().active
+    if key is not None:
+        return jwt.encode(
+            to_encode, key.signer, algorithm=key.algorithm, headers={"kid": key.kid}
+        )
+
     encoded_jwt = jwt.encode(
         to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM
     )
@@ -71,16 +112,33 @@ def decode_access_token(token: str) -> Optional[dict]:
     """
     Декодирует и проверяет JWT токен.
 
+    Ключ выбирается по заголовку kid, и разрешен только его алгоритм.
+    Токены без kid проверяются SECRET_KEY, пока включен
+    JWT_ACCEPT_SECRET_KEY.
+
     Args:
         token: JWT токен для проверки
 
     Returns:
         Optional[dict]: Данные из токена или None если токен невалидный
     """
+    from jose import JWTError, jwt
+
     try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-        )
+        kid = jwt.get_unverified_header(token).get("kid")
+        if kid is not None and not isinstance(kid, str):
+            return None
+        if kid is None:
+            if not settings.JWT_ACCEPT_SECRET_KEY:
+                return None
+            key, algorithm = settings.SECRET_KEY, settings.ALGORITHM
+        else:
+            signing_key = get_key_ring().get(kid)
+            if signing_key is None:
+                return None
+            key, algorithm = signing_key.verifier, signing_key.algorithm
+
+        payload = jwt.decode(token, key, algorithms=[algorithm])
         return payload
     except JWTError:
         return None
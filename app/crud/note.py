@@ -2,18 +2,46 @@
 CRUD операции для заметок.
 """
 
-from typing import Optional, List
+from typing import Any, Callable, Dict, Optional, List, Sequence
 
-from sqlalchemy import select
+from sqlalchemy import delete, lambda_stmt, select, union_all, update
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
+from sqlalchemy.orm.exc import StaleDataError
 
-from app.db.models import Note
+from app.crud.note_stats import note_stats
+from app.crud.note_tag import NoteTagCRUD
+from app.db.models import ArchivedNote, Note
+from app.services.change_feed import change_feed
+from app.services.revisions import remove_history, revision_recorder
 from app.schemas.note import NoteCreate, NoteUpdate
 
 
 class NoteCRUD:
     """CRUD операции для модели Note."""
 
+    @staticmethod
+    async def _notify(db: AsyncSession, change_type: str, db_note: Note) -> None:
+        """
+        Публикует событие изменения заметки в ленту изменений.
+
+        Args:
+            db: Сессия БД
+            change_type: Тип события
+            db_note: Измененная заметка
+        """
+        await change_feed.notify(
+            db,
+            {
+                "type": change_type,
+                "note_id": db_note.id,
+                "owner_id": db_note.owner_id,
+                "updated_at": (
+                    db_note.updated_at.isoformat() if db_note.updated_at else None
+                ),
+            },
+        )
+
     @staticmethod
     async def get_by_id(
         db: AsyncSession, note_id: int, owner_id: Optional[int] = None
@@ -29,10 +57,12 @@ class NoteCRUD:
         Returns:
             Optional[Note]: Объект заметки или None
         """
-        query = select(Note).where(Note.id == note_id)
+        # Lambda-запрос строится и компилируется один раз, дальше
+        # подставляются только параметры
+        query = lambda_stmt(lambda: select(Note).where(Note.id == note_id))
 
         if owner_id:
-            query = query.where(Note.owner_id == owner_id)
+            query += lambda s: s.where(Note.owner_id == owner_id)
 
         result = await db.execute(query)
         return result.scalar_one_or_none()
@@ -53,8 +83,40 @@ class NoteCRUD:
         Returns:
             List[Note]: Список заметок
         """
+        result = await db.execute(
+            lambda_stmt(
+                lambda: select(Note)
+                .where(Note.owner_id == owner_id)
+                .order_by(Note.created_at.desc())
+                .offset(skip)
+                .limit(limit)
+            )
+        )
+
+        return result.scalars().all()
+
+    @staticmethod
+    async def get_multi_summary(
+        db: AsyncSession, owner_id: int, skip: int = 0, limit: int = 100
+    ) -> List[Note]:
+        """
+        Получает краткий список заметок пользователя без содержимого.
+
+        Колонка content не выбирается: в ответ идут только заголовок,
+        время изменения и заранее вычисленное превью.
+
+        Args:
+            db: Сессия БД
+            owner_id: ID владельца
+            skip: Сколько записей пропустить
+            limit: Максимальное количество записей
+
+        Returns:
+            List[Note]: Список частично загруженных заметок
+        """
         result = await db.execute(
             select(Note)
+            .options(load_only(Note.id, Note.title, Note.updated_at, Note.preview))
             .where(Note.owner_id == owner_id)
             .order_by(Note.created_at.desc())
             .offset(skip)
@@ -64,7 +126,112 @@ class NoteCRUD:
         return result.scalars().all()
 
     @staticmethod
-    async def create(db: AsyncSession, note_in: NoteCreate, owner_id: int) -> Note:
+    async def get_by_id_fields(
+        db: AsyncSession,
+        note_id: int,
+        owner_id: int,
+        fields: Sequence[str],
+        include_archived: bool = True,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Получает только указанные колонки заметки по ID.
+
+        Args:
+            db: Сессия БД
+            note_id: ID заметки
+            owner_id: ID владельца
+            fields: Имена колонок Note
+            include_archived: Искать ли в архиве, если в notes заметки нет
+
+        Returns:
+            Optional[Dict[str, Any]]: Значения колонок или None
+        """
+        models = (Note, ArchivedNote) if include_archived else (Note,)
+
+        for model in models:
+            result = await db.execute(
+                select(*(getattr(model, field) for field in fields)).where(
+                    model.id == note_id, model.owner_id == owner_id
+                )
+            )
+            row = result.mappings().one_or_none()
+            if row is not None:
+                return dict(row)
+
+        return None
+
+    @staticmethod
+    async def get_multi_fields(
+        db: AsyncSession,
+        owner_id: int,
+        fields: Sequence[str],
+        skip: int = 0,
+        limit: int = 100,
+        include_archived: bool = False,
+        tags: Optional[Sequence[str]] = None,
+        match_all: bool = True,
+    ) -> List[Dict[str, Any]]:
+        """
+        Получает список заметок, выбирая только указанные колонки.
+
+        ORM-объекты не создаются: строки возвращаются как словари.
+        С include_archived горячая и архивная таблицы объединяются
+        через UNION ALL с общей сортировкой.
+
+        Args:
+            db: Сессия БД
+            owner_id: ID владельца
+            fields: Имена колонок Note
+            skip: Сколько записей пропустить
+            limit: Максимальное количество записей
+            include_archived: Включать ли архивные заметки
+            tags: Только заметки с этими тегами
+            match_all: Нужны все теги (AND) или любой из них (OR)
+
+        Returns:
+            List[Dict[str, Any]]: Значения колонок по каждой заметке
+        """
+        note_filter = [Note.owner_id == owner_id]
+        archive_filter = [ArchivedNote.owner_id == owner_id]
+        if tags:
+            tagged = NoteTagCRUD.tagged_note_ids(owner_id, tags, match_all)
+            note_filter.append(Note.id.in_(tagged))
+            archive_filter.append(ArchivedNote.id.in_(tagged))
+
+        if not include_archived:
+            result = await db.execute(
+                select(*(getattr(Note, field) for field in fields))
+                .where(*note_filter)
+                .order_by(Note.created_at.desc())
+                .offset(skip)
+                .limit(limit)
+            )
+            return [dict(row) for row in result.mappings()]
+
+        # created_at нужен для сортировки, даже если не запрошен
+        columns = list(fields) + ([] if "created_at" in fields else ["created_at"])
+        notes = union_all(
+            select(*(getattr(Note, column) for column in columns)).where(*note_filter),
+            select(*(getattr(ArchivedNote, column) for column in columns)).where(
+                *archive_filter
+            ),
+        ).subquery()
+
+        result = await db.execute(
+            select(*(notes.c[field] for field in fields))
+            .order_by(notes.c.created_at.desc())
+            .offset(skip)
+            .limit(limit)
+        )
+        return [dict(row) for row in result.mappings()]
+
+    @staticmethod
+    async def create(
+        db: AsyncSession,
+        note_in: NoteCreate,
+        owner_id: int,
+        before_commit: Optional[Callable[[Note], None]] = None,
+    ) -> Note:
         """
         Создает новую заметку.
 
@@ -72,6 +239,8 @@ class NoteCRUD:
             db: Сессия БД
             note_in: Данные для создания заметки
             owner_id: ID владельца
+            before_commit: Вызывается с заметкой перед коммитом (изменения
+                в сессии попадают в ту же транзакцию)
 
         Returns:
             Note: Созданная заметка
@@ -79,46 +248,240 @@ class NoteCRUD:
         db_note = Note(**note_in.model_dump(), owner_id=owner_id)
 
         db.add(db_note)
+        await db.flush()
+        await note_stats.apply(
+            db,
+            owner_id,
+            notes=1,
+            content_bytes=note_stats.content_size(db_note.content),
+        )
+        await NoteCRUD._notify(db, "note.created", db_note)
+        if before_commit is not None:
+            before_commit(db_note)
         await db.commit()
         await db.refresh(db_note)
+        revision_recorder.record(db, db_note, has_base=False)
 
         return db_note
 
     @staticmethod
-    async def update(db: AsyncSession, db_note: Note, note_in: NoteUpdate) -> Note:
+    async def create_many(
+        db: AsyncSession,
+        notes_in: Sequence[NoteCreate],
+        owner_id: int,
+        before_commit: Optional[Callable[[List[Note]], None]] = None,
+    ) -> List[Note]:
         """
-        Обновляет заметку.
+        Создает несколько заметок в одной транзакции.
 
         Args:
             db: Сессия БД
-            db_note: Существующая заметка
-            note_in: Новые данные
+            notes_in: Данные для создания заметок
+            owner_id: ID владельца
+            before_commit: Вызывается с заметками перед коммитом (изменения
+                в сессии попадают в ту же транзакцию)
 
         Returns:
-            Note: Обновленная заметка
+            List[Note]: Созданные заметки
         """
-        update_data = note_in.model_dump(exclude_unset=True)
+        db_notes = [
+            Note(**note_in.model_dump(), owner_id=owner_id) for note_in in notes_in
+        ]
 
-        for field, value in update_data.items():
-            setattr(db_note, field, value)
+        db.add_all(db_notes)
+        await db.flush()
+        await note_stats.apply(
+            db,
+            owner_id,
+            notes=len(db_notes),
+            content_bytes=sum(note_stats.content_size(n.content) for n in db_notes),
+        )
+        for db_note in db_notes:
+            await NoteCRUD._notify(db, "note.created", db_note)
+        if before_commit is not None:
+            before_commit(db_notes)
+        await db.commit()
+        for db_note in db_notes:
+            revision_recorder.record(db, db_note, has_base=False)
 
-        db.add(db_note)
+        return db_notes
+
+    @staticmethod
+    async def _check_conflict(
+        db: AsyncSession,
+        table: Any,
+        note_id: int,
+        owner_id: int,
+        version: Optional[int],
+    ) -> None:
+        """
+        Разбирает запись, не затронувшую ни одной строки.
+
+        Вызывается только после неудачной записи: если заметка есть,
+        но версия другая, транзакция откатывается.
+
+        Args:
+            db: Сессия БД
+            table: Таблица notes или notes_archive
+            note_id: ID заметки
+            owner_id: ID владельца
+            version: Ожидаемая версия (None - записи без проверки версии)
+
+        Raises:
+            StaleDataError: Если заметка существует с другой версией
+        """
+        if version is None:
+            return
+
+        result = await db.execute(
+            select(table.c.version).where(
+                table.c.id == note_id, table.c.owner_id == owner_id
+            )
+        )
+        current = result.scalar_one_or_none()
+        if current is not None:
+            await db.rollback()
+            raise StaleDataError(
+                f"Note {note_id} has version {current}, expected {version}"
+            )
+
+    @staticmethod
+    async def update_owned(
+        db: AsyncSession, note_id: int, owner_id: int, note_in: NoteUpdate
+    ) -> Optional[Note]:
+        """
+        Обновляет заметку владельца одним UPDATE ... RETURNING.
+
+        Заметка не загружается заранее: условие на владельца и версию
+        входит в WHERE, а новая строка возвращается тем же запросом.
+        Для статистики нужен старый размер содержимого: в Postgres он
+        читается в том же запросе из CTE с FOR UPDATE, SQLite старых
+        значений в RETURNING не видит - там это отдельный SELECT.
+
+        Args:
+            db: Сессия БД
+            note_id: ID заметки
+            owner_id: ID владельца
+            note_in: Новые данные и ожидаемая версия
+
+        Returns:
+            Optional[Note]: Обновленная заметка или None, если ее нет
+
+        Raises:
+            StaleDataError: Если версия не совпала (транзакция откатывается)
+        """
+        notes = Note.__table__
+        values = note_in.model_dump(exclude_unset=True, exclude={"version"})
+        if "content" in values:
+            values["preview"] = Note.make_preview(values["content"])
+
+        where = [notes.c.id == note_id, notes.c.owner_id == owner_id]
+        if note_in.version is not None:
+            where.append(notes.c.version == note_in.version)
+        stmt = update(notes).where(*where).values(**values, version=notes.c.version + 1)
+
+        returning: List[Any] = [Note]
+        old_content: Optional[str] = None
+        if "content" not in values:
+            stmt = stmt.returning(*notes.c)
+        elif db.get_bind().dialect.name == "postgresql":
+            old = (
+                select(notes.c.id, notes.c.owner_id, notes.c.content)
+                .where(*where)
+                .with_for_update()
+                .cte("old")
+                .prefix_with("MATERIALIZED")
+            )
+            old_column = old.c.content.label("old_content")
+            returning.append(old_column)
+            stmt = stmt.where(
+                old.c.id == notes.c.id, old.c.owner_id == notes.c.owner_id
+            ).returning(*notes.c, old_column)
+        else:
+            result = await db.execute(select(notes.c.content).where(*where))
+            old_row = result.one_or_none()
+            if old_row is None:
+                await NoteCRUD._check_conflict(
+                    db, notes, note_id, owner_id, note_in.version
+                )
+                return None
+            old_content = old_row[0]
+            stmt = stmt.returning(*notes.c)
+
+        result = await db.execute(
+            select(*returning)
+            .from_statement(stmt)
+            .execution_options(populate_existing=True)
+        )
+        row = result.one_or_none()
+        if row is None:
+            await NoteCRUD._check_conflict(
+                db, notes, note_id, owner_id, note_in.version
+            )
+            return None
+
+        db_note = row[0]
+        if len(row) > 1:
+            old_content = row[1]
+        if "content" in values:
+            await note_stats.apply(
+                db,
+                owner_id,
+                content_bytes=note_stats.content_size(db_note.content)
+                - note_stats.content_size(old_content),
+            )
+        else:
+            # Содержимое не менялось: предыдущая версия с тем же текстом
+            old_content = db_note.content
+            await note_stats.apply(db, owner_id, content_bytes=0)
+        await NoteCRUD._notify(db, "note.updated", db_note)
         await db.commit()
-        await db.refresh(db_note)
+        revision_recorder.record(db, db_note, base_content=old_content)
 
         return db_note
 
     @staticmethod
-    async def delete(db: AsyncSession, db_note: Note) -> None:
+    async def delete_owned(
+        db: AsyncSession, note_id: int, owner_id: int, version: Optional[int] = None
+    ) -> bool:
         """
-        Удаляет заметку.
+        Удаляет заметку владельца одним DELETE ... RETURNING вместе с тегами.
 
         Args:
             db: Сессия БД
-            db_note: Заметка для удаления
+            note_id: ID заметки
+            owner_id: ID владельца
+            version: Ожидаемая версия (None - без проверки)
+
+        Returns:
+            bool: True, если заметка удалена, False - если ее нет
+
+        Raises:
+            StaleDataError: Если версия не совпала (транзакция откатывается)
         """
-        await db.delete(db_note)
+        notes = Note.__table__
+        where = [notes.c.id == note_id, notes.c.owner_id == owner_id]
+        if version is not None:
+            where.append(notes.c.version == version)
+
+        result = await db.execute(delete(notes).where(*where).returning(*notes.c))
+        deleted = result.one_or_none()
+        if deleted is None:
+            await NoteCRUD._check_conflict(db, notes, note_id, owner_id, version)
+            return False
+
+        await NoteTagCRUD.remove_note(db, owner_id, note_id)
+        await remove_history(db, owner_id, note_id)
+        await note_stats.apply(
+            db,
+            owner_id,
+            notes=-1,
+            content_bytes=-note_stats.content_size(deleted.content),
+        )
+        await NoteCRUD._notify(db, "note.deleted", deleted)
         await db.commit()
 
+        return True
+
 
 note = NoteCRUD()
@@ -0,0 +1,185 @@
+"""
+CRUD операции для архива заметок.
+"""
+
+from collections import Counter
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import delete, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.note import NoteCRUD
+from app.crud.note_stats import note_stats
+from app.crud.note_tag import NoteTagCRUD
+from app.db.models import ArchivedNote, Note
+from app.services.revisions import remove_history
+
+
+class NoteArchiveCRUD:
+    """CRUD операции для модели ArchivedNote."""
+
+    @staticmethod
+    async def get_by_id(
+        db: AsyncSession, note_id: int, owner_id: int
+    ) -> Optional[ArchivedNote]:
+        """
+        Получает архивную заметку по ID.
+
+        Args:
+            db: Сессия БД
+            note_id: ID заметки
+            owner_id: ID владельца
+
+        Returns:
+            Optional[ArchivedNote]: Архивная заметка или None
+        """
+        result = await db.execute(
+            select(ArchivedNote).where(
+                ArchivedNote.id == note_id, ArchivedNote.owner_id == owner_id
+            )
+        )
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def archive_stale(
+        db: AsyncSession, cutoff: datetime, batch_size: int = 500
+    ) -> int:
+        """
+        Переносит одну пачку заметок, не изменявшихся с cutoff, в архив.
+
+        Строки блокируются через FOR UPDATE SKIP LOCKED: заметки, которые
+        сейчас редактируются, пропускаются, а несколько воркеров не
+        конфликтуют друг с другом.
+
+        Args:
+            db: Сессия БД
+            cutoff: Заметки с updated_at раньше этой даты архивируются
+            batch_size: Размер пачки
+
+        Returns:
+            int: Количество перенесенных заметок
+        """
+        result = await db.execute(
+            select(Note)
+            .where(Note.updated_at < cutoff)
+            .order_by(Note.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        notes = result.scalars().all()
+
+        if not notes:
+            return 0
+
+        archived_at = datetime.now()
+        db.add_all(
+            [
+                ArchivedNote(
+                    id=db_note.id,
+                    title=db_note.title,
+                    content=db_note.content,
+                    preview=db_note.preview,
+                    owner_id=db_note.owner_id,
+                    created_at=db_note.created_at,
+                    updated_at=db_note.updated_at,
+                    version=db_note.version,
+                    archived_at=archived_at,
+                )
+                for db_note in notes
+            ]
+        )
+        # Пара (owner_id, id) позволяет Postgres удалять только из нужных секций
+        await db.execute(
+            delete(Note).where(
+                tuple_(Note.owner_id, Note.id).in_([(n.owner_id, n.id) for n in notes])
+            )
+        )
+        # Перенос в архив не считается изменением заметок
+        moved = Counter(db_note.owner_id for db_note in notes)
+        for owner_id, count in sorted(moved.items()):
+            await note_stats.apply(
+                db, owner_id, notes=-count, archived=count, touch=False
+            )
+        await db.commit()
+
+        return len(notes)
+
+    @staticmethod
+    async def restore(db: AsyncSession, note_id: int, owner_id: int) -> Optional[Note]:
+        """
+        Возвращает архивную заметку в горячую таблицу (без коммита).
+
+        Args:
+            db: Сессия БД
+            note_id: ID заметки
+            owner_id: ID владельца
+
+        Returns:
+            Optional[Note]: Восстановленная заметка или None
+        """
+        archived = await NoteArchiveCRUD.get_by_id(db, note_id, owner_id)
+        if archived is None:
+            return None
+
+        db_note = Note(
+            id=archived.id,
+            title=archived.title,
+            content=archived.content,
+            owner_id=archived.owner_id,
+            created_at=archived.created_at,
+            updated_at=archived.updated_at,
+            version=archived.version,
+        )
+        await db.delete(archived)
+        db.add(db_note)
+        await db.flush()
+        await note_stats.apply(db, owner_id, notes=1, archived=-1, touch=False)
+
+        return db_note
+
+    @staticmethod
+    async def delete_owned(
+        db: AsyncSession, note_id: int, owner_id: int, version: Optional[int] = None
+    ) -> bool:
+        """
+        Удаляет архивную заметку владельца одним DELETE ... RETURNING.
+
+        Args:
+            db: Сессия БД
+            note_id: ID заметки
+            owner_id: ID владельца
+            version: Ожидаемая версия (None - без проверки)
+
+        Returns:
+            bool: True, если заметка удалена, False - если ее нет
+
+        Raises:
+            StaleDataError: Если версия не совпала (транзакция откатывается)
+        """
+        archive = ArchivedNote.__table__
+        where = [archive.c.id == note_id, archive.c.owner_id == owner_id]
+        if version is not None:
+            where.append(archive.c.version == version)
+
+        result = await db.execute(delete(archive).where(*where).returning(*archive.c))
+        deleted = result.one_or_none()
+        if deleted is None:
+            await NoteCRUD._check_conflict(db, archive, note_id, owner_id, version)
+            return False
+
+        await NoteTagCRUD.remove_note(db, owner_id, note_id)
+        await remove_history(db, owner_id, note_id)
+        await note_stats.apply(
+            db,
+            owner_id,
+            archived=-1,
+            content_bytes=-note_stats.content_size(deleted.content),
+        )
+        await NoteCRUD._notify(db, "note.deleted", deleted)
+        await db.commit()
+
+        return True
+
+
+note_archive = NoteArchiveCRUD()
@@ -0,0 +1,357 @@
+"""
+CRUD операции для истории изменений заметок.
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Row, delete, exists, func, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.database import dialect_insert
+from app.db.models import ArchivedNote, Note, NoteRevision
+from app.utils.delta import apply_delta, encode_delta
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT = "snapshot"
+DELTA = "delta"
+
+# (owner_id, note_id, version)
+RevisionKey = Tuple[int, int, int]
+
+
+@dataclass
+class PendingRevision:
+    """
+    Версия заметки, ожидающая записи в историю.
+
+    Attributes:
+        owner_id: ID владельца
+        note_id: ID заметки
+        version: Новая версия заметки
+        title: Заголовок в этой версии
+        content: Содержимое в этой версии
+        created_at: Время изменения
+        base_content: Содержимое предыдущей версии (для дельты)
+        has_base: Известна ли предыдущая версия (False для новой заметки)
+    """
+
+    owner_id: int
+    note_id: int
+    version: int
+    title: str
+    content: Optional[str]
+    created_at: datetime
+    base_content: Optional[str] = None
+    has_base: bool = False
+
+
+@dataclass
+class RevisionContent:
+    """Восстановленная версия заметки."""
+
+    version: int
+    title: str
+    content: Optional[str]
+    created_at: datetime
+
+
+def build_revision_rows(
+    revisions: Sequence[PendingRevision],
+    depths: Dict[RevisionKey, int],
+    snapshot_every: int,
+) -> List[dict]:
+    """
+    Превращает версии в строки note_revisions: дельту или снимок.
+
+    Дельта пишется, только если предыдущая версия уже есть в истории
+    (или идет раньше в этой же пачке) и цепочка дельт после снимка
+    короче snapshot_every. Иначе, как и при пропуске версии, пишется
+    снимок, поэтому восстановление никогда не ссылается на отсутствующую
+    версию.
+
+    Args:
+        revisions: Версии для записи
+        depths: Ключ версии в истории -> число дельт после снимка
+        snapshot_every: Максимальная длина цепочки дельт
+
+    Returns:
+        List[dict]: Значения строк для INSERT
+    """
+    depths = dict(depths)
+    rows = []
+    for revision in sorted(revisions, key=lambda r: (r.owner_id, r.note_id, r.version)):
+        key = (revision.owner_id, revision.note_id, revision.version)
+        base_depth = depths.get(
+            (revision.owner_id, revision.note_id, revision.version - 1)
+        )
+
+        kind, data, depth = SNAPSHOT, revision.content, 0
+        if (
+            revision.has_base
+            and revision.content is not None
+            and base_depth is not None
+            and base_depth + 1 < snapshot_every
+        ):
+            delta = encode_delta(revision.base_content or "", revision.content)
+            if delta is not None:
+                kind, data, depth = DELTA, delta, base_depth + 1
+
+        rows.append(
+            {
+                "owner_id": revision.owner_id,
+                "note_id": revision.note_id,
+                "version": revision.version,
+                "title": revision.title,
+                "kind": kind,
+                "data": data,
+                "depth": depth,
+                "created_at": revision.created_at,
+            }
+        )
+        depths[key] = depth
+
+    return rows
+
+
+class NoteRevisionCRUD:
+    """CRUD операции для модели NoteRevision."""
+
+    @staticmethod
+    async def add_many(
+        db: AsyncSession, revisions: Sequence[PendingRevision], snapshot_every: int
+    ) -> int:
+        """
+        Записывает пачку версий одним INSERT и коммитит.
+
+        Глубина цепочек предыдущих версий читается одним запросом, дельты
+        считаются в отдельном потоке, чтобы не занимать цикл событий.
+        Уже записанные версии пропускаются (ON CONFLICT DO NOTHING).
+
+        Args:
+            db: Сессия шарда заметок
+            revisions: Версии для записи
+            snapshot_every: Максимальная длина цепочки дельт
+
+        Returns:
+            int: Количество записанных строк
+        """
+        if not revisions:
+            return 0
+
+        bases = {
+            (r.owner_id, r.note_id, r.version - 1) for r in revisions if r.has_base
+        }
+        depths: Dict[RevisionKey, int] = {}
+        if bases:
+            result = await db.execute(
+                select(
+                    NoteRevision.owner_id,
+                    NoteRevision.note_id,
+                    NoteRevision.version,
+                    NoteRevision.depth,
+                ).where(
+                    tuple_(
+                        NoteRevision.owner_id,
+                        NoteRevision.note_id,
+                        NoteRevision.version,
+                    ).in_(sorted(bases))
+                )
+            )
+            depths = {(o, n, v): depth for o, n, v, depth in result}
+
+        rows = await asyncio.to_thread(
+            build_revision_rows, revisions, depths, snapshot_every
+        )
+        insert = dialect_insert(db)(NoteRevision)
+        result = await db.execute(insert.values(rows).on_conflict_do_nothing())
+        await db.commit()
+
+        return int(result.rowcount)
+
+    @staticmethod
+    async def get_multi(
+        db: AsyncSession, owner_id: int, note_id: int, skip: int = 0, limit: int = 100
+    ) -> Sequence[Row]:
+        """
+        Получает версии заметки без содержимого, новые первыми.
+
+        Args:
+            db: Сессия БД
+            owner_id: ID владельца
+            note_id: ID заметки
+            skip: Сколько версий пропустить
+            limit: Максимальное количество версий
+
+        Returns:
+            Sequence[Row]: Строки (version, title, created_at)
+        """
+        result = await db.execute(
+            select(NoteRevision.version, NoteRevision.title, NoteRevision.created_at)
+            .where(NoteRevision.owner_id == owner_id, NoteRevision.note_id == note_id)
+            .order_by(NoteRevision.version.desc())
+            .offset(skip)
+            .limit(limit)
+        )
+        return result.all()
+
+    @staticmethod
+    async def get_content(
+        db: AsyncSession, owner_id: int, note_id: int, version: int
+    ) -> Optional[RevisionContent]:
+        """
+        Восстанавливает версию заметки: ближайший снимок и дельты после него.
+
+        Args:
+            db: Сессия БД
+            owner_id: ID владельца
+            note_id: ID заметки
+            version: Номер версии
+
+        Returns:
+            Optional[RevisionContent]: Версия или None, если ее нет в истории
+        """
+        note_filter = (
+            NoteRevision.owner_id == owner_id,
+            NoteRevision.note_id == note_id,
+        )
+        snapshot = (
+            select(func.max(NoteRevision.version))
+            .where(
+                *note_filter,
+                NoteRevision.kind == SNAPSHOT,
+                NoteRevision.version <= version,
+            )
+            .scalar_subquery()
+            # Та же таблица, что и во внешнем запросе: без корреляции
+            .correlate(None)
+        )
+        result = await db.execute(
+            select(NoteRevision)
+            .where(
+                *note_filter,
+                NoteRevision.version >= snapshot,
+                NoteRevision.version <= version,
+            )
+            .order_by(NoteRevision.version)
+        )
+        chain = result.scalars().all()
+        # Дельта без предыдущей версии не восстанавливается
+        if not chain or chain[-1].version - chain[0].version + 1 != len(chain):
+            return None
+        if chain[-1].version != version:
+            return None
+
+        content = chain[0].data
+        for revision in chain[1:]:
+            if revision.data is None:
+                return None
+            content = apply_delta(content or "", revision.data)
+
+        last = chain[-1]
+        return RevisionContent(last.version, last.title, content, last.created_at)
+
+    @staticmethod
+    async def remove_note(db: AsyncSession, owner_id: int, note_id: int) -> None:
+        """
+        Удаляет историю заметки (без коммита).
+
+        Args:
+            db: Сессия БД
+            owner_id: ID владельца
+            note_id: ID заметки
+        """
+        await db.execute(
+            delete(NoteRevision).where(
+                NoteRevision.owner_id == owner_id, NoteRevision.note_id == note_id
+            )
+        )
+
+    @staticmethod
+    async def compact(db: AsyncSession, keep: int, batch_size: int = 100) -> int:
+        """
+        Сжимает историю одной пачки заметок и коммитит.
+
+        У заметок с числом версий больше keep удаляются старые версии;
+        самая старая из оставшихся, если это дельта, переписывается
+        снимком. Если ее нельзя восстановить (цепочка разорвана), она
+        остается как есть. Заодно удаляется история заметок, удаленных до
+        записи пачки версий.
+
+        Args:
+            db: Сессия БД
+            keep: Сколько последних версий оставить у заметки
+            batch_size: Сколько заметок обработать
+
+        Returns:
+            int: Количество удаленных версий
+        """
+        result = await db.execute(
+            select(NoteRevision.owner_id, NoteRevision.note_id)
+            .group_by(NoteRevision.owner_id, NoteRevision.note_id)
+            .having(func.count() > keep)
+            .limit(batch_size)
+        )
+        removed = 0
+        for owner_id, note_id in result.all():
+            note_filter = (
+                NoteRevision.owner_id == owner_id,
+                NoteRevision.note_id == note_id,
+            )
+            oldest_kept = (
+                await db.execute(
+                    select(NoteRevision.version)
+                    .where(*note_filter)
+                    .order_by(NoteRevision.version.desc())
+                    .offset(keep - 1)
+                    .limit(1)
+                )
+            ).scalar_one()
+            revision = await NoteRevisionCRUD.get_content(
+                db, owner_id, note_id, oldest_kept
+            )
+            if revision is not None:
+                await db.execute(
+                    update(NoteRevision)
+                    .where(*note_filter, NoteRevision.version == oldest_kept)
+                    .values(kind=SNAPSHOT, data=revision.content, depth=0)
+                )
+            else:
+                # Цепочка уже разорвана: старые версии все равно удаляются,
+                # иначе заметка попадала бы в каждую пачку сжатия
+                logger.warning(
+                    "Revision chain of note %s (owner %s) is broken at version %s",
+                    note_id,
+                    owner_id,
+                    oldest_kept,
+                )
+            deleted = await db.execute(
+                delete(NoteRevision).where(
+                    *note_filter, NoteRevision.version < oldest_kept
+                )
+            )
+            removed += deleted.rowcount
+
+        orphans = await db.execute(
+            delete(NoteRevision).where(
+                ~exists().where(
+                    Note.owner_id == NoteRevision.owner_id,
+                    Note.id == NoteRevision.note_id,
+                ),
+                ~exists().where(
+                    ArchivedNote.owner_id == NoteRevision.owner_id,
+                    ArchivedNote.id == NoteRevision.note_id,
+                ),
+            )
+        )
+        removed += orphans.rowcount
+        await db.commit()
+
+        return removed
+
+
+note_revision = NoteRevisionCRUD()
@@ -0,0 +1,148 @@
+"""
+CRUD операции для статистики заметок пользователя.
+"""
+
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Optional, Tuple
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.database import dialect_insert
+from app.db.models import UserNoteStats
+from app.schemas.note import NoteStats
+
+# Ключ session.info: владельцы, чья статистика изменена в транзакции
+CHANGED_OWNERS_KEY = "note_stats_owners"
+
+
+class NoteStatsCRUD:
+    """
+    CRUD операции для модели UserNoteStats с кешем в процессе.
+
+    Счетчики меняются в транзакции, изменяющей заметки, поэтому всегда
+    согласованы с notes. Кеш сбрасывается после коммита изменений в этом
+    процессе; изменения из других воркеров видны не позже чем через TTL.
+    """
+
+    def __init__(self, cache_size: int = 10_000, ttl_seconds: float = 5.0) -> None:
+        self.cache_size = cache_size
+        self.ttl = ttl_seconds
+        self._cache: "OrderedDict[int, Tuple[float, NoteStats]]" = OrderedDict()
+
+    @staticmethod
+    def content_size(content: Optional[str]) -> int:
+        """
+        Размер содержимого заметки в байтах UTF-8.
+
+        Args:
+            content: Содержимое заметки
+
+        Returns:
+            int: Размер в байтах
+        """
+        return len(content.encode("utf-8")) if content else 0
+
+    async def get(self, db: AsyncSession, owner_id: int) -> NoteStats:
+        """
+        Получает статистику пользователя (из кеша или одной строкой по ключу).
+
+        Args:
+            db: Сессия БД
+            owner_id: ID владельца
+
+        Returns:
+            NoteStats: Статистика (нулевая, если заметок не было)
+        """
+        now = time.monotonic()
+        cached = self._cache.get(owner_id)
+        if cached is not None and cached[0] > now:
+            self._cache.move_to_end(owner_id)
+            return cached[1]
+
+        result = await db.execute(
+            select(UserNoteStats).where(UserNoteStats.owner_id == owner_id)
+        )
+        row = result.scalar_one_or_none()
+        stats = NoteStats.model_validate(row) if row is not None else NoteStats()
+
+        self._cache[owner_id] = (now + self.ttl, stats)
+        self._cache.move_to_end(owner_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+        return stats
+
+    async def apply(
+        self,
+        db: AsyncSession,
+        owner_id: int,
+        notes: int = 0,
+        archived: int = 0,
+        content_bytes: int = 0,
+        touch: bool = True,
+    ) -> None:
+        """
+        Изменяет статистику пользователя (без коммита).
+
+        Строка статистики блокируется до конца транзакции, поэтому
+        записи одного пользователя выполняются последовательно.
+
+        Args:
+            db: Сессия БД
+            owner_id: ID владельца
+            notes: Изменение количества заметок
+            archived: Изменение количества архивных заметок
+            content_bytes: Изменение размера содержимого
+            touch: Обновить ли время последнего изменения
+        """
+        insert = dialect_insert(db)(UserNoteStats)
+        values: dict[str, Any] = {
+            "owner_id": owner_id,
+            "note_count": notes,
+            "archived_count": archived,
+            "content_bytes": content_bytes,
+        }
+        update = {
+            column: getattr(UserNoteStats, column) + insert.excluded[column]
+            for column in ("note_count", "archived_count", "content_bytes")
+        }
+        if touch:
+            values["last_modified"] = update["last_modified"] = datetime.now()
+
+        await db.execute(
+            insert.values(**values).on_conflict_do_update(
+                index_elements=[UserNoteStats.owner_id], set_=update
+            )
+        )
+        db.info.setdefault(CHANGED_OWNERS_KEY, set()).add(owner_id)
+
+    def invalidate(self, owner_id: int) -> None:
+        """
+        Удаляет статистику пользователя из кеша.
+
+        Args:
+            owner_id: ID владельца
+        """
+        self._cache.pop(owner_id, None)
+
+
+note_stats = NoteStatsCRUD(
+    cache_size=settings.NOTE_STATS_CACHE_SIZE,
+    ttl_seconds=settings.NOTE_STATS_CACHE_TTL,
+)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session: Session) -> None:
+    for owner_id in session.info.pop(CHANGED_OWNERS_KEY, ()):
+        note_stats.invalidate(owner_id)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_rolled_back(session: Session, previous_transaction: Any) -> None:
+    session.info.pop(CHANGED_OWNERS_KEY, None)
@@ -0,0 +1,215 @@
+"""
+CRUD операции для тегов заметок.
+"""
+
+from collections import Counter
+from typing import Dict, Sequence, Set
+
+from sqlalchemy import delete, func, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import ColumnElement, Select
+
+from app.db.database import dialect_insert
+from app.db.models import ArchivedNote, Note, NoteTag, TagCount
+
+
+class NoteTagCRUD:
+    """CRUD операции для моделей NoteTag и TagCount."""
+
+    @staticmethod
+    def tagged_note_ids(owner_id: int, tags: Sequence[str], match_all: bool) -> Select:
+        """
+        Строит подзапрос ID заметок с тегами.
+
+        Читается только первичный ключ (owner_id, tag, note_id).
+
+        Args:
+            owner_id: ID владельца
+            tags: Различные нормализованные теги
+            match_all: True - все теги (AND), False - любой из тегов (OR)
+
+        Returns:
+            Select: Запрос ID заметок
+        """
+        query = select(NoteTag.note_id).where(
+            NoteTag.owner_id == owner_id, NoteTag.tag.in_(tags)
+        )
+        if match_all and len(tags) > 1:
+            query = query.group_by(NoteTag.note_id).having(func.count() == len(tags))
+        return query
+
+    @staticmethod
+    async def get_owned_note_ids(
+        db: AsyncSession, owner_id: int, note_ids: Sequence[int]
+    ) -> Set[int]:
+        """
+        Оставляет ID заметок пользователя (в горячей таблице или архиве).
+
+        Args:
+            db: Сессия БД
+            owner_id: ID владельца
+            note_ids: Проверяемые ID
+
+        Returns:
+            Set[int]: Найденные ID
+        """
+        result = await db.execute(
+            union_all(
+                select(Note.id).where(Note.owner_id == owner_id, Note.id.in_(note_ids)),
+                select(ArchivedNote.id).where(
+                    ArchivedNote.owner_id == owner_id, ArchivedNote.id.in_(note_ids)
+                ),
+            )
+        )
+        return set(result.scalars())
+
+    @staticmethod
+    async def get_counts(db: AsyncSession, owner_id: int) -> Sequence[TagCount]:
+        """
+        Получает теги пользователя с количеством заметок.
+
+        Args:
+            db: Сессия БД
+            owner_id: ID владельца
+
+        Returns:
+            Sequence[TagCount]: Счетчики, самые частые теги первыми
+        """
+        result = await db.execute(
+            select(TagCount)
+            .where(TagCount.owner_id == owner_id)
+            .order_by(TagCount.count.desc(), TagCount.tag)
+        )
+        return result.scalars().all()
+
+    @staticmethod
+    async def _change_counts(
+        db: AsyncSession, owner_id: int, deltas: Dict[str, int]
+    ) -> None:
+        """
+        Применяет изменения к счетчикам тегов (без коммита).
+
+        Args:
+            db: Сессия БД
+            owner_id: ID владельца
+            deltas: Тег -> изменение количества
+        """
+        if not deltas:
+            return
+
+        insert = dialect_insert(db)(TagCount)
+        # Одинаковый порядок строк в конкурентных транзакциях - без дедлоков
+        await db.execute(
+            insert.values(
+                [
+                    {"owner_id": owner_id, "tag": tag, "count": delta}
+                    for tag, delta in sorted(deltas.items())
+                ]
+            ).on_conflict_do_update(
+                index_elements=[TagCount.owner_id, TagCount.tag],
+                set_={"count": TagCount.count + insert.excluded["count"]},
+            )
+        )
+        await db.execute(
+            delete(TagCount).where(
+                TagCount.owner_id == owner_id,
+                TagCount.tag.in_(list(deltas)),
+                TagCount.count <= 0,
+            )
+        )
+
+    @staticmethod
+    async def add(
+        db: AsyncSession, owner_id: int, note_ids: Sequence[int], tags: Sequence[str]
+    ) -> int:
+        """
+        Добавляет теги заметкам.
+
+        Уже существующие пары (заметка, тег) пропускаются; счетчики
+        увеличиваются только на фактически добавленные.
+
+        Args:
+            db: Сессия БД
+            owner_id: ID владельца
+            note_ids: ID заметок пользователя
+            tags: Нормализованные теги
+
+        Returns:
+            int: Количество добавленных пар
+        """
+        insert = dialect_insert(db)(NoteTag)
+        result = await db.execute(
+            insert.values(
+                [
+                    {"owner_id": owner_id, "tag": tag, "note_id": note_id}
+                    for note_id in dict.fromkeys(note_ids)
+                    for tag in tags
+                ]
+            )
+            .on_conflict_do_nothing()
+            .returning(NoteTag.tag)
+        )
+        added = Counter(result.scalars())
+
+        await NoteTagCRUD._change_counts(db, owner_id, added)
+        await db.commit()
+
+        return sum(added.values())
+
+    @staticmethod
+    async def remove(
+        db: AsyncSession, owner_id: int, note_ids: Sequence[int], tags: Sequence[str]
+    ) -> int:
+        """
+        Снимает теги с заметок.
+
+        Args:
+            db: Сессия БД
+            owner_id: ID владельца
+            note_ids: ID заметок
+            tags: Нормализованные теги
+
+        Returns:
+            int: Количество удаленных пар
+        """
+        removed = await NoteTagCRUD._delete(
+            db,
+            NoteTag.owner_id == owner_id,
+            NoteTag.note_id.in_(note_ids),
+            NoteTag.tag.in_(tags),
+        )
+        await NoteTagCRUD._change_counts(db, owner_id, removed)
+        await db.commit()
+
+        return -sum(removed.values())
+
+    @staticmethod
+    async def remove_note(db: AsyncSession, owner_id: int, note_id: int) -> None:
+        """
+        Удаляет все теги заметки (без коммита).
+
+        Args:
+            db: Сессия БД
+            owner_id: ID владельца
+            note_id: ID удаляемой заметки
+        """
+        removed = await NoteTagCRUD._delete(
+            db, NoteTag.owner_id == owner_id, NoteTag.note_id == note_id
+        )
+        await NoteTagCRUD._change_counts(db, owner_id, removed)
+
+    @staticmethod
+    async def _delete(
+        db: AsyncSession, *criteria: ColumnElement[bool]
+    ) -> Dict[str, int]:
+        """Удаляет теги по условию и возвращает отрицательные изменения счетчиков."""
+        result = await db.execute(
+            delete(NoteTag)
+            .where(*criteria)
+            .returning(NoteTag.tag)
+            .execution_options(synchronize_session=False)
+        )
+        return {tag: -count for tag, count in Counter(result.scalars()).items()}
+
+
+note_tag = NoteTagCRUD()
@@ -2,10 +2,13 @@
 CRUD операции для пользователей.
 """
 
+import asyncio
 from typing import Optional
-from sqlalchemy import select
+from sqlalchemy import lambda_stmt, select
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.crud.user_directory import user_directory as user_directory_crud
 from app.db.models import User
+from app.db.sharding import shards
 from app.schemas.user import UserCreate, UserUpdate
 from app.core.security import get_password_hash
 
@@ -25,7 +28,10 @@ class UserCRUD:
         Returns:
             Optional[User]: Объект пользователя или None
         """
-        result = await db.execute(select(User).where(User.id == user_id))
+        # Выполняется на каждый запрос с токеном: lambda-запрос кешируется
+        result = await db.execute(
+            lambda_stmt(lambda: select(User).where(User.id == user_id))
+        )
         return result.scalar_one_or_none()
 
     @staticmethod
@@ -33,33 +39,44 @@ class UserCRUD:
         """
         Получает пользователя по email.
 
+        Email ищется в глобальном каталоге, сам пользователь читается
+        из его шарда.
+
         Args:
-            db: Сессия БД
+            db: Сессия основной БД (с каталогом)
             email: Email пользователя
 
         Returns:
             Optional[User]: Объект пользователя или None
         """
-        result = await db.execute(select(User).where(User.email == email))
-        return result.scalar_one_or_none()
+        entry = await user_directory_crud.get_by_email(db, email=email)
+        if entry is None:
+            return None
+
+        async with shards.use(entry.shard, db) as shard_db:
+            return await UserCRUD.get_by_id(shard_db, user_id=entry.id)
 
     @staticmethod
-    async def create(db: AsyncSession, user_in: UserCreate) -> User:
+    async def create(
+        db: AsyncSession, user_in: UserCreate, user_id: Optional[int] = None
+    ) -> User:
         """
         Создает нового пользователя.
 
         Args:
             db: Сессия БД
             user_in: Данные для создания пользователя
+            user_id: ID из глобального каталога (для шардов)
 
         Returns:
             User: Созданный пользователь
         """
-        # Хешируем пароль
-        hashed_password = get_password_hash(user_in.password)
+        # Хешируем пароль: bcrypt занимает процессор, считаем вне цикла событий
+        hashed_password = await asyncio.to_thread(get_password_hash, user_in.password)
 
         # Создаем объект пользователя
         db_user = User(
+            id=user_id,
             email=user_in.email,
             hashed_password=hashed_password,
             is_active=user_in.is_active,
@@ -88,7 +105,9 @@ class UserCRUD:
         update_data = user_in.model_dump(exclude_unset=True)
 
         if "password" in update_data:
-            hashed_password = get_password_hash(update_data["password"])
+            hashed_password = await asyncio.to_thread(
+                get_password_hash, update_data["password"]
+            )
             update_data["hashed_password"] = hashed_password
             del update_data["password"]
 
@@ -0,0 +1,58 @@
+"""
+CRUD операции для глобального каталога пользователей.
+"""
+
+from typing import Optional
+
+from sqlalchemy import lambda_stmt, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import UserDirectory
+from app.db.sharding import shards
+
+
+class UserDirectoryCRUD:
+    """CRUD операции для модели UserDirectory."""
+
+    @staticmethod
+    async def get_by_email(db: AsyncSession, email: str) -> Optional[UserDirectory]:
+        """
+        Получает запись каталога по email.
+
+        Args:
+            db: Сессия основной БД
+            email: Email пользователя
+
+        Returns:
+            Optional[UserDirectory]: Запись каталога или None
+        """
+        result = await db.execute(
+            lambda_stmt(
+                lambda: select(UserDirectory).where(UserDirectory.email == email)
+            )
+        )
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def create(db: AsyncSession, email: str) -> UserDirectory:
+        """
+        Регистрирует пользователя в каталоге (без коммита).
+
+        Выдает глобальный ID и выбирает шард по консистентному хешу email.
+
+        Args:
+            db: Сессия основной БД
+            email: Email пользователя
+
+        Returns:
+            UserDirectory: Новая запись каталога
+        """
+        entry = UserDirectory(email=email, shard=shards.place(email))
+
+        db.add(entry)
+        await db.flush()
+
+        return entry
+
+
+user_directory = UserDirectoryCRUD()
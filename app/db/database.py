@@ -2,50 +2,279 @@
 Настройка подключения к базе данных.
 """
 
-from typing import AsyncGenerator
+import uuid
+from typing import Any, AsyncGenerator, Callable, Dict, Optional, Set
 
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.orm import ORMExecuteState, Session
+from sqlalchemy.pool import NullPool
+from starlette.requests import HTTPConnection
 
 from app.core.config import settings
 
-# Асинхронный движок SQLAlchemy
-engine = create_async_engine(
-    str(settings.DATABASE_URL),
-    echo=settings.DEBUG,
-    pool_pre_ping=True,  # Проверяет соединение перед использованием
-    pool_size=20,
-    max_overflow=0,
-)
+# Ключ session.info: в текущей транзакции были изменения
+WRITES_KEY = "has_writes"
+# Атрибут request.state со списком сессий запроса
+REQUEST_SESSIONS_STATE = "db_sessions"
+
+
+def _unique_statement_name() -> str:
+    """Уникальное имя подготовленного запроса (для PgBouncer)."""
+    return f"__asyncpg_{uuid.uuid4()}__"
+
+
+def connect_args(url: str) -> Dict[str, Any]:
+    """
+    Параметры подключения драйвера.
+
+    Для asyncpg задаются размеры кешей подготовленных запросов:
+    prepared_statement_cache_size - кеш SQLAlchemy (SQL -> prepared
+    statement на соединении), statement_cache_size - собственный кеш
+    asyncpg.
+
+    PgBouncer в режиме transaction выдает каждой транзакции произвольное
+    серверное соединение: кеши отключаются, а имена подготовленных
+    запросов делаются уникальными, чтобы не конфликтовать на сервере.
+
+    Args:
+        url: DSN базы данных
+
+    Returns:
+        Dict[str, Any]: connect_args для create_async_engine
+    """
+    if "+asyncpg" not in url:
+        return {}
+
+    if settings.DB_POOL_MODE == "pgbouncer":
+        return {
+            "prepared_statement_cache_size": 0,
+            "statement_cache_size": 0,
+            "prepared_statement_name_func": _unique_statement_name,
+        }
+
+    return {
+        "prepared_statement_cache_size": settings.DB_PREPARED_STATEMENT_CACHE_SIZE,
+        "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+    }
+
+
+def build_engine(url: str) -> AsyncEngine:
+    """
+    Создает движок с общими настройками пула и драйвера.
+
+    В режиме pgbouncer пул держит сам PgBouncer: локальный пул не нужен
+    (NullPool), а pre-ping только добавляет лишний запрос.
+
+    Args:
+        url: DSN базы данных
+
+    Returns:
+        AsyncEngine: Асинхронный движок SQLAlchemy
+    """
+    if settings.DB_POOL_MODE == "pgbouncer":
+        return create_async_engine(
+            url,
+            echo=settings.DEBUG,
+            poolclass=NullPool,
+            connect_args=connect_args(url),
+        )
+
+    return create_async_engine(
+        url,
+        echo=settings.DEBUG,
+        pool_pre_ping=True,  # Проверяет соединение перед использованием
+        pool_size=settings.pool_size_per_worker(),
+        max_overflow=settings.max_overflow_per_worker(),
+        connect_args=connect_args(url),
+    )
+
+
+# Движок основной БД (создается при первом обращении, см. get_engine)
+_engine: Optional[AsyncEngine] = None
+
+
+def get_engine() -> AsyncEngine:
+    """
+    Возвращает движок основной БД, создавая его при первом вызове.
+
+    Импорт модуля не создает движок и не загружает драйвер: моделям
+    и CLI (Alembic, утилиты) он не нужен, а воркеры gunicorn создают
+    свой пул уже после fork.
+
+    Returns:
+        AsyncEngine: Асинхронный движок SQLAlchemy
+    """
+    global _engine
+    if _engine is None:
+        _engine = build_engine(str(settings.DATABASE_URL))
+    return _engine
+
+
+def created_engines() -> Set[AsyncEngine]:
+    """
+    Уже созданные движки: основной и шардов (новые не создаются).
+
+    Returns:
+        Set[AsyncEngine]: Движки с пулами соединений
+    """
+    from app.db.sharding import shards
+
+    engines = set(shards.engines.values()) if shards.loaded else set()
+    if _engine is not None:
+        engines.add(_engine)
+    return engines
+
+
+class _LazySessionmaker(async_sessionmaker):
+    """Фабрика сессий, привязывающаяся к get_engine() при первой сессии."""
+
+    def __call__(self, **local_kw: Any) -> AsyncSession:
+        if self.kw.get("bind") is None:
+            self.configure(bind=get_engine())
+        return super().__call__(**local_kw)
+
+
 # Фабрика асинхронных сессий
-AsyncSessionLocal = async_sessionmaker(
-    engine, class_=AsyncSession, expire_on_commit=False
-)
+AsyncSessionLocal = _LazySessionmaker(class_=AsyncSession, expire_on_commit=False)
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_flush(session: Session, flush_context: Any) -> None:
+    session.info[WRITES_KEY] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_statement(orm_execute_state: ORMExecuteState) -> None:
+    # Все, кроме SELECT (включая text()), считаем изменением
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info[WRITES_KEY] = True
+
 
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_soft_rollback")
+def _reset_writes(session: Session, *args: Any) -> None:
+    session.info.pop(WRITES_KEY, None)
 
-async def get_db() -> AsyncGenerator[AsyncSession, None]:
+
+def has_writes(session: AsyncSession) -> bool:
+    """
+    Проверяет, есть ли в сессии незафиксированные изменения.
+
+    Args:
+        session: Сессия БД
+
+    Returns:
+        bool: True, если нужен COMMIT
+    """
+    return bool(
+        session.new or session.dirty or session.deleted or session.info.get(WRITES_KEY)
+    )
+
+
+def dialect_insert(db: AsyncSession) -> Callable:
+    """
+    INSERT с ON CONFLICT для диалекта сессии (Postgres или SQLite).
+
+    Args:
+        db: Сессия БД
+
+    Returns:
+        Callable: postgresql.insert или sqlite.insert
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert
+    return sqlite.insert
+
+
+async def finish_session(session: AsyncSession) -> None:
+    """
+    Завершает сессию запроса и возвращает соединение в пул.
+
+    COMMIT выполняется только при наличии изменений: для чтения
+    соединение просто возвращается (пул сам откатывает транзакцию).
+    Если сессия не выполняла запросов, соединение не бралось вовсе.
+
+    Args:
+        session: Сессия БД
+    """
+    if has_writes(session):
+        await session.commit()
+    await session.close()
+
+
+async def release_request_sessions(connection: HTTPConnection) -> None:
+    """
+    Завершает все сессии запроса, не дожидаясь отправки ответа.
+
+    Args:
+        connection: Текущий запрос
+    """
+    for session in getattr(connection.state, REQUEST_SESSIONS_STATE, ()):
+        await finish_session(session)
+
+
+def track_request_session(connection: HTTPConnection, session: AsyncSession) -> None:
+    """
+    Регистрирует сессию запроса для release_request_sessions.
+
+    Args:
+        connection: Текущий запрос
+        session: Сессия БД
+    """
+    sessions = getattr(connection.state, REQUEST_SESSIONS_STATE, None)
+    if sessions is None:
+        sessions = []
+        setattr(connection.state, REQUEST_SESSIONS_STATE, sessions)
+    sessions.append(session)
+
+
+async def get_db(connection: HTTPConnection) -> AsyncGenerator[AsyncSession, None]:
     """
     Dependency для получения асинхронной сессии БД.
 
+    Соединение берется из пула только при первом запросе к БД
+    и возвращается сразу после формирования ответа (см. SessionRoute),
+    COMMIT выполняется только если были изменения.
+
+    Args:
+        connection: Текущий запрос
+
     Yields:
         AsyncSession: Асинхронная сессия SQLAlchemy
     """
     async with AsyncSessionLocal() as session:
+        track_request_session(connection, session)
         try:
             yield session
-            await session.commit()
+            await finish_session(session)
         except Exception:
             await session.rollback()
             raise
-        finally:
-            await session.close()
 
 
 async def init_db() -> None:
     """
-    Инициализирует базу данных (создает таблицы).
+    Инициализирует базу данных (создает таблицы в основной БД и шардах).
     """
-    async with engine.begin() as conn:
-        # Создаем все таблицы
-        from app.db.models import Base
+    from app.db.models import Base
+    from app.db.sharding import shards
+
+    for db_engine in {get_engine(), *shards.engines.values()}:
+        async with db_engine.begin() as conn:
+            # Создаем все таблицы
+            await conn.run_sync(Base.metadata.create_all)
+
 
-        await conn.run_sync(Base.metadata.create_all)
+async def close_db() -> None:
+    """
+    Закрывает все соединения пулов при остановке воркера.
+    """
+    for db_engine in created_engines():
+        await db_engine.dispose()
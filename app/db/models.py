@@ -3,9 +3,22 @@
 """
 
 from datetime import datetime
-from typing import Optional
-from sqlalchemy import String, Text, DateTime, ForeignKey
-from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
+from typing import Any, Optional
+from sqlalchemy import JSON, BigInteger, String, Text, DateTime, ForeignKey, Index
+from sqlalchemy.orm import (
+    DeclarativeBase,
+    Mapped,
+    declared_attr,
+    mapped_column,
+    relationship,
+    validates,
+)
+from app.core.config import settings
+from app.db.types import CompressedText
+
+# Ширина колонки preview в notes и notes_archive. Задана миграциями
+# (879667061b3e, ce399bf70ade, 91b0c858941a): изменить - только новой миграцией
+NOTE_PREVIEW_COLUMN_LENGTH = 200
 
 
 class Base(DeclarativeBase):
@@ -35,6 +48,27 @@ class User(Base):
         return f"<User(id={self.id}, email={self.email})>"
 
 
+class UserDirectory(Base):
+    """
+    Глобальный каталог пользователей: email -> (ID, шард).
+
+    Хранится в основной БД (DATABASE_URL), выдает ID пользователей,
+    уникальные для всех шардов, и определяет шард при входе по email.
+    """
+
+    __tablename__ = "user_directory"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    email: Mapped[str] = mapped_column(
+        String(255), unique=True, index=True, nullable=False
+    )
+    shard: Mapped[str] = mapped_column(String(64), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
+
+    def __repr__(self) -> str:
+        return f"<UserDirectory(id={self.id}, shard={self.shard})>"
+
+
 class Note(Base):
     """Модель заметки."""
 
@@ -42,7 +76,20 @@ class Note(Base):
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     title: Mapped[str] = mapped_column(String(255), nullable=False)
-    content: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    content: Mapped[Optional[str]] = mapped_column(
+        CompressedText(
+            threshold=(
+                settings.NOTE_COMPRESSION_THRESHOLD
+                if settings.NOTE_COMPRESSION_ENABLED
+                else None
+            )
+        ),
+        nullable=True,
+    )
+    # Начало содержимого для списков: позволяет не читать content целиком
+    preview: Mapped[Optional[str]] = mapped_column(
+        String(NOTE_PREVIEW_COLUMN_LENGTH), nullable=True
+    )
     # Внешний ключ на пользователя
     owner_id: Mapped[int] = mapped_column(
         ForeignKey("users.id", ondelete="CASCADE"), nullable=False
@@ -50,10 +97,239 @@ class Note(Base):
 
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
     updated_at: Mapped[datetime] = mapped_column(
-        DateTime, default=datetime.now, onupdate=datetime.now
+        DateTime, default=datetime.now, onupdate=datetime.now, index=True
     )
+    # Версия для оптимистичной блокировки: растет при каждом изменении
+    version: Mapped[int] = mapped_column(nullable=False, default=1, server_default="1")
     # Связь с пользователем
     owner: Mapped["User"] = relationship(back_populates="notes")
 
+    __table_args__ = (Index("ix_notes_owner_id_created_at", "owner_id", "created_at"),)
+
+    @declared_attr.directive
+    def __mapper_args__(cls) -> dict[str, Any]:
+        # В Postgres notes секционирована по HASH(owner_id) с ключом
+        # (owner_id, id): owner_id в ключе ORM попадает в WHERE у UPDATE,
+        # DELETE и refresh, и запрос читает одну секцию.
+        # version_id_col добавляет в WHERE версию, загруженную сессией:
+        # параллельное изменение дает StaleDataError вместо потери записи.
+        # Версию увеличивает NoteCRUD, чтобы восстановление из архива
+        # сохраняло ее, а не начинало с 1
+        return {
+            "primary_key": [cls.__table__.c.id, cls.__table__.c.owner_id],
+            "version_id_col": cls.__table__.c.version,
+            "version_id_generator": False,
+        }
+
+    @staticmethod
+    def make_preview(content: Optional[str]) -> Optional[str]:
+        """Превью содержимого (также для UPDATE без загрузки заметки)."""
+        length = min(settings.NOTE_PREVIEW_LENGTH, NOTE_PREVIEW_COLUMN_LENGTH)
+        return content[:length] if content else content
+
+    @validates("content")
+    def _update_preview(self, key: str, value: Optional[str]) -> Optional[str]:
+        """Пересчитывает превью при каждом изменении содержимого."""
+        self.preview = self.make_preview(value)
+        return value
+
     def __repr__(self) -> str:
         return f"<Note(id={self.id}, title={self.title})>"
+
+
+class NoteTag(Base):
+    """
+    Тег заметки.
+
+    Внешнего ключа на notes нет: в Postgres notes секционирована и ID
+    не уникален сам по себе, а архивная заметка сохраняет ID и теги.
+    Первичный ключ (owner_id, tag, note_id) обслуживает фильтр по тегам.
+    """
+
+    __tablename__ = "note_tags"
+
+    owner_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    tag: Mapped[str] = mapped_column(
+        String(settings.NOTE_TAG_MAX_LENGTH), primary_key=True
+    )
+    note_id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+
+    # Теги конкретной заметки (удаление заметки)
+    __table_args__ = (Index("ix_note_tags_owner_id_note_id", "owner_id", "note_id"),)
+
+    def __repr__(self) -> str:
+        return f"<NoteTag(note_id={self.note_id}, tag={self.tag})>"
+
+
+class NoteRevision(Base):
+    """
+    Версия заметки в истории изменений.
+
+    snapshot хранит содержимое целиком, delta - построчные изменения
+    относительно предыдущей версии (app/utils/delta.py). Внешнего ключа
+    на notes нет, как и у тегов: заметка может быть в архиве.
+    """
+
+    __tablename__ = "note_revisions"
+
+    owner_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    note_id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    version: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    title: Mapped[str] = mapped_column(String(255), nullable=False)
+    # snapshot | delta
+    kind: Mapped[str] = mapped_column(String(8), nullable=False)
+    data: Mapped[Optional[str]] = mapped_column(
+        CompressedText(
+            threshold=(
+                settings.NOTE_COMPRESSION_THRESHOLD
+                if settings.NOTE_COMPRESSION_ENABLED
+                else None
+            )
+        ),
+        nullable=True,
+    )
+    # Число дельт после ближайшего снимка (0 - снимок)
+    depth: Mapped[int] = mapped_column(nullable=False, default=0)
+    # Время изменения заметки, создавшего версию
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<NoteRevision(note_id={self.note_id}, version={self.version})>"
+
+
+class TagCount(Base):
+    """Количество заметок пользователя с тегом (поддерживается CRUD)."""
+
+    __tablename__ = "tag_counts"
+
+    owner_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    tag: Mapped[str] = mapped_column(
+        String(settings.NOTE_TAG_MAX_LENGTH), primary_key=True
+    )
+    count: Mapped[int] = mapped_column(nullable=False, default=0)
+
+    def __repr__(self) -> str:
+        return f"<TagCount(owner_id={self.owner_id}, tag={self.tag})>"
+
+
+class UserNoteStats(Base):
+    """
+    Статистика заметок пользователя (поддерживается CRUD в той же транзакции).
+
+    Заменяет COUNT(*) и SUM по notes при каждом запросе.
+    """
+
+    __tablename__ = "user_note_stats"
+
+    owner_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    note_count: Mapped[int] = mapped_column(nullable=False, default=0)
+    archived_count: Mapped[int] = mapped_column(nullable=False, default=0)
+    # Размер содержимого в UTF-8 (до сжатия), включая архив
+    content_bytes: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    last_modified: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+
+    def __repr__(self) -> str:
+        return f"<UserNoteStats(owner_id={self.owner_id}, notes={self.note_count})>"
+
+
+class ArchivedNote(Base):
+    """
+    Архивная заметка (не изменялась дольше ARCHIVE_AFTER_DAYS).
+
+    Хранится отдельно от горячей таблицы notes, содержимое всегда сжато.
+    ID совпадает с исходным, поэтому ссылки на заметку остаются рабочими.
+    """
+
+    __tablename__ = "notes_archive"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    title: Mapped[str] = mapped_column(String(255), nullable=False)
+    content: Mapped[Optional[str]] = mapped_column(
+        CompressedText(threshold=0), nullable=True
+    )
+    preview: Mapped[Optional[str]] = mapped_column(
+        String(NOTE_PREVIEW_COLUMN_LENGTH), nullable=True
+    )
+    owner_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    # Версия сохраняется при архивации и восстановлении
+    version: Mapped[int] = mapped_column(nullable=False, server_default="1")
+    archived_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
+
+    __table_args__ = (
+        Index("ix_notes_archive_owner_id_created_at", "owner_id", "created_at"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<ArchivedNote(id={self.id}, title={self.title})>"
+
+
+class BackgroundJob(Base):
+    """Задача очереди фоновых задач в БД."""
+
+    __tablename__ = "background_jobs"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    name: Mapped[str] = mapped_column(String(100), nullable=False)
+    payload: Mapped[dict[str, Any]] = mapped_column(JSON, default=dict)
+    # pending -> done | failed
+    status: Mapped[str] = mapped_column(String(20), default="pending")
+    attempts: Mapped[int] = mapped_column(default=0)
+    run_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
+    last_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
+
+    # Частичный индекс: воркеры сканируют только невыполненные задачи
+    __table_args__ = (
+        Index(
+            "ix_background_jobs_pending",
+            "run_at",
+            postgresql_where=(status == "pending"),
+            sqlite_where=(status == "pending"),
+        ),
+    )
+
+    def __repr__(self) -> str:
+        return f"<BackgroundJob(id={self.id}, name={self.name}, status={self.status})>"
+
+
+class IdempotencyKey(Base):
+    """Сохраненный результат запроса с заголовком Idempotency-Key."""
+
+    __tablename__ = "idempotency_keys"
+
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    request_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    # NULL, пока исходный запрос выполняется
+    status_code: Mapped[Optional[int]] = mapped_column(nullable=True)
+    response_body: Mapped[Optional[Any]] = mapped_column(JSON, nullable=True)
+    # Аренда выполнения: до нее ключ без ответа занят исходным запросом,
+    # после - повтор может его перехватить. С ответом - время его сохранения
+    locked_until: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
+    # Индекс для удаления просроченных ключей
+    expires_at: Mapped[datetime] = mapped_column(DateTime, index=True)
+
+    # Аренда - версия строки: UPDATE с устаревшей арендой дает
+    # StaleDataError, а не перезапись ключа, перехваченного другим запросом
+    __mapper_args__ = {
+        "version_id_col": locked_until,
+        "version_id_generator": False,
+    }
+
+    def __repr__(self) -> str:
+        return f"<IdempotencyKey(user_id={self.user_id}, key={self.key})>"
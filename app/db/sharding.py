@@ -0,0 +1,277 @@
+"""
+Шардирование пользователей по нескольким базам данных.
+
+Новый пользователь размещается на шарде по консистентному хешу email,
+а фактический шард записывается в каталог user_directory основной БД.
+Запросы пользователя идут в движок его шарда; каталог кешируется
+в процессе, поэтому обычный запрос не обращается к основной БД.
+Движки шардов создаются при первом обращении к роутеру, а не при импорте.
+"""
+
+import bisect
+import hashlib
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import (
+    AsyncIterator,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from app.core.config import settings
+from app.db.database import build_engine, get_engine
+from app.db.models import UserDirectory
+
+
+def _hash(key: str) -> int:
+    """Стабильный 64-битный хеш (не зависит от PYTHONHASHSEED)."""
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    Консистентный хеш с виртуальными узлами.
+
+    При добавлении шарда на новое место переезжает только ~1/N ключей.
+    """
+
+    def __init__(self, shards: Sequence[str], vnodes: int = 64) -> None:
+        points: List[Tuple[int, str]] = sorted(
+            (_hash(f"{shard}#{i}"), shard) for shard in shards for i in range(vnodes)
+        )
+        self._hashes = [point for point, _ in points]
+        self._shards = [shard for _, shard in points]
+
+    def get(self, key: str) -> str:
+        """
+        Возвращает шард для ключа.
+
+        Args:
+            key: Ключ размещения
+
+        Returns:
+            str: Имя шарда
+        """
+        index = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._shards[index]
+
+
+# Возвращает (имя шарда -> движок, движок каталога)
+EngineLoader = Callable[[], Tuple[Dict[str, AsyncEngine], AsyncEngine]]
+
+
+class ShardRouter:
+    """
+    Движки шардов, размещение новых пользователей и поиск их шарда.
+
+    Движки задаются сразу (engines и directory) или загрузчиком loader,
+    который вызывается при первом обращении к ним.
+    """
+
+    def __init__(
+        self,
+        engines: Optional[Dict[str, AsyncEngine]] = None,
+        directory: Optional[AsyncEngine] = None,
+        vnodes: int = 64,
+        cache_size: int = 100_000,
+        loader: Optional[EngineLoader] = None,
+    ) -> None:
+        self.vnodes = vnodes
+        self.cache_size = cache_size
+        self._loader = loader
+        self._cache: "OrderedDict[int, str]" = OrderedDict()
+        if engines is not None:
+            self.configure(engines, directory)
+
+    def configure(
+        self, engines: Dict[str, AsyncEngine], directory: AsyncEngine
+    ) -> None:
+        """
+        Задает движки шардов и каталога (используется и в тестах).
+
+        Args:
+            engines: Имя шарда -> движок
+            directory: Движок основной БД с каталогом
+        """
+        self._loader = None
+        self._engines = dict(engines)
+        self._default = next(iter(self._engines))
+        self.ring = HashRing(list(self._engines), self.vnodes)
+        self._sessionmakers = {
+            name: async_sessionmaker(
+                shard_engine, class_=AsyncSession, expire_on_commit=False
+            )
+            for name, shard_engine in self._engines.items()
+        }
+        self._directory = directory
+        self._directory_sessionmaker = async_sessionmaker(
+            directory, class_=AsyncSession, expire_on_commit=False
+        )
+        self._cache = OrderedDict()
+
+    def _load(self) -> None:
+        """Создает движки загрузчиком, если они еще не заданы."""
+        if self._loader is not None:
+            self.configure(*self._loader())
+
+    @property
+    def loaded(self) -> bool:
+        """Движки уже созданы (или заданы через configure)."""
+        return self._loader is None
+
+    @property
+    def engines(self) -> Dict[str, AsyncEngine]:
+        """Имя шарда -> движок."""
+        self._load()
+        return self._engines
+
+    @property
+    def directory(self) -> AsyncEngine:
+        """Движок основной БД с каталогом."""
+        self._load()
+        return self._directory
+
+    @property
+    def default(self) -> str:
+        """Имя первого шарда (единственного без шардирования)."""
+        self._load()
+        return self._default
+
+    def directory_session(self) -> AsyncSession:
+        """
+        Открывает сессию основной БД с каталогом.
+
+        Returns:
+            AsyncSession: Новая сессия
+        """
+        self._load()
+        return self._directory_sessionmaker()
+
+    def session_factories(self) -> List[async_sessionmaker]:
+        """Фабрики сессий всех шардов (для фоновых задач)."""
+        self._load()
+        return list(self._sessionmakers.values())
+
+    def session(self, shard: str) -> AsyncSession:
+        """
+        Открывает сессию шарда.
+
+        Args:
+            shard: Имя шарда
+
+        Returns:
+            AsyncSession: Новая сессия
+
+        Raises:
+            KeyError: Если шард не настроен
+        """
+        self._load()
+        return self._sessionmakers[shard]()
+
+    @asynccontextmanager
+    async def use(
+        self, shard: str, db: Optional[AsyncSession] = None
+    ) -> AsyncIterator[AsyncSession]:
+        """
+        Сессия шарда; переиспользует db, если она подключена к тому же движку.
+
+        Args:
+            shard: Имя шарда
+            db: Уже открытая сессия (обычно сессия каталога)
+
+        Yields:
+            AsyncSession: Сессия шарда
+        """
+        if db is not None and db.bind is self.engines[shard]:
+            yield db
+            return
+
+        async with self.session(shard) as session:
+            yield session
+
+    def place(self, email: str) -> str:
+        """
+        Выбирает шард для нового пользователя.
+
+        Args:
+            email: Email пользователя
+
+        Returns:
+            str: Имя шарда
+        """
+        self._load()
+        return self.ring.get(email.lower())
+
+    async def resolve(self, user_id: int) -> Optional[str]:
+        """
+        Находит шард пользователя через каталог (с кешем процесса).
+
+        Args:
+            user_id: ID пользователя
+
+        Returns:
+            Optional[str]: Имя шарда или None, если пользователя нет в каталоге
+        """
+        if len(self.engines) == 1:
+            return self.default
+
+        shard = self._cache.get(user_id)
+        if shard is not None:
+            self._cache.move_to_end(user_id)
+            return shard
+
+        async with self.directory_session() as db:
+            result = await db.execute(
+                select(UserDirectory.shard).where(UserDirectory.id == user_id)
+            )
+            shard = result.scalar_one_or_none()
+
+        if shard is not None:
+            self._cache[user_id] = shard
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+        return shard
+
+    def forget(self, user_id: int) -> None:
+        """
+        Сбрасывает кеш шарда пользователя (после переноса на другой шард).
+
+        Args:
+            user_id: ID пользователя
+        """
+        self._cache.pop(user_id, None)
+
+    async def dispose(self) -> None:
+        """Закрывает пулы всех шардов (если движки уже созданы)."""
+        if not self.loaded:
+            return
+        for shard_engine in self._engines.values():
+            if shard_engine is not self._directory:
+                await shard_engine.dispose()
+
+
+def _build_engines() -> Tuple[Dict[str, AsyncEngine], AsyncEngine]:
+    """Создает движки шардов; шард на DATABASE_URL использует общий движок."""
+    engine = get_engine()
+    engines = {}
+    for name, url in settings.shard_urls().items():
+        if url == str(settings.DATABASE_URL):
+            engines[name] = engine
+        else:
+            engines[name] = build_engine(url)
+    return engines, engine
+
+
+shards = ShardRouter(
+    vnodes=settings.DB_SHARD_VNODES,
+    cache_size=settings.DB_SHARD_CACHE_SIZE,
+    loader=_build_engines,
+)
@@ -0,0 +1,64 @@
+"""
+Пользовательские типы колонок SQLAlchemy.
+"""
+
+import zlib
+from typing import Any, Optional
+
+from sqlalchemy import LargeBinary
+from sqlalchemy.engine import Dialect
+from sqlalchemy.types import TypeDecorator
+
+# Первый байт хранимого значения определяет формат
+RAW_MARKER = b"\x00"
+ZLIB_MARKER = b"\x01"
+
+
+class CompressedText(TypeDecorator):
+    """
+    Текст, прозрачно сжимаемый zlib при сохранении.
+
+    Значения короче порога хранятся как UTF-8 без сжатия: на коротких
+    строках zlib не дает выигрыша, а распаковка стоит CPU при каждом чтении.
+    """
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def __init__(
+        self, threshold: Optional[int] = 1024, level: int = 6, **kwargs: Any
+    ) -> None:
+        """
+        Args:
+            threshold: Минимальный размер в байтах для сжатия (None - не сжимать)
+            level: Уровень сжатия zlib
+        """
+        super().__init__(**kwargs)
+        self.threshold = threshold
+        self.level = level
+
+    def process_bind_param(
+        self, value: Optional[str], dialect: Dialect
+    ) -> Optional[bytes]:
+        if value is None:
+            return None
+
+        data = value.encode("utf-8")
+        if self.threshold is not None and len(data) >= self.threshold:
+            compressed = zlib.compress(data, self.level)
+            if len(compressed) < len(data):
+                return ZLIB_MARKER + compressed
+
+        return RAW_MARKER + data
+
+    def process_result_value(
+        self, value: Optional[bytes], dialect: Dialect
+    ) -> Optional[str]:
+        if value is None:
+            return None
+
+        value = bytes(value)
+        if value[:1] == ZLIB_MARKER:
+            return zlib.decompress(value[1:]).decode("utf-8")
+
+        return value[1:].decode("utf-8")
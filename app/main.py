@@ -1,13 +1,21 @@
 """
 Основной файл приложения FastAPI.
+
+Приложение собирает фабрика create_app: роутеры, middleware и сервисы
+импортируются при ее вызове, движки БД создаются в lifespan. Атрибут app
+модуля создается при первом обращении (uvicorn app.main:app), поэтому
+import app.main дешев для CLI и сбора тестов.
 """
 
+import logging
 from contextlib import asynccontextmanager
+from typing import Any
+
 from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
+
 from app.core.config import settings
-from app.db.database import init_db
-from app.api.v1.api import api_router
+
+logger = logging.getLogger(__name__)
 
 
 @asynccontextmanager
@@ -18,35 +26,47 @@ async def lifespan(app: FastAPI):
     Yields:
         None
     """
+    from app.core.keys import get_key_ring
+    from app.core.logs import setup_logging, shutdown_logging
+    from app.db.database import close_db, init_db
+    from app.services.archive import note_archiver
+    from app.services.change_feed import change_feed
+    from app.services.idempotency import idempotency_purger
+    from app.services.revisions import revision_recorder
+    from app.services.tasks import durable_queue, task_queue
+
     # Инициализация при запуске
-    print("Starting up...")
+    setup_logging(settings.LOG_LEVEL, json_format=settings.LOG_JSON)
+    logger.info("Starting up")
+    # Ключи JWT загружаются до приема запросов: ошибка в них видна сразу
+    get_key_ring()
+    # Как и ключи: без прямых DSN ленты за PgBouncer запуск прерывается
+    feed_dsns = settings.change_feed_dsns() if settings.CHANGE_FEED_ENABLED else []
     await init_db()
+    await task_queue.start()
+    if settings.CHANGE_FEED_ENABLED:
+        await change_feed.start(*feed_dsns)
+    if settings.TASK_DURABLE_ENABLED:
+        await durable_queue.start()
+    if settings.ARCHIVE_ENABLED:
+        await note_archiver.start()
+    if settings.NOTE_REVISIONS_ENABLED:
+        await revision_recorder.start()
+    await idempotency_purger.start()
 
     yield
     # Очистка при завершении
-    print("Shutting down...")
-
-
-# Создаем приложение FastAPI
-app = FastAPI(
-    title=settings.PROJECT_NAME,
-    version=settings.VERSION,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json",
-    lifespan=lifespan,
-)
-# Настраиваем CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # В продакшене замените на конкретные домены
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-# Подключаем роутеры
-app.include_router(api_router, prefix=settings.API_V1_STR)
-
-
-@app.get("/")
+    logger.info("Shutting down")
+    await note_archiver.stop()
+    await idempotency_purger.stop()
+    await task_queue.drain(timeout=settings.TASK_DRAIN_TIMEOUT)
+    await durable_queue.stop(timeout=settings.TASK_DRAIN_TIMEOUT)
+    await change_feed.stop()
+    await revision_recorder.stop(timeout=settings.TASK_DRAIN_TIMEOUT)
+    await close_db()
+    shutdown_logging()
+
+
 async def root():
     """
     Корневой эндпоинт.
@@ -62,7 +82,6 @@ async def root():
     }
 
 
-@app.get("/health")
 async def health_check():
     """
     Health check эндпоинт.
@@ -71,3 +90,69 @@ async def health_check():
         dict: Статус приложения
     """
     return {"status": "healthy"}
+
+
+def create_app() -> FastAPI:
+    """
+    Создает приложение FastAPI с middleware и роутерами.
+
+    Returns:
+        FastAPI: Приложение
+    """
+    from fastapi.middleware.cors import CORSMiddleware
+
+    from app.api.v1.api import api_router
+    from app.api.well_known import router as well_known_router
+    from app.core.compression import CompressionMiddleware
+    from app.core.logs import AccessLogMiddleware
+    from app.core.profiling import ProfilingMiddleware, profiler
+
+    application = FastAPI(
+        title=settings.PROJECT_NAME,
+        version=settings.VERSION,
+        openapi_url=f"{settings.API_V1_STR}/openapi.json",
+        lifespan=lifespan,
+    )
+    # Настраиваем CORS
+    application.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  # В продакшене замените на конкретные домены
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    # Сжатие ответов (gzip, brotli/zstd при наличии библиотек)
+    if settings.COMPRESSION_ENABLED:
+        application.add_middleware(
+            CompressionMiddleware,
+            minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+            content_types=settings.COMPRESSION_CONTENT_TYPES,
+            gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+            brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+            zstd_level=settings.COMPRESSION_ZSTD_LEVEL,
+        )
+    # Профилирование выбранных запросов (выключено - middleware не добавляется)
+    if settings.PROFILING_ENABLED:
+        application.add_middleware(ProfilingMiddleware, profiler=profiler)
+    # Access-лог - внешний слой: учитывает время всех остальных middleware
+    if settings.LOG_ACCESS_ENABLED:
+        application.add_middleware(
+            AccessLogMiddleware,
+            sample_rate=settings.LOG_ACCESS_SAMPLE_RATE,
+            slow_request_ms=settings.LOG_SLOW_REQUEST_MS,
+        )
+    # Подключаем роутеры
+    application.include_router(api_router, prefix=settings.API_V1_STR)
+    application.include_router(well_known_router)
+    application.add_api_route("/", root, methods=["GET"])
+    application.add_api_route("/health", health_check, methods=["GET"])
+
+    return application
+
+
+def __getattr__(name: str) -> Any:
+    # Приложение по умолчанию создается при первом обращении к app.main.app
+    if name == "app":
+        application = globals()["app"] = create_app()
+        return application
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
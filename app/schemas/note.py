@@ -3,15 +3,45 @@ Pydantic схемы для заметок.
 """
 
 from datetime import datetime
-from typing import Optional
-from pydantic import BaseModel, Field, ConfigDict
+from functools import lru_cache
+from typing import Any, List, Optional, Tuple, Type
+from pydantic import (
+    BaseModel,
+    Field,
+    ConfigDict,
+    TypeAdapter,
+    create_model,
+    field_validator,
+)
+from app.core.config import settings
+
+
+def normalize_tag(tag: str) -> str:
+    """
+    Приводит тег к каноническому виду (без пробелов по краям, нижний регистр).
+
+    Args:
+        tag: Тег от клиента
+
+    Returns:
+        str: Нормализованный тег
+
+    Raises:
+        ValueError: Если тег пустой или слишком длинный
+    """
+    tag = tag.strip().lower()
+    if not tag or len(tag) > settings.NOTE_TAG_MAX_LENGTH:
+        raise ValueError(
+            f"Tag must be 1-{settings.NOTE_TAG_MAX_LENGTH} characters long"
+        )
+    return tag
 
 
 class NoteBase(BaseModel):
     """Базовая схема заметки."""
 
     title: str = Field(..., min_length=1, max_length=255)
-    content: Optional[str] = None
+    content: Optional[str] = Field(None, max_length=settings.NOTE_CONTENT_MAX_LENGTH)
 
 
 class NoteCreate(NoteBase):
@@ -20,11 +50,58 @@ class NoteCreate(NoteBase):
     pass
 
 
+class NoteBatchCreate(BaseModel):
+    """Схема для пакетного создания заметок."""
+
+    notes: List[NoteCreate] = Field(..., min_length=1, max_length=100)
+
+
+class NoteTagsUpdate(BaseModel):
+    """Схема для пакетного добавления или снятия тегов."""
+
+    note_ids: List[int] = Field(..., min_length=1, max_length=100)
+    tags: List[str] = Field(..., min_length=1, max_length=20)
+
+    @field_validator("tags")
+    @classmethod
+    def _normalize_tags(cls, tags: List[str]) -> List[str]:
+        # Порядок сохраняется, дубликаты убираются
+        return list(dict.fromkeys(normalize_tag(tag) for tag in tags))
+
+
+class NoteTagsResult(BaseModel):
+    """Результат пакетной операции с тегами."""
+
+    changed: int
+
+
+class TagCountResponse(BaseModel):
+    """Тег и количество заметок с ним."""
+
+    tag: str
+    count: int
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class NoteStats(BaseModel):
+    """Статистика заметок пользователя."""
+
+    note_count: int = 0
+    archived_count: int = 0
+    content_bytes: int = 0
+    last_modified: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
 class NoteUpdate(BaseModel):
     """Схема для обновления заметки."""
 
     title: Optional[str] = Field(None, min_length=1, max_length=255)
-    content: Optional[str] = None
+    content: Optional[str] = Field(None, max_length=settings.NOTE_CONTENT_MAX_LENGTH)
+    # Версия, которую видел клиент: если заметку уже изменили, ответ 409
+    version: Optional[int] = Field(None, ge=1)
 
 
 class NoteInDB(NoteBase):
@@ -34,6 +111,7 @@ class NoteInDB(NoteBase):
     owner_id: int
     created_at: datetime
     updated_at: datetime
+    version: int
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -42,3 +120,71 @@ class NoteResponse(NoteInDB):
     """Схема ответа с заметкой."""
 
     pass
+
+
+class NoteSummary(BaseModel):
+    """Краткая схема заметки для списков (без полного содержимого)."""
+
+    id: int
+    title: str
+    updated_at: datetime
+    preview: Optional[str] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class NoteRevisionInfo(BaseModel):
+    """Версия заметки в истории изменений (без содержимого)."""
+
+    version: int
+    title: str
+    created_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class NoteRevisionResponse(NoteRevisionInfo):
+    """Восстановленная версия заметки."""
+
+    content: Optional[str] = None
+
+
+# Поля, которые клиент может запросить через ?fields=
+NOTE_FIELDS: Tuple[str, ...] = tuple(NoteResponse.model_fields)
+
+
+@lru_cache(maxsize=128)
+def note_projection_model(fields: Tuple[str, ...]) -> Type[BaseModel]:
+    """
+    Строит (и кеширует) схему ответа с подмножеством полей NoteResponse.
+
+    Args:
+        fields: Поля в каноническом порядке NOTE_FIELDS
+
+    Returns:
+        Type[BaseModel]: Схема с выбранными полями
+    """
+    definitions: dict[str, Any] = {
+        name: (field.annotation, field)
+        for name, field in NoteResponse.model_fields.items()
+        if name in fields
+    }
+    return create_model(
+        f"NoteProjection_{'_'.join(fields)}",
+        __config__=ConfigDict(from_attributes=True),
+        **definitions,
+    )
+
+
+@lru_cache(maxsize=128)
+def note_projection_adapter(fields: Tuple[str, ...]) -> TypeAdapter:
+    """
+    Возвращает кешированный сериализатор списка проекций заметок.
+
+    Args:
+        fields: Поля в каноническом порядке NOTE_FIELDS
+
+    Returns:
+        TypeAdapter: Адаптер для List[схема проекции]
+    """
+    return TypeAdapter(List[note_projection_model(fields)])
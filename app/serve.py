@@ -0,0 +1,135 @@
+"""
+Точка входа для продакшен-запуска: gunicorn + воркеры uvicorn.
+
+Запуск:
+    python -m app.serve
+"""
+
+import importlib.util
+import os
+from typing import Any, Dict
+
+from gunicorn.app.base import BaseApplication
+from uvicorn.workers import UvicornWorker
+
+from app.core.config import settings
+
+
+def _has_module(name: str) -> bool:
+    """Проверяет, установлен ли модуль, не импортируя его."""
+    return importlib.util.find_spec(name) is not None
+
+
+class NotesUvicornWorker(UvicornWorker):
+    """Воркер uvicorn с uvloop/httptools, если они установлены."""
+
+    CONFIG_KWARGS = {
+        "loop": "uvloop" if _has_module("uvloop") else "asyncio",
+        "http": "httptools" if _has_module("httptools") else "h11",
+        "lifespan": "on",
+    }
+
+
+def cpu_count() -> int:
+    """
+    Количество доступных процессу ядер (с учетом cpuset контейнера).
+
+    Returns:
+        int: Число ядер
+    """
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # pragma: no cover - не Linux
+        return os.cpu_count() or 1
+
+
+def when_ready(server: Any) -> None:
+    """Хук gunicorn: мастер запущен, воркеры создаются."""
+    pool = (
+        "PgBouncer"
+        if settings.DB_POOL_MODE == "pgbouncer"
+        else f"{settings.pool_size_per_worker()}"
+        f"+{settings.max_overflow_per_worker()} per worker"
+    )
+    server.log.info("Starting %s workers, DB pool: %s", server.num_workers, pool)
+
+
+def post_fork(server: Any, worker: Any) -> None:
+    """
+    Хук gunicorn после fork воркера.
+
+    Приложение загружено в мастере (preload). Движки обычно создаются
+    уже в воркере (lifespan), но если мастер успел открыть пул, воркер
+    унаследует его: сбрасываем без закрытия сокетов, чтобы каждый
+    воркер открыл собственные соединения.
+    """
+    from app.db.database import created_engines
+
+    for db_engine in created_engines():
+        db_engine.sync_engine.dispose(close=False)
+
+
+def worker_exit(server: Any, worker: Any) -> None:
+    """Хук gunicorn при завершении воркера."""
+    server.log.info("Worker %s exited", worker.pid)
+
+
+class NotesApplication(BaseApplication):
+    """Gunicorn-приложение с конфигурацией из Settings."""
+
+    def __init__(self, options: Dict[str, Any]) -> None:
+        self.options = options
+        super().__init__()
+
+    def load_config(self) -> None:
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self) -> Any:
+        from app.main import create_app
+
+        return create_app()
+
+
+def build_options() -> Dict[str, Any]:
+    """
+    Собирает конфигурацию gunicorn.
+
+    Returns:
+        Dict[str, Any]: Опции gunicorn
+
+    Raises:
+        ValueError: Если на каждый воркер не приходится хотя бы одно
+            соединение из бюджета
+    """
+    workers = settings.WEB_CONCURRENCY or cpu_count()
+    # Пул соединений делится между воркерами: фиксируем их число до
+    # создания движков БД (в lifespan воркера).
+    settings.WEB_CONCURRENCY = workers
+    if settings.DB_POOL_MODE != "pgbouncer" and settings.connections_per_worker() < 1:
+        raise ValueError(
+            f"{workers} workers do not fit into DB_MAX_CONNECTIONS="
+            f"{settings.DB_MAX_CONNECTIONS} minus DB_RESERVED_CONNECTIONS="
+            f"{settings.DB_RESERVED_CONNECTIONS}: lower WEB_CONCURRENCY"
+        )
+
+    return {
+        "bind": f"{settings.SERVER_HOST}:{settings.SERVER_PORT}",
+        "workers": workers,
+        "worker_class": "app.serve.NotesUvicornWorker",
+        "preload_app": True,
+        "graceful_timeout": settings.SERVER_GRACEFUL_TIMEOUT,
+        "keepalive": settings.SERVER_KEEPALIVE,
+        "when_ready": when_ready,
+        "post_fork": post_fork,
+        "worker_exit": worker_exit,
+    }
+
+
+def main() -> None:
+    """Запускает сервер."""
+    NotesApplication(build_options()).run()
+
+
+if __name__ == "__main__":
+    main()
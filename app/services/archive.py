@@ -0,0 +1,100 @@
+"""
+Фоновый перенос старых заметок в архив.
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.core.config import settings
+from app.crud.note_archive import note_archive as note_archive_crud
+from app.db.sharding import shards
+from app.services.tasks import register_task
+
+logger = logging.getLogger(__name__)
+
+
+async def archive_stale_notes(
+    session_factory: Optional[async_sessionmaker] = None,
+    after_days: Optional[int] = None,
+    batch_size: Optional[int] = None,
+) -> int:
+    """
+    Переносит в архив все заметки, не изменявшиеся after_days дней.
+
+    Каждая пачка выполняется в отдельной короткой транзакции,
+    чтобы не держать блокировки на большом количестве строк.
+
+    Args:
+        session_factory: Фабрика сессий (по умолчанию - все шарды по очереди)
+        after_days: Возраст заметок в днях (по умолчанию из настроек)
+        batch_size: Размер пачки (по умолчанию из настроек)
+
+    Returns:
+        int: Количество перенесенных заметок
+    """
+    if session_factory is None:
+        total = 0
+        for shard_factory in shards.session_factories():
+            total += await archive_stale_notes(shard_factory, after_days, batch_size)
+        return total
+
+    after_days = after_days if after_days is not None else settings.ARCHIVE_AFTER_DAYS
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+    cutoff = datetime.now() - timedelta(days=after_days)
+    total = 0
+
+    while True:
+        async with session_factory() as db:
+            moved = await note_archive_crud.archive_stale(
+                db, cutoff=cutoff, batch_size=batch_size
+            )
+        total += moved
+        if moved < batch_size:
+            return total
+        # Отдаем цикл событий между пачками
+        await asyncio.sleep(0)
+
+
+@register_task("archive_stale_notes")
+async def archive_stale_notes_task() -> None:
+    """Задача очереди: архивация старых заметок."""
+    moved = await archive_stale_notes()
+    logger.info("Archived %d notes", moved)
+
+
+class NoteArchiver:
+    """Периодический запуск архивации в процессе приложения."""
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """Запускает периодическую архивацию."""
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Останавливает периодическую архивацию."""
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                moved = await archive_stale_notes()
+                if moved:
+                    logger.info("Archived %d notes", moved)
+            except Exception:
+                logger.exception("Note archival failed")
+            await asyncio.sleep(self.interval)
+
+
+note_archiver = NoteArchiver(interval=settings.ARCHIVE_INTERVAL_SECONDS)
@@ -0,0 +1,231 @@
+"""
+Лента изменений заметок: Postgres LISTEN/NOTIFY и раздача подписчикам.
+
+Записи в NoteCRUD выполняют NOTIFY в своей транзакции, а каждый воркер
+держит по LISTEN-соединению на шард и раздает события подписчикам в памяти.
+"""
+
+import asyncio
+import json
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, Set
+
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Событие для клиента, который не успевает читать: нужно перечитать список
+RESYNC_EVENT: Dict[str, Any] = {"type": "resync"}
+# Ключ session.info для событий, ожидающих коммита (не-Postgres СУБД)
+PENDING_KEY = "change_feed_pending"
+
+
+class Subscription:
+    """Подписка одного клиента с ограниченным буфером событий."""
+
+    def __init__(self, user_id: int, maxsize: int) -> None:
+        self.user_id = user_id
+        self.dropped = 0
+        self._resync_pending = False
+        self._queue: asyncio.Queue[Dict[str, Any]] = asyncio.Queue(maxsize=maxsize)
+
+    def put(self, change: Dict[str, Any]) -> None:
+        """
+        Добавляет событие, не блокируя издателя.
+
+        Если буфер переполнен, накопленные события отбрасываются и клиент
+        получает resync: медленный потребитель не тормозит остальных.
+        До прочтения resync новые события тоже отбрасываются.
+
+        Args:
+            change: Событие изменения
+        """
+        if self._resync_pending:
+            self.dropped += 1
+            return
+
+        try:
+            self._queue.put_nowait(change)
+        except asyncio.QueueFull:
+            self.dropped += self._queue.qsize() + 1
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            self._queue.put_nowait(RESYNC_EVENT)
+            self._resync_pending = True
+
+    async def get(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        Ждет следующее событие.
+
+        Args:
+            timeout: Время ожидания в секундах
+
+        Returns:
+            Optional[Dict[str, Any]]: Событие или None по таймауту
+        """
+        try:
+            change = await asyncio.wait_for(self._queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+        if change is RESYNC_EVENT:
+            self._resync_pending = False
+
+        return change
+
+
+class ChangeFeed:
+    """Раздача событий изменений подписчикам текущего процесса."""
+
+    def __init__(self, channel: str, queue_size: int = 100) -> None:
+        self.channel = channel
+        self.queue_size = queue_size
+        self._subscribers: Dict[int, Set[Subscription]] = {}
+        # DSN шарда -> LISTEN-соединение
+        self._connections: Dict[str, Any] = {}
+        self._reconnect_tasks: Dict[str, asyncio.Task] = {}
+        self._running = False
+
+    @asynccontextmanager
+    async def subscribe(self, user_id: int) -> AsyncIterator[Subscription]:
+        """
+        Подписывает клиента на изменения заметок пользователя.
+
+        Args:
+            user_id: ID пользователя
+
+        Yields:
+            Subscription: Подписка
+        """
+        subscription = Subscription(user_id, self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(subscription)
+        try:
+            yield subscription
+        finally:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[user_id]
+
+    def publish(self, change: Dict[str, Any]) -> None:
+        """
+        Раздает событие подписчикам владельца заметки.
+
+        Args:
+            change: Событие с ключом owner_id
+        """
+        for subscription in self._subscribers.get(change.get("owner_id"), ()):
+            subscription.put(change)
+
+    async def notify(self, db: AsyncSession, change: Dict[str, Any]) -> None:
+        """
+        Публикует событие в рамках транзакции сессии.
+
+        В Postgres выполняется pg_notify: событие доставляется только после
+        коммита. Для других СУБД событие раздается в процессе после коммита.
+
+        Args:
+            db: Сессия БД с открытой транзакцией
+            change: Событие изменения
+        """
+        if not settings.CHANGE_FEED_ENABLED:
+            return
+
+        if db.get_bind().dialect.name == "postgresql":
+            await db.execute(select(func.pg_notify(self.channel, json.dumps(change))))
+            return
+
+        pending = db.info.get(PENDING_KEY)
+        if pending is None:
+            pending = db.info[PENDING_KEY] = []
+            event.listen(db.sync_session, "after_commit", self._publish_pending)
+            event.listen(db.sync_session, "after_soft_rollback", self._discard_pending)
+        pending.append(change)
+
+    def _publish_pending(self, session: Session) -> None:
+        pending = session.info.get(PENDING_KEY, [])
+        for change in pending:
+            self.publish(change)
+        pending.clear()
+
+    @staticmethod
+    def _discard_pending(session: Session, previous_transaction: Any) -> None:
+        # Откат SAVEPOINT не отменяет события внешней транзакции
+        if not previous_transaction.nested:
+            session.info.get(PENDING_KEY, []).clear()
+
+    async def start(self, *dsns: str) -> None:
+        """
+        Открывает LISTEN-соединения воркера (по одному на шард).
+
+        Args:
+            *dsns: DSN Postgres в формате asyncpg (postgresql://...)
+        """
+        self._running = True
+        for dsn in dsns:
+            await self._connect(dsn)
+
+    async def stop(self) -> None:
+        """Закрывает LISTEN-соединения."""
+        self._running = False
+        for task in self._reconnect_tasks.values():
+            task.cancel()
+        self._reconnect_tasks.clear()
+        for connection in self._connections.values():
+            await connection.close()
+        self._connections.clear()
+
+    async def _connect(self, dsn: str) -> None:
+        import asyncpg
+
+        connection = await asyncpg.connect(dsn)
+        connection.add_termination_listener(lambda conn: self._on_terminated(dsn))
+        await connection.add_listener(self.channel, self._on_notification)
+        self._connections[dsn] = connection
+
+    def _on_notification(
+        self, connection: Any, pid: int, channel: str, payload: str
+    ) -> None:
+        try:
+            self.publish(json.loads(payload))
+        except ValueError:
+            logger.warning("Invalid change feed payload: %r", payload)
+
+    def _on_terminated(self, dsn: str) -> None:
+        self._connections.pop(dsn, None)
+        if not self._running:
+            return
+
+        logger.warning("Change feed connection lost, reconnecting")
+        self._reconnect_tasks[dsn] = asyncio.get_running_loop().create_task(
+            self._reconnect(dsn)
+        )
+
+    async def _reconnect(self, dsn: str) -> None:
+        delay = 0.5
+        while self._running:
+            try:
+                await self._connect(dsn)
+            except Exception:
+                logger.warning("Change feed reconnect failed", exc_info=True)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30.0)
+                continue
+            self._reconnect_tasks.pop(dsn, None)
+            # События за время разрыва потеряны: клиенты перечитывают данные
+            for subscribers in self._subscribers.values():
+                for subscription in subscribers:
+                    subscription.put(RESYNC_EVENT)
+            return
+
+
+change_feed = ChangeFeed(
+    channel=settings.CHANGE_FEED_CHANNEL,
+    queue_size=settings.CHANGE_FEED_QUEUE_SIZE,
+)
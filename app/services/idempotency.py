@@ -0,0 +1,408 @@
+"""
+Идемпотентность запросов по заголовку Idempotency-Key.
+
+Повтор запроса с тем же ключом возвращает сохраненный ответ без
+повторного выполнения. Ключи хранятся в таблице idempotency_keys,
+перед ней - LRU-кеш процесса, а одновременные дубликаты в одном
+процессе ждут результата первого запроса.
+
+Ответ записывается в ту же транзакцию, что и изменения обработчика,
+поэтому закоммиченная запись не выполняется повторно. Резерв ключа
+коммитится до обработчика с арендой locked_until: если процесс упал
+до коммита ответа, ключ остается "в процессе" только до конца аренды,
+после чего повтор перехватывает его и выполняет запрос заново. Аренда
+служит версией строки (version_id_col): опоздавший исходный запрос не
+закоммитит ответ поверх перехватившего.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm.exc import StaleDataError
+
+from app.core.config import settings
+from app.db.models import IdempotencyKey
+from app.db.sharding import shards
+
+logger = logging.getLogger(__name__)
+
+# Сохраняет код ответа и JSON-совместимое тело (до коммита обработчика)
+SaveResponse = Callable[[int, Any], None]
+# Обработчик выполняет запись и до ее коммита вызывает SaveResponse
+Handler = Callable[[SaveResponse], Awaitable[None]]
+
+REPLAY_HEADER = "Idempotent-Replayed"
+
+
+@dataclass
+class StoredResponse:
+    """Сохраненный ответ на запрос."""
+
+    request_hash: str
+    status_code: int
+    body: Any
+    expires_at: datetime
+
+
+def request_fingerprint(method: str, path: str, body: Any) -> str:
+    """
+    Хеш запроса для проверки, что ключ повторно используется с тем же телом.
+
+    Args:
+        method: HTTP метод
+        path: Путь запроса
+        body: JSON-совместимое тело запроса
+
+    Returns:
+        str: SHA-256 в hex
+    """
+    canonical = json.dumps(
+        [method, path, body], sort_keys=True, separators=(",", ":"), default=str
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class IdempotencyStore:
+    """Хранилище ответов идемпотентных запросов."""
+
+    def __init__(
+        self,
+        cache_size: int = 10_000,
+        ttl_seconds: int = 86_400,
+        lease_seconds: float = 120.0,
+    ) -> None:
+        self.cache_size = cache_size
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.lease = timedelta(seconds=lease_seconds)
+        self._cache: "OrderedDict[Tuple[int, str], StoredResponse]" = OrderedDict()
+        self._in_flight: Dict[Tuple[int, str], asyncio.Future] = {}
+
+    async def execute(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        key: str,
+        request_hash: str,
+        handler: Handler,
+    ) -> JSONResponse:
+        """
+        Выполняет запрос не более одного раза для пары (пользователь, ключ).
+
+        Args:
+            db: Сессия БД
+            user_id: ID пользователя
+            key: Значение Idempotency-Key
+            request_hash: Хеш запроса
+            handler: Обработчик, выполняющий запись. Ответ он передает
+                в save до своего коммита; оставшиеся изменения
+                коммитятся вместе с ответом
+
+        Returns:
+            JSONResponse: Новый или сохраненный ответ
+
+        Raises:
+            HTTPException: 422 если ключ использован с другим запросом,
+                409 если исходный запрос еще выполняется в другом процессе
+                (его аренда не истекла)
+        """
+        cache_key = (user_id, key)
+
+        stored = self._get_cached(cache_key)
+        if stored is not None:
+            return self._replay(stored, request_hash)
+
+        in_flight = self._in_flight.get(cache_key)
+        if in_flight is not None:
+            stored = await asyncio.shield(in_flight)
+            return self._replay(stored, request_hash)
+
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._in_flight[cache_key] = future
+        try:
+            stored, replayed = await self._execute_once(
+                db, user_id, key, request_hash, handler
+            )
+        except BaseException as exc:
+            future.set_exception(exc)
+            # Исключение уже передается вызывающему, ожидающим - через future
+            future.exception()
+            raise
+        finally:
+            del self._in_flight[cache_key]
+
+        future.set_result(stored)
+        self._put_cached(cache_key, stored)
+
+        if replayed:
+            return self._replay(stored, request_hash)
+
+        return JSONResponse(stored.body, status_code=stored.status_code)
+
+    async def _execute_once(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        key: str,
+        request_hash: str,
+        handler: Handler,
+    ) -> Tuple[StoredResponse, bool]:
+        while True:
+            record = await self._reserve(db, user_id, key, request_hash)
+            if record is not None:
+                break
+
+            existing = await self._load_existing(db, user_id, key)
+            if existing is None:
+                # Исходный запрос откатился и снял ключ: резервируем заново
+                continue
+            if existing.status_code is not None:
+                stored = StoredResponse(
+                    existing.request_hash,
+                    existing.status_code,
+                    existing.response_body,
+                    existing.expires_at,
+                )
+                return stored, True
+            if existing.locked_until > datetime.now():
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="A request with this Idempotency-Key is in progress",
+                )
+            if existing.request_hash != request_hash:
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail="Idempotency-Key was used with a different request",
+                )
+            if await self._take_over(db, existing):
+                record = existing
+                break
+
+        lease = record.locked_until
+        response: List[Tuple[int, Any]] = []
+
+        def save(status_code: int, body: Any) -> None:
+            # Изменение записи ключа уходит в БД коммитом обработчика.
+            # Аренда меняется: запрос, прочитавший ключ до ответа, не
+            # перехватит завершенный ключ
+            record.status_code = status_code
+            record.response_body = body
+            record.locked_until = datetime.now()
+            response[:] = [(status_code, body)]
+
+        try:
+            await handler(save)
+            if not response:
+                raise RuntimeError("Idempotent handler did not save a response")
+            await db.commit()
+        except BaseException:
+            await db.rollback()
+            # Ответ уже закоммичен вместе с записью: повтор его воспроизведет.
+            # Ключ, перехваченный после истечения аренды, тоже не трогаем
+            await db.execute(
+                delete(IdempotencyKey).where(
+                    IdempotencyKey.user_id == user_id,
+                    IdempotencyKey.key == key,
+                    IdempotencyKey.status_code.is_(None),
+                    IdempotencyKey.locked_until == lease,
+                )
+            )
+            await db.commit()
+            raise
+
+        status_code, body = response[0]
+        return StoredResponse(request_hash, status_code, body, record.expires_at), False
+
+    async def _reserve(
+        self, db: AsyncSession, user_id: int, key: str, request_hash: str
+    ) -> Optional[IdempotencyKey]:
+        """
+        Резервирует ключ: уникальный PK защищает от дубликатов между процессами.
+
+        Returns:
+            Optional[IdempotencyKey]: Закоммиченный резерв или None, если
+                ключ уже есть
+        """
+        now = datetime.now()
+        await db.execute(
+            delete(IdempotencyKey).where(
+                IdempotencyKey.user_id == user_id,
+                IdempotencyKey.key == key,
+                IdempotencyKey.expires_at <= now,
+            )
+        )
+        record = IdempotencyKey(
+            user_id=user_id,
+            key=key,
+            request_hash=request_hash,
+            locked_until=now + self.lease,
+            expires_at=now + self.ttl,
+        )
+        db.add(record)
+        try:
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            return None
+
+        return record
+
+    async def _take_over(self, db: AsyncSession, record: IdempotencyKey) -> bool:
+        """
+        Перехватывает ключ, аренда которого истекла без ответа.
+
+        UPDATE проверяет загруженную аренду: из двух повторов ключ
+        получает один, а завершившийся тем временем запрос (аренда
+        изменена ответом) не выполняется повторно.
+
+        Returns:
+            bool: True, если ключ перехвачен
+        """
+        now = datetime.now()
+        record.locked_until = now + self.lease
+        record.expires_at = now + self.ttl
+        try:
+            await db.commit()
+        except StaleDataError:
+            await db.rollback()
+            # Следующий резерв добавит в сессию новый объект с тем же ключом
+            db.expunge(record)
+            return False
+
+        return True
+
+    @staticmethod
+    async def _load_existing(
+        db: AsyncSession, user_id: int, key: str
+    ) -> Optional[IdempotencyKey]:
+        result = await db.execute(
+            select(IdempotencyKey)
+            .where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+            .execution_options(populate_existing=True)
+        )
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    def _replay(stored: StoredResponse, request_hash: str) -> JSONResponse:
+        if stored.request_hash != request_hash:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Idempotency-Key was used with a different request",
+            )
+
+        return JSONResponse(
+            stored.body,
+            status_code=stored.status_code,
+            headers={REPLAY_HEADER: "true"},
+        )
+
+    def _get_cached(self, cache_key: Tuple[int, str]) -> Optional[StoredResponse]:
+        stored = self._cache.get(cache_key)
+        if stored is None:
+            return None
+
+        if stored.expires_at <= datetime.now():
+            del self._cache[cache_key]
+            return None
+
+        self._cache.move_to_end(cache_key)
+        return stored
+
+    def _put_cached(self, cache_key: Tuple[int, str], stored: StoredResponse) -> None:
+        self._cache[cache_key] = stored
+        self._cache.move_to_end(cache_key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    @staticmethod
+    async def purge_expired(db: AsyncSession) -> int:
+        """
+        Удаляет просроченные ключи.
+
+        Args:
+            db: Сессия БД
+
+        Returns:
+            int: Количество удаленных записей
+        """
+        result = await db.execute(
+            delete(IdempotencyKey).where(IdempotencyKey.expires_at <= datetime.now())
+        )
+        await db.commit()
+
+        return result.rowcount
+
+
+async def purge_expired_keys(
+    session_factory: Optional[async_sessionmaker] = None,
+) -> int:
+    """
+    Удаляет просроченные ключи идемпотентности.
+
+    Args:
+        session_factory: Фабрика сессий (по умолчанию - все шарды по очереди)
+
+    Returns:
+        int: Количество удаленных ключей
+    """
+    if session_factory is None:
+        total = 0
+        for shard_factory in shards.session_factories():
+            total += await purge_expired_keys(shard_factory)
+        return total
+
+    async with session_factory() as db:
+        return await IdempotencyStore.purge_expired(db)
+
+
+class IdempotencyPurger:
+    """Периодическое удаление просроченных ключей в процессе приложения."""
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """Запускает периодическую очистку."""
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Останавливает периодическую очистку."""
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                removed = await purge_expired_keys()
+                if removed:
+                    logger.info("Purged %d idempotency keys", removed)
+            except Exception:
+                logger.exception("Idempotency key purge failed")
+
+            await asyncio.sleep(self.interval)
+
+
+idempotency = IdempotencyStore(
+    cache_size=settings.IDEMPOTENCY_CACHE_SIZE,
+    ttl_seconds=settings.IDEMPOTENCY_TTL_SECONDS,
+    lease_seconds=settings.IDEMPOTENCY_LEASE_SECONDS,
+)
+
+idempotency_purger = IdempotencyPurger(
+    interval=settings.IDEMPOTENCY_PURGE_INTERVAL_SECONDS
+)
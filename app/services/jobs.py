@@ -0,0 +1,60 @@
+"""
+Фоновые задачи приложения.
+"""
+
+import asyncio
+import logging
+from typing import Any
+
+from app.core.security import get_password_hash
+from app.crud.user import user as user_crud
+from app.db.sharding import shards
+from app.services.idempotency import purge_expired_keys
+from app.services.tasks import register_task
+
+audit_logger = logging.getLogger("app.audit")
+
+
+@register_task("audit_event")
+async def audit_event(event: str, user_id: int, **data: Any) -> None:
+    """
+    Записывает событие аудита.
+
+    Args:
+        event: Имя события
+        user_id: ID пользователя, выполнившего действие
+        **data: Дополнительные данные события
+    """
+    audit_logger.info("%s user_id=%s %s", event, user_id, data)
+
+
+async def rehash_password(user_id: int, password: str) -> None:
+    """
+    Пересчитывает хеш пароля с текущими параметрами CryptContext.
+
+    Ставится в очередь процесса при входе, если параметры хеша устарели.
+    Не регистрируется для очереди в БД: пароль в открытом виде
+    не должен попадать в таблицу задач.
+
+    Args:
+        user_id: ID пользователя
+        password: Пароль, только что прошедший проверку
+    """
+    shard = await shards.resolve(user_id)
+    if shard is None:
+        return
+
+    async with shards.session(shard) as db:
+        db_user = await user_crud.get_by_id(db, user_id=user_id)
+        if db_user is None:
+            return
+
+        # bcrypt занимает процессор: считаем вне цикла событий
+        db_user.hashed_password = await asyncio.to_thread(get_password_hash, password)
+        await db.commit()
+
+
+@register_task("purge_idempotency_keys")
+async def purge_idempotency_keys() -> None:
+    """Удаляет просроченные ключи идемпотентности на всех шардах."""
+    await purge_expired_keys()
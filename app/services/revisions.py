@@ -0,0 +1,269 @@
+"""
+Запись истории изменений заметок пачками вне обработки запроса.
+
+После коммита изменения CRUD передает новую версию заметки в
+RevisionRecorder. Версия попадает в буфер процесса, а фоновая задача
+пишет буфер одним INSERT на шард. Это происходит раз в
+NOTE_REVISION_FLUSH_INTERVAL секунд или сразу, когда набралась пачка.
+Ответ не ждет ни построения дельты, ни записи.
+
+История - вспомогательные данные. Версии, не записанные при аварийной
+остановке, теряются. Следующая версия такой заметки будет записана
+снимком.
+"""
+
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from app.core.config import settings
+from app.crud.note_revision import PendingRevision
+from app.crud.note_revision import note_revision as note_revision_crud
+from app.db.sharding import shards
+from app.services.tasks import DurableTaskQueue, register_task
+
+logger = logging.getLogger(__name__)
+
+
+async def compact_revisions(
+    session_factory: Optional[async_sessionmaker] = None,
+    keep: Optional[int] = None,
+    batch_size: int = 100,
+) -> int:
+    """
+    Сжимает историю: оставляет у заметок keep последних версий.
+
+    Args:
+        session_factory: Фабрика сессий (по умолчанию - все шарды по очереди)
+        keep: Сколько версий оставить (по умолчанию из настроек)
+        batch_size: Сколько заметок обрабатывать в одной транзакции
+
+    Returns:
+        int: Количество удаленных версий
+    """
+    if session_factory is None:
+        total = 0
+        for shard_factory in shards.session_factories():
+            total += await compact_revisions(shard_factory, keep, batch_size)
+        return total
+
+    keep = keep or settings.NOTE_REVISION_KEEP
+    total = 0
+    while True:
+        async with session_factory() as db:
+            removed = await note_revision_crud.compact(
+                db, keep=keep, batch_size=batch_size
+            )
+        if not removed:
+            return total
+        total += removed
+        # Отдаем цикл событий между пачками
+        await asyncio.sleep(0)
+
+
+@register_task("compact_note_revisions")
+async def compact_revisions_task() -> None:
+    """Задача очереди: сжатие истории изменений заметок."""
+    removed = await compact_revisions()
+    logger.info("Removed %d note revisions", removed)
+
+
+@register_task("remove_note_revisions")
+async def remove_note_revisions(owner_id: int, note_id: int) -> None:
+    """
+    Задача очереди: удаление истории удаленной заметки.
+
+    Args:
+        owner_id: ID владельца
+        note_id: ID заметки
+    """
+    shard = await shards.resolve(owner_id)
+    if shard is None:
+        return
+
+    async with shards.session(shard) as db:
+        await note_revision_crud.remove_note(db, owner_id, note_id)
+        await db.commit()
+
+
+async def remove_history(db: AsyncSession, owner_id: int, note_id: int) -> None:
+    """
+    Удаляет историю заметки в транзакции ее удаления (без коммита).
+
+    С очередью в БД (TASK_DURABLE_ENABLED) история длиной в сотни версий
+    не удаляется в запросе: задача ставится в ту же транзакцию и не
+    теряется, а при откате удаления не выполняется.
+
+    Args:
+        db: Сессия БД
+        owner_id: ID владельца
+        note_id: ID заметки
+    """
+    if settings.TASK_DURABLE_ENABLED:
+        DurableTaskQueue.enqueue(
+            db, "remove_note_revisions", owner_id=owner_id, note_id=note_id
+        )
+    else:
+        await note_revision_crud.remove_note(db, owner_id, note_id)
+
+
+class RevisionRecorder:
+    """
+    Буфер версий заметок с фоновой записью и периодическим сжатием.
+
+    Пока рекордер не запущен (нет lifespan: CLI, большинство тестов),
+    версии не записываются.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        max_pending: int = 1000,
+        snapshot_every: int = 20,
+        compact_interval: float = 3600,
+    ) -> None:
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.snapshot_every = snapshot_every
+        self.compact_interval = compact_interval
+        self._pending: List[Tuple[AsyncEngine, PendingRevision]] = []
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self._stopping = asyncio.Event()
+        self._compacted_at = 0.0
+
+    @property
+    def running(self) -> bool:
+        """Запущена ли фоновая запись."""
+        return self._task is not None
+
+    def record(
+        self,
+        db: AsyncSession,
+        db_note: Any,
+        base_content: Optional[str] = None,
+        has_base: bool = True,
+    ) -> None:
+        """
+        Добавляет закоммиченную версию заметки в буфер (без ожидания).
+
+        Args:
+            db: Сессия, в которой изменена заметка (определяет шард)
+            db_note: Заметка или строка RETURNING в новой версии
+            base_content: Содержимое предыдущей версии
+            has_base: False для новой заметки (предыдущей версии нет)
+        """
+        if not self.running:
+            return
+        if len(self._pending) >= self.max_pending:
+            logger.warning(
+                "Revision buffer is full, dropping note %s version %s",
+                db_note.id,
+                db_note.version,
+            )
+            return
+
+        self._pending.append(
+            (
+                db.bind,
+                PendingRevision(
+                    owner_id=db_note.owner_id,
+                    note_id=db_note.id,
+                    version=db_note.version,
+                    title=db_note.title,
+                    content=db_note.content,
+                    created_at=db_note.updated_at,
+                    base_content=base_content,
+                    has_base=has_base,
+                ),
+            )
+        )
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    async def flush(self) -> int:
+        """
+        Записывает буфер: одна транзакция на шард.
+
+        Returns:
+            int: Количество записанных версий
+        """
+        pending, self._pending = self._pending, []
+        by_engine: Dict[AsyncEngine, List[PendingRevision]] = defaultdict(list)
+        for engine, revision in pending:
+            by_engine[engine].append(revision)
+
+        written = 0
+        for engine, revisions in by_engine.items():
+            try:
+                async with AsyncSession(engine, expire_on_commit=False) as db:
+                    written += await note_revision_crud.add_many(
+                        db, revisions, snapshot_every=self.snapshot_every
+                    )
+            except Exception:
+                logger.exception("Failed to write %d note revisions", len(revisions))
+
+        return written
+
+    async def start(self) -> None:
+        """Запускает фоновую запись."""
+        # События привязываются к циклу событий, в котором запущен рекордер
+        self._wakeup = asyncio.Event()
+        self._stopping = asyncio.Event()
+        self._compacted_at = time.monotonic()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Останавливает фоновую запись, дописывая буфер.
+
+        Args:
+            timeout: Максимальное время ожидания в секундах
+        """
+        if self._task is None:
+            return
+
+        self._stopping.set()
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(self._task, timeout=timeout)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+        self._task = None
+
+    async def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+            if time.monotonic() - self._compacted_at >= self.compact_interval:
+                self._compacted_at = time.monotonic()
+                try:
+                    removed = await compact_revisions()
+                    if removed:
+                        logger.info("Removed %d note revisions", removed)
+                except Exception:
+                    logger.exception("Note revision compaction failed")
+
+        # Версии, добавленные во время последней записи
+        await self.flush()
+
+
+# Рекордер процесса (запускается в lifespan приложения)
+revision_recorder = RevisionRecorder(
+    batch_size=settings.NOTE_REVISION_BATCH_SIZE,
+    flush_interval=settings.NOTE_REVISION_FLUSH_INTERVAL,
+    max_pending=settings.NOTE_REVISION_QUEUE_SIZE,
+    snapshot_every=settings.NOTE_REVISION_SNAPSHOT_EVERY,
+    compact_interval=settings.NOTE_REVISION_COMPACT_INTERVAL_SECONDS,
+)
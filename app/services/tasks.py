@@ -0,0 +1,338 @@
+"""
+Фоновые задачи: очередь в процессе и опциональная очередь в Postgres.
+
+Используются для побочных эффектов записи, которые не должны входить
+во время ответа: аудит, пересчет хешей паролей, инвалидация кешей и т.п.
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.config import settings
+from app.db.models import BackgroundJob
+from app.db.sharding import shards
+
+logger = logging.getLogger(__name__)
+
+TaskFunc = Callable[..., Awaitable[Any]]
+
+# Реестр именованных задач (нужен для очереди в БД, где хранится только имя)
+TASK_HANDLERS: Dict[str, TaskFunc] = {}
+
+
+def register_task(name: str) -> Callable[[TaskFunc], TaskFunc]:
+    """
+    Декоратор регистрации задачи под именем.
+
+    Args:
+        name: Уникальное имя задачи
+
+    Returns:
+        Callable: Декоратор, возвращающий функцию без изменений
+    """
+
+    def decorator(func: TaskFunc) -> TaskFunc:
+        TASK_HANDLERS[name] = func
+        return func
+
+    return decorator
+
+
+def retry_delay(attempt: int) -> float:
+    """
+    Задержка перед повтором (экспоненциальная).
+
+    Args:
+        attempt: Номер неудачной попытки, начиная с 1
+
+    Returns:
+        float: Задержка в секундах
+    """
+    return settings.TASK_RETRY_BACKOFF * (2 ** (attempt - 1))
+
+
+@dataclass
+class Job:
+    """Задача в очереди процесса."""
+
+    func: TaskFunc
+    args: tuple = ()
+    kwargs: Dict[str, Any] = field(default_factory=dict)
+    attempts: int = 0
+
+
+class TaskQueue:
+    """
+    Очередь asyncio с ограниченным параллелизмом и повторами.
+
+    Задачи выполняются фиксированным числом воркеров. При ошибке задача
+    откладывается с экспоненциальной задержкой, не занимая воркер.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = 4,
+        max_size: int = 10_000,
+        max_retries: int = 3,
+    ) -> None:
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self._queue: asyncio.Queue[Job] = asyncio.Queue(maxsize=max_size)
+        self._workers: Set[asyncio.Task] = set()
+        self._delayed: Set[asyncio.Task] = set()
+        self._accepting = True
+
+    @property
+    def running(self) -> bool:
+        """Запущены ли воркеры."""
+        return bool(self._workers)
+
+    async def start(self) -> None:
+        """Запускает воркеры."""
+        self._accepting = True
+        for _ in range(self.concurrency - len(self._workers)):
+            self._workers.add(asyncio.create_task(self._worker()))
+
+    def enqueue(self, func: TaskFunc, *args: Any, **kwargs: Any) -> bool:
+        """
+        Ставит задачу в очередь без ожидания.
+
+        Args:
+            func: Асинхронная функция задачи
+            *args: Позиционные аргументы
+            **kwargs: Именованные аргументы
+
+        Returns:
+            bool: False, если задача отброшена (очередь полна или закрыта)
+        """
+        if not self._accepting:
+            logger.warning("Task queue is draining, dropping %s", func.__name__)
+            return False
+
+        try:
+            self._queue.put_nowait(Job(func=func, args=args, kwargs=kwargs))
+        except asyncio.QueueFull:
+            logger.warning("Task queue is full, dropping %s", func.__name__)
+            return False
+
+        return True
+
+    async def drain(self, timeout: Optional[float] = None) -> None:
+        """
+        Останавливает прием задач и дожидается выполнения очереди.
+
+        Args:
+            timeout: Максимальное время ожидания в секундах
+        """
+        self._accepting = False
+        try:
+            await asyncio.wait_for(self._wait_all(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                "Task queue drain timed out, %d jobs left", self._queue.qsize()
+            )
+        finally:
+            for task in self._workers | self._delayed:
+                task.cancel()
+            await asyncio.gather(*self._workers, *self._delayed, return_exceptions=True)
+            self._workers.clear()
+            self._delayed.clear()
+
+    async def _wait_all(self) -> None:
+        while True:
+            await self._queue.join()
+            # Отложенные повторы возвращаются в очередь, дожидаемся и их
+            if not self._delayed:
+                return
+            await asyncio.gather(*list(self._delayed))
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Job) -> None:
+        job.attempts += 1
+        try:
+            await job.func(*job.args, **job.kwargs)
+        except Exception:
+            if job.attempts > self.max_retries:
+                logger.exception(
+                    "Task %s failed after %d attempts", job.func.__name__, job.attempts
+                )
+                return
+
+            logger.warning(
+                "Task %s failed (attempt %d), retrying",
+                job.func.__name__,
+                job.attempts,
+                exc_info=True,
+            )
+            delayed = asyncio.create_task(self._retry_later(job))
+            self._delayed.add(delayed)
+            delayed.add_done_callback(self._delayed.discard)
+
+    async def _retry_later(self, job: Job) -> None:
+        await asyncio.sleep(retry_delay(job.attempts))
+        await self._queue.put(job)
+
+
+class DurableTaskQueue:
+    """
+    Очередь задач в таблице background_jobs.
+
+    Задачи ставятся в той же транзакции, что и основная запись, поэтому
+    лежат на шарде этой записи. Воркеры разбирают таблицы всех шардов через
+    SELECT ... FOR UPDATE SKIP LOCKED, поэтому несколько процессов не берут
+    одну и ту же задачу.
+    """
+
+    def __init__(
+        self,
+        session_factory: Optional[async_sessionmaker] = None,
+        batch_size: int = 10,
+        poll_interval: float = 1.0,
+        max_retries: int = 3,
+    ) -> None:
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_retries = max_retries
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = asyncio.Event()
+
+    @staticmethod
+    def enqueue(db: AsyncSession, name: str, **payload: Any) -> BackgroundJob:
+        """
+        Добавляет задачу в сессию (фиксируется вместе с транзакцией).
+
+        Args:
+            db: Сессия БД
+            name: Имя зарегистрированной задачи
+            **payload: Аргументы задачи (JSON-совместимые)
+
+        Returns:
+            BackgroundJob: Объект задачи
+        """
+        if name not in TASK_HANDLERS:
+            raise KeyError(f"Unknown task: {name}")
+
+        job = BackgroundJob(name=name, payload=payload)
+        db.add(job)
+
+        return job
+
+    async def start(self) -> None:
+        """Запускает цикл опроса таблицы."""
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._poll())
+
+    async def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Останавливает опрос, дожидаясь текущей пачки.
+
+        Args:
+            timeout: Максимальное время ожидания в секундах
+        """
+        if self._task is None:
+            return
+
+        self._stopping.set()
+        try:
+            await asyncio.wait_for(self._task, timeout=timeout)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+        self._task = None
+
+    async def _poll(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                processed = await self.run_batch()
+            except Exception:
+                logger.exception("Durable task batch failed")
+                processed = 0
+
+            if processed == 0:
+                try:
+                    await asyncio.wait_for(
+                        self._stopping.wait(), timeout=self.poll_interval
+                    )
+                except asyncio.TimeoutError:
+                    pass
+
+    async def run_batch(self) -> int:
+        """
+        Забирает и выполняет по пачке готовых задач с каждого шарда.
+
+        Returns:
+            int: Количество обработанных задач
+        """
+        if self.session_factory is not None:
+            return await self._run_batch(self.session_factory)
+
+        total = 0
+        for session_factory in shards.session_factories():
+            total += await self._run_batch(session_factory)
+        return total
+
+    async def _run_batch(self, session_factory: async_sessionmaker) -> int:
+        async with session_factory() as db:
+            result = await db.execute(
+                select(BackgroundJob)
+                .where(
+                    BackgroundJob.status == "pending",
+                    BackgroundJob.run_at <= datetime.now(),
+                )
+                .order_by(BackgroundJob.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            jobs = result.scalars().all()
+
+            for job in jobs:
+                await self._run(job)
+
+            await db.commit()
+
+        return len(jobs)
+
+    async def _run(self, job: BackgroundJob) -> None:
+        job.attempts += 1
+        try:
+            await TASK_HANDLERS[job.name](**job.payload)
+        except Exception as exc:
+            job.last_error = repr(exc)
+            if job.attempts > self.max_retries:
+                logger.exception("Durable task %s#%d failed", job.name, job.id)
+                job.status = "failed"
+            else:
+                job.run_at = datetime.now() + timedelta(
+                    seconds=retry_delay(job.attempts)
+                )
+            return
+
+        job.status = "done"
+
+
+# Очередь процесса (запускается в lifespan приложения)
+task_queue = TaskQueue(
+    concurrency=settings.TASK_QUEUE_CONCURRENCY,
+    max_size=settings.TASK_QUEUE_MAX_SIZE,
+    max_retries=settings.TASK_MAX_RETRIES,
+)
+
+# Очередь в БД на всех шардах (включается TASK_DURABLE_ENABLED)
+durable_queue = DurableTaskQueue(
+    batch_size=settings.TASK_DURABLE_BATCH_SIZE,
+    poll_interval=settings.TASK_DURABLE_POLL_INTERVAL,
+    max_retries=settings.TASK_MAX_RETRIES,
+)
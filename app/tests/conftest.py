@@ -1,27 +1,76 @@
 """
 Конфигурация тестов.
+
+По умолчанию тесты идут на SQLite в памяти. С TEST_DATABASE=postgres -
+на Postgres (см. app/tests/postgres.py): таблицы создаются один раз
+в схеме воркера, а между тестами очищаются, без DDL на каждый тест.
 """
 
 import asyncio
-from typing import AsyncGenerator, Generator
+import os
+from typing import AsyncGenerator, Generator, Optional
 import pytest
 from httpx import AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from app.main import app
+from app.api.deps import get_user_db
+from app.core.admission import admission
 from app.db.database import get_db
 from app.db.models import Base
-
-# Тестовая БД (SQLite в памяти)
-TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
-# Создаем тестовый движок
-test_engine = create_async_engine(
-    TEST_DATABASE_URL, echo=False, connect_args={"check_same_thread": False}
+from app.db.sharding import shards
+from app.tests.postgres import (
+    LocalPostgres,
+    create_tables,
+    truncate_tables,
+    worker_schema,
 )
+
+USE_POSTGRES = os.environ.get("TEST_DATABASE", "sqlite") == "postgres"
+
+# Временный кластер поднимает только процесс, который первым его запросил;
+# воркеры xdist получают адрес через окружение
+local_postgres: Optional[LocalPostgres] = None
+if USE_POSTGRES and "TEST_POSTGRES_URL" not in os.environ:
+    local_postgres = LocalPostgres()
+    os.environ["TEST_POSTGRES_URL"] = local_postgres.url
+
+if USE_POSTGRES:
+    # Своя схема на каждого воркера xdist
+    TEST_SCHEMA = worker_schema("test")
+    TEST_DATABASE_URL = os.environ["TEST_POSTGRES_URL"]
+    test_engine = create_async_engine(
+        TEST_DATABASE_URL,
+        echo=False,
+        connect_args={"server_settings": {"search_path": TEST_SCHEMA}},
+    )
+else:
+    # Тестовая БД (SQLite в памяти)
+    TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
+    test_engine = create_async_engine(
+        TEST_DATABASE_URL, echo=False, connect_args={"check_same_thread": False}
+    )
 # Создаем фабрику сессий для тестов
 TestingSessionLocal = sessionmaker(
     test_engine, class_=AsyncSession, expire_on_commit=False
 )
+# Один шард, совпадающий с основной тестовой БД
+shards.configure({"default": test_engine}, directory=test_engine)
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    """Запускает временный Postgres до создания воркеров xdist."""
+    if local_postgres is not None:
+        problem = LocalPostgres.available()
+        if problem:
+            raise pytest.UsageError(f"TEST_DATABASE=postgres: {problem}")
+        local_postgres.start()
+
+
+def pytest_unconfigure(config: pytest.Config) -> None:
+    """Останавливает временный Postgres."""
+    if local_postgres is not None:
+        local_postgres.stop()
 
 
 @pytest.fixture(scope="session")
@@ -32,19 +81,40 @@ def event_loop() -> Generator[asyncio.AbstractEventLoop, None, None]:
     loop.close()
 
 
-@pytest.fixture(scope="function", autouse=True)
-async def setup_database() -> AsyncGenerator[None, None]:
+@pytest.fixture(scope="session")
+async def database() -> AsyncGenerator[None, None]:
     """
-    Создает и удаляет тестовые таблицы для каждого теста.
+    Создает тестовые таблицы один раз на сессию (воркер xdist).
     """
-    # Создаем таблицы
     async with test_engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+        if USE_POSTGRES:
+            await conn.exec_driver_sql(f"DROP SCHEMA IF EXISTS {TEST_SCHEMA} CASCADE")
+            await conn.exec_driver_sql(f"CREATE SCHEMA {TEST_SCHEMA}")
+            await conn.run_sync(create_tables)
+        else:
+            await conn.run_sync(Base.metadata.create_all)
 
     yield
-    # Удаляем таблицы
+
+    if USE_POSTGRES:
+        async with test_engine.begin() as conn:
+            await conn.exec_driver_sql(f"DROP SCHEMA {TEST_SCHEMA} CASCADE")
+    await test_engine.dispose()
+
+
+@pytest.fixture(scope="function", autouse=True)
+async def setup_database(database: None) -> AsyncGenerator[None, None]:
+    """
+    Очищает тестовые таблицы после каждого теста.
+    """
+    yield
+
     async with test_engine.begin() as conn:
-        await conn.run_sync(Base.metadata.drop_all)
+        if USE_POSTGRES:
+            await conn.run_sync(truncate_tables)
+        else:
+            for table in reversed(Base.metadata.sorted_tables):
+                await conn.execute(table.delete())
 
 
 @pytest.fixture(scope="function")
@@ -70,6 +140,9 @@ async def client(db_session: AsyncSession) -> AsyncGenerator[AsyncClient, None]:
             await db_session.close()
 
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_user_db] = override_get_db
+    # ID пользователей повторяются между тестами: квоты начинаются заново
+    admission.reset()
 
     async with AsyncClient(app=app, base_url="http://test") as ac:
         yield ac
@@ -0,0 +1,158 @@
+"""
+Postgres для тестов: временный кластер, схема на воркер и таблицы как в продакшене.
+
+Режим включается переменной TEST_DATABASE=postgres. Сервер берется из
+TEST_POSTGRES_URL, а если она не задана - поднимается временный кластер
+(initdb + pg_ctl из PATH) один раз на запуск pytest. Воркеры pytest-xdist
+получают адрес через окружение и работают каждый в своей схеме.
+"""
+
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+from typing import Optional
+
+from sqlalchemy import Connection
+from sqlalchemy.schema import CreateTable
+
+from app.db.models import Base, Note
+
+# Число секций notes в тестовой схеме (в продакшене задается миграцией)
+PARTITIONS = 4
+
+
+def worker_schema(prefix: str) -> str:
+    """
+    Имя схемы, уникальное для воркера pytest-xdist.
+
+    Args:
+        prefix: Начало имени схемы
+
+    Returns:
+        str: Например, test_gw0 (или test_main без xdist)
+    """
+    return f"{prefix}_{os.environ.get('PYTEST_XDIST_WORKER', 'main')}"
+
+
+def create_tables(conn: Connection, partitions: int = PARTITIONS) -> None:
+    """
+    Создает таблицы моделей; notes секционирована по HASH (owner_id).
+
+    Структура notes повторяет таблицу после cutover (миграция 91b0c858941a):
+    ключ (owner_id, id) и секции, поэтому планы запросов в тестах
+    совпадают с продакшеном.
+
+    Args:
+        conn: Синхронное соединение (внутри run_sync)
+        partitions: Число секций notes
+    """
+    notes = Note.__table__
+    Base.metadata.create_all(
+        conn,
+        tables=[table for table in Base.metadata.sorted_tables if table is not notes],
+    )
+
+    ddl = str(CreateTable(notes).compile(conn)).strip()
+    conn.exec_driver_sql(
+        ddl.replace("PRIMARY KEY (id)", "PRIMARY KEY (owner_id, id)")
+        + " PARTITION BY HASH (owner_id)"
+    )
+    for remainder in range(partitions):
+        conn.exec_driver_sql(
+            f"CREATE TABLE notes_{remainder} PARTITION OF notes "
+            f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})"
+        )
+    for index in notes.indexes:
+        index.create(conn)
+
+
+def truncate_tables(conn: Connection) -> None:
+    """
+    Очищает все таблицы одним TRUNCATE со сбросом последовательностей.
+
+    Args:
+        conn: Синхронное соединение (внутри run_sync)
+    """
+    tables = ", ".join(table.name for table in Base.metadata.sorted_tables)
+    conn.exec_driver_sql(f"TRUNCATE {tables} RESTART IDENTITY CASCADE")
+
+
+class LocalPostgres:
+    """
+    Временный кластер Postgres в каталоге tmp на свободном порту.
+
+    Надежность записи отключена (fsync, synchronous_commit): кластер
+    удаляется после тестов, а коммиты становятся дешевыми.
+    """
+
+    def __init__(self) -> None:
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            self.port: int = sock.getsockname()[1]
+        self.directory: Optional[str] = None
+        self._started = False
+
+    @property
+    def url(self) -> str:
+        """URL для asyncpg (доступ без пароля)."""
+        return f"postgresql+asyncpg://postgres@127.0.0.1:{self.port}/postgres"
+
+    @staticmethod
+    def available() -> Optional[str]:
+        """
+        Проверяет, что initdb и pg_ctl есть в PATH.
+
+        Returns:
+            Optional[str]: Описание проблемы или None
+        """
+        missing = [name for name in ("initdb", "pg_ctl") if shutil.which(name) is None]
+        if missing:
+            return (
+                f"{', '.join(missing)} not found in PATH; "
+                "install Postgres or set TEST_POSTGRES_URL"
+            )
+        return None
+
+    def start(self) -> None:
+        """Создает кластер и запускает сервер (ждет готовности)."""
+        self.directory = tempfile.mkdtemp(prefix="notes-test-pg-")
+        self.data = os.path.join(self.directory, "data")
+        subprocess.run(
+            ["initdb", "-D", self.data, "-U", "postgres", "-A", "trust", "--no-sync"],
+            check=True,
+            capture_output=True,
+        )
+        options = (
+            f"-p {self.port} -k {self.directory} -c listen_addresses=127.0.0.1 "
+            "-c fsync=off -c synchronous_commit=off -c full_page_writes=off"
+        )
+        subprocess.run(
+            [
+                "pg_ctl",
+                "-D",
+                self.data,
+                "-l",
+                os.path.join(self.directory, "postgres.log"),
+                "-o",
+                options,
+                "-w",
+                "start",
+            ],
+            check=True,
+            capture_output=True,
+        )
+        self._started = True
+
+    def stop(self) -> None:
+        """Останавливает сервер и удаляет каталог кластера."""
+        if self._started:
+            subprocess.run(
+                ["pg_ctl", "-D", self.data, "-m", "immediate", "stop"],
+                capture_output=True,
+            )
+            self._started = False
+        if self.directory is not None:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory = None
@@ -0,0 +1,140 @@
+"""
+Тесты для контроля нагрузки (квоты пользователей и лимиты маршрутов).
+"""
+
+import asyncio
+
+import pytest
+from httpx import AsyncClient
+
+from app.core.admission import (
+    ROUTE_QUEUE_FULL,
+    ROUTE_TIMEOUT,
+    USER_CONCURRENCY,
+    USER_RATE,
+    AdmissionController,
+    AdmissionRejected,
+    admission,
+)
+from app.core.config import settings
+
+
+@pytest.mark.asyncio
+async def test_write_quota_per_user(client: AsyncClient, test_user: dict, monkeypatch):
+    """Тест: квота изменений ограничивает только превысившего ее пользователя."""
+    monkeypatch.setattr(admission, "write_burst", 2)
+    monkeypatch.setattr(admission, "write_rate", 0.01)
+    admission.reset()
+    headers = {"Authorization": f"Bearer {test_user['access_token']}"}
+
+    for _ in range(2):
+        response = await client.post(
+            "/api/v1/notes/", json={"title": "T"}, headers=headers
+        )
+        assert response.status_code == 201
+    response = await client.post("/api/v1/notes/", json={"title": "T"}, headers=headers)
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+
+    # Чтение квоту изменений не расходует
+    response = await client.get("/api/v1/notes/", headers=headers)
+    assert response.status_code == 200
+
+    await client.post(
+        "/api/v1/auth/signup",
+        json={"email": "other@example.com", "password": "testpassword123"},
+    )
+    login = await client.post(
+        "/api/v1/auth/login",
+        data={"username": "other@example.com", "password": "testpassword123"},
+    )
+    other = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    response = await client.post("/api/v1/notes/", json={"title": "T"}, headers=other)
+    assert response.status_code == 201
+
+    stats = admission.stats()
+    assert stats["routes"]["create_note"]["shed"] == {USER_RATE: 1}
+    assert stats["routes"]["create_note"]["admitted"] == 3
+
+
+@pytest.mark.asyncio
+async def test_admission_stats_admin_only(
+    client: AsyncClient, test_user: dict, monkeypatch
+):
+    """Тест: метрики контроля нагрузки доступны только администраторам."""
+    headers = {"Authorization": f"Bearer {test_user['access_token']}"}
+
+    response = await client.get("/api/v1/debug/admission", headers=headers)
+    assert response.status_code == 403
+
+    monkeypatch.setattr(settings, "ADMIN_EMAILS", [test_user["email"]])
+    response = await client.get("/api/v1/debug/admission", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["routes"]["read_admission_stats"]["in_flight"] == 1
+
+
+@pytest.mark.asyncio
+async def test_route_slots_and_user_concurrency():
+    """Тест: слоты маршрута, очередь к ним и лимит запросов пользователя."""
+    controller = AdmissionController(
+        user_concurrency=2, route_limits={"r": 2}, queue_size=1, queue_timeout=0.05
+    )
+    release = asyncio.Event()
+
+    async def request(user_id: int) -> None:
+        async with controller.admit("r", user_id, write=False):
+            await release.wait()
+
+    async def rejected(user_id: int) -> AdmissionRejected:
+        with pytest.raises(AdmissionRejected) as exc_info:
+            await request(user_id)
+        return exc_info.value
+
+    holders = [asyncio.create_task(request(1)) for _ in range(2)]
+    await asyncio.sleep(0)
+
+    # Пользователь занял свой лимит
+    assert (await rejected(1)).status_code == 429
+    # Слоты маршрута заняты: один запрос ждет, следующий отброшен сразу
+    waiting = asyncio.create_task(request(2))
+    await asyncio.sleep(0)
+    assert (await rejected(3)).reason == ROUTE_QUEUE_FULL
+    with pytest.raises(AdmissionRejected) as exc_info:
+        await waiting
+    assert (exc_info.value.status_code, exc_info.value.reason) == (503, ROUTE_TIMEOUT)
+
+    release.set()
+    await asyncio.gather(*holders)
+    async with controller.admit("r", 1, write=True):
+        pass
+
+    stats = controller.stats()
+    assert stats["shed"] == {USER_CONCURRENCY: 1, ROUTE_QUEUE_FULL: 1, ROUTE_TIMEOUT: 1}
+    assert stats["routes"]["r"]["admitted"] == 3
+    assert stats["active_users"] == 0
+
+
+@pytest.mark.asyncio
+async def test_route_rejection_refunds_write_quota():
+    """Тест: запрос, отброшенный маршрутом, не расходует квоту изменений."""
+    controller = AdmissionController(
+        write_rate=0.001, write_burst=1, route_limits={"r": 1}, queue_size=0
+    )
+    release = asyncio.Event()
+
+    async def hold() -> None:
+        async with controller.admit("r", 1, write=False):
+            await release.wait()
+
+    holder = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+    with pytest.raises(AdmissionRejected) as exc_info:
+        async with controller.admit("r", 2, write=True):
+            pass
+    assert exc_info.value.reason == ROUTE_QUEUE_FULL
+
+    release.set()
+    await holder
+    # Единственный токен пользователя 2 возвращен
+    async with controller.admit("r", 2, write=True):
+        pass
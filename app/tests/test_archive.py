@@ -0,0 +1,104 @@
+"""
+Тесты для архивации заметок.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import text, update
+
+from app.db.models import Note
+from app.services.archive import archive_stale_notes
+from app.tests.conftest import TestingSessionLocal
+
+
+async def create_notes(client: AsyncClient, headers: dict, count: int) -> list:
+    """Создает заметки и возвращает их ID."""
+    ids = []
+    for i in range(count):
+        response = await client.post(
+            "/api/v1/notes/",
+            json={"title": f"Note {i}", "content": f"Content {i} " * 50},
+            headers=headers,
+        )
+        ids.append(response.json()["id"])
+    return ids
+
+
+async def make_stale(db_session, note_ids: list) -> None:
+    """Сдвигает время изменения заметок в прошлое."""
+    await db_session.execute(
+        update(Note)
+        .where(Note.id.in_(note_ids))
+        .values(updated_at=datetime.now() - timedelta(days=400))
+        .execution_options(synchronize_session=False)
+    )
+    await db_session.commit()
+
+
+@pytest.mark.asyncio
+async def test_archive_stale_notes(client: AsyncClient, test_user: dict, db_session):
+    """Тест переноса старых заметок в архив пачками."""
+    headers = {"Authorization": f"Bearer {test_user['access_token']}"}
+    note_ids = await create_notes(client, headers, 5)
+    await make_stale(db_session, note_ids[:3])
+
+    moved = await archive_stale_notes(TestingSessionLocal, after_days=365, batch_size=2)
+
+    assert moved == 3
+    hot = (await db_session.execute(text("SELECT count(*) FROM notes"))).scalar()
+    cold = (
+        await db_session.execute(text("SELECT count(*) FROM notes_archive"))
+    ).scalar()
+    assert (hot, cold) == (2, 3)
+
+    # Список по умолчанию содержит только горячие заметки
+    response = await client.get("/api/v1/notes/", headers=headers)
+    assert len(response.json()) == 2
+    assert response.headers["X-Total-Count"] == "2"
+
+    response = await client.get(
+        "/api/v1/notes/", params={"include_archived": True}, headers=headers
+    )
+    assert [note["id"] for note in response.json()] == sorted(note_ids, reverse=True)
+    assert response.headers["X-Total-Count"] == "5"
+
+    response = await client.get(
+        "/api/v1/notes/summary", params={"include_archived": True}, headers=headers
+    )
+    assert len(response.json()) == 5
+
+
+@pytest.mark.asyncio
+async def test_archived_note_reachable(
+    client: AsyncClient, test_user: dict, db_session
+):
+    """Тест чтения, изменения и удаления архивных заметок по ID."""
+    headers = {"Authorization": f"Bearer {test_user['access_token']}"}
+    first, second = await create_notes(client, headers, 2)
+    await make_stale(db_session, [first, second])
+    await archive_stale_notes(TestingSessionLocal, after_days=365)
+
+    response = await client.get(f"/api/v1/notes/{first}", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["content"] == "Content 0 " * 50
+
+    response = await client.get(
+        f"/api/v1/notes/{first}", params={"fields": "id,title"}, headers=headers
+    )
+    assert response.json() == {"id": first, "title": "Note 0"}
+
+    # Изменение возвращает заметку в горячую таблицу
+    response = await client.put(
+        f"/api/v1/notes/{first}", json={"title": "Restored"}, headers=headers
+    )
+    assert response.status_code == 200
+    assert response.json()["title"] == "Restored"
+    response = await client.get("/api/v1/notes/", headers=headers)
+    assert [note["id"] for note in response.json()] == [first]
+
+    response = await client.delete(f"/api/v1/notes/{second}", headers=headers)
+    assert response.status_code == 204
+    response = await client.get(f"/api/v1/notes/{second}", headers=headers)
+    assert response.status_code == 404
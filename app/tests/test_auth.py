@@ -2,8 +2,17 @@
 Тесты для аутентификации.
 """
 
+from typing import Any, Callable, Dict, Iterator, Optional
+
 import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
 from httpx import AsyncClient
+from jose import jwt
+
+from app.core.config import settings
+from app.core.keys import KeyRing, get_key_ring
+from app.core.security import decode_access_token
 
 
 @pytest.mark.asyncio
@@ -56,3 +65,159 @@ async def test_login_wrong_password(client: AsyncClient, test_user: dict):
 
     assert response.status_code == 401
     assert "incorrect" in response.json()["detail"].lower()
+
+
+def private_pem(key) -> str:
+    """Закрытый ключ cryptography в PEM (PKCS8)."""
+    return key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode()
+
+
+def public_pem(key) -> str:
+    """Открытая часть ключа cryptography в PEM."""
+    return (
+        key.public_key()
+        .public_bytes(
+            serialization.Encoding.PEM,
+            serialization.PublicFormat.SubjectPublicKeyInfo,
+        )
+        .decode()
+    )
+
+
+@pytest.fixture(scope="module")
+def signing_keys() -> Dict[str, Any]:
+    """Ключи RSA и EC P-256 для связки."""
+    return {
+        "rsa-1": rsa.generate_private_key(public_exponent=65537, key_size=2048),
+        "ec-2": ec.generate_private_key(ec.SECP256R1()),
+    }
+
+
+@pytest.fixture
+def use_keys(monkeypatch) -> Iterator[Callable[..., None]]:
+    """Задает JWT_KEYS/JWT_ACTIVE_KID и перезагружает связку ключей."""
+
+    def configure(keys: Dict[str, str], active: Optional[str], **options) -> None:
+        monkeypatch.setattr(settings, "JWT_KEYS", keys)
+        monkeypatch.setattr(settings, "JWT_ACTIVE_KID", active)
+        for name, value in options.items():
+            monkeypatch.setattr(settings, name, value)
+        get_key_ring.cache_clear()
+
+    yield configure
+    get_key_ring.cache_clear()
+
+
+async def login(client: AsyncClient, user: dict) -> str:
+    """Получает токен доступа пользователя."""
+    response = await client.post(
+        "/api/v1/auth/login",
+        data={"username": user["email"], "password": user["password"]},
+    )
+    assert response.status_code == 200
+    return response.json()["access_token"]
+
+
+@pytest.mark.asyncio
+async def test_asymmetric_token_and_jwks(
+    client: AsyncClient, test_user: dict, signing_keys: Dict[str, Any], use_keys
+):
+    """Тест: токен подписан активным ключом, JWKS позволяет проверить его."""
+    use_keys(
+        {
+            "rsa-1": private_pem(signing_keys["rsa-1"]),
+            "ec-2": public_pem(signing_keys["ec-2"]),
+        },
+        active="rsa-1",
+    )
+
+    token = await login(client, test_user)
+    assert jwt.get_unverified_header(token)["kid"] == "rsa-1"
+    assert jwt.get_unverified_header(token)["alg"] == "RS256"
+    response = await client.get(
+        "/api/v1/notes/", headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 200
+
+    response = await client.get("/.well-known/jwks.json")
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == "public, max-age=300"
+    keys = {key["kid"]: key for key in response.json()["keys"]}
+    assert (keys["rsa-1"]["alg"], keys["ec-2"]["alg"]) == ("RS256", "ES256")
+    assert all("d" not in key for key in keys.values())
+
+    # Сторонний сервис проверяет токен только по JWKS
+    claims = jwt.decode(token, keys["rsa-1"], algorithms=["RS256"])
+    assert claims["user_id"] == test_user["user_id"]
+
+    etag = response.headers["ETag"]
+    response = await client.get(
+        "/.well-known/jwks.json", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 304
+    assert response.content == b""
+
+
+@pytest.mark.asyncio
+async def test_key_rotation(
+    client: AsyncClient, test_user: dict, signing_keys: Dict[str, Any], use_keys
+):
+    """Тест: после ротации старые токены действуют, пока ключ в связке."""
+    rsa_key = private_pem(signing_keys["rsa-1"])
+    ec_key = private_pem(signing_keys["ec-2"])
+    legacy_token = await login(client, test_user)
+    use_keys({"rsa-1": rsa_key}, active="rsa-1")
+    old_token = await login(client, test_user)
+
+    # Новый ключ активен, старый остается только для проверки
+    use_keys({"rsa-1": public_pem(signing_keys["rsa-1"]), "ec-2": ec_key}, "ec-2")
+    new_token = await login(client, test_user)
+    assert jwt.get_unverified_header(new_token)["kid"] == "ec-2"
+    for token in (legacy_token, old_token, new_token):
+        assert decode_access_token(token)["user_id"] == test_user["user_id"]
+
+    # Старый ключ удален, токены без kid больше не принимаются
+    use_keys({"ec-2": ec_key}, "ec-2", JWT_ACCEPT_SECRET_KEY=False)
+    assert decode_access_token(old_token) is None
+    assert decode_access_token(legacy_token) is None
+    assert decode_access_token(new_token) is not None
+    response = await client.get(
+        "/api/v1/notes/", headers={"Authorization": f"Bearer {old_token}"}
+    )
+    assert response.status_code == 401
+
+    # Подпись токена с kid ключом другого алгоритма отклоняется
+    forged = jwt.encode(
+        {"user_id": test_user["user_id"]},
+        settings.SECRET_KEY,
+        algorithm="HS256",
+        headers={"kid": "ec-2"},
+    )
+    assert decode_access_token(forged) is None
+
+    with pytest.raises(ValueError):
+        KeyRing({"ec-2": get_key_ring().get("ec-2")}, "missing")
+
+
+@pytest.mark.asyncio
+async def test_token_with_non_string_kid_rejected(
+    client: AsyncClient, test_user: dict, signing_keys: Dict[str, Any], use_keys
+):
+    """Тест: kid не строкой - невалидный токен (401), а не ошибка сервера."""
+    use_keys({"rsa-1": private_pem(signing_keys["rsa-1"])}, active="rsa-1")
+    crafted = jwt.encode(
+        {"user_id": test_user["user_id"]},
+        settings.SECRET_KEY,
+        algorithm="HS256",
+        headers={"kid": ["rsa-1"]},
+    )
+
+    assert decode_access_token(crafted) is None
+    response = await client.get(
+        "/api/v1/notes/", headers={"Authorization": f"Bearer {crafted}"}
+    )
+    assert response.status_code == 401
@@ -0,0 +1,122 @@
+"""
+Тесты для ленты изменений заметок.
+"""
+
+import asyncio
+import json
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import text
+
+from app.api.v1.endpoints.notes import _sse_events
+from app.core.config import settings
+from app.services.change_feed import RESYNC_EVENT, ChangeFeed, change_feed
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_gets_resync():
+    """Тест: переполненный буфер заменяется событием resync."""
+    feed = ChangeFeed(channel="test", queue_size=2)
+
+    async with feed.subscribe(1) as subscription:
+        for i in range(5):
+            feed.publish({"type": "note.updated", "note_id": i, "owner_id": 1})
+
+        assert await subscription.get(timeout=0.1) == RESYNC_EVENT
+        assert subscription.dropped == 5
+        assert await subscription.get(timeout=0.01) is None
+
+    assert not feed._subscribers
+
+
+@pytest.mark.asyncio
+async def test_events_only_for_owner():
+    """Тест: подписчик получает только события своих заметок."""
+    feed = ChangeFeed(channel="test")
+
+    async with feed.subscribe(1) as mine, feed.subscribe(2) as other:
+        feed.publish({"type": "note.created", "note_id": 10, "owner_id": 1})
+
+        assert (await mine.get(timeout=0.1))["note_id"] == 10
+        assert await other.get(timeout=0.01) is None
+
+
+@pytest.mark.asyncio
+async def test_note_writes_publish_after_commit(client: AsyncClient, test_user: dict):
+    """Тест: создание, изменение и удаление заметки публикуют события."""
+    headers = {"Authorization": f"Bearer {test_user['access_token']}"}
+
+    async with change_feed.subscribe(test_user["user_id"]) as subscription:
+        create_response = await client.post(
+            "/api/v1/notes/", json={"title": "Feed"}, headers=headers
+        )
+        note_id = create_response.json()["id"]
+        await client.put(
+            f"/api/v1/notes/{note_id}", json={"title": "Feed 2"}, headers=headers
+        )
+        await client.delete(f"/api/v1/notes/{note_id}", headers=headers)
+
+        types = [(await subscription.get(timeout=0.1))["type"] for _ in range(3)]
+
+    assert types == ["note.created", "note.updated", "note.deleted"]
+
+
+@pytest.mark.asyncio
+async def test_rollback_discards_events(db_session):
+    """Тест: события отмененной транзакции не публикуются."""
+    async with change_feed.subscribe(7) as subscription:
+        await db_session.execute(text("SELECT 1"))
+        await change_feed.notify(db_session, {"type": "note.created", "owner_id": 7})
+        await db_session.rollback()
+        await db_session.commit()
+
+        assert await subscription.get(timeout=0.01) is None
+
+
+@pytest.mark.asyncio
+async def test_sse_stream_heartbeat_and_events(monkeypatch):
+    """Тест формата SSE: heartbeat и события."""
+    monkeypatch.setattr(settings, "CHANGE_FEED_HEARTBEAT", 0.01)
+    stream = _sse_events(user_id=5)
+
+    assert await stream.__anext__() == ": connected\n\n"
+    assert await stream.__anext__() == ": heartbeat\n\n"
+
+    change = {"type": "note.created", "note_id": 1, "owner_id": 5}
+    change_feed.publish(change)
+    assert await stream.__anext__() == (
+        f"event: note.created\ndata: {json.dumps(change)}\n\n"
+    )
+
+    await stream.aclose()
+    await asyncio.sleep(0)
+    assert 5 not in change_feed._subscribers
+
+
+def test_change_feed_dsns_bypass_pgbouncer(monkeypatch):
+    """Тест: за PgBouncer LISTEN идет по прямым DSN каждого шарда."""
+    monkeypatch.setattr(
+        settings,
+        "DB_SHARDS",
+        {
+            "a": "postgresql+asyncpg://u:p@bouncer/a",
+            "b": "postgresql+asyncpg://u:p@bouncer/b",
+        },
+    )
+    monkeypatch.setattr(settings, "DB_POOL_MODE", "default")
+    assert settings.change_feed_dsns() == [
+        "postgresql://u:p@bouncer/a",
+        "postgresql://u:p@bouncer/b",
+    ]
+
+    monkeypatch.setattr(settings, "DB_POOL_MODE", "pgbouncer")
+    monkeypatch.setattr(settings, "CHANGE_FEED_DSNS", {"a": "postgresql://u:p@pg-a/a"})
+    with pytest.raises(ValueError, match=r"\['b'\]"):
+        settings.change_feed_dsns()
+
+    settings.CHANGE_FEED_DSNS["b"] = "postgresql+asyncpg://u:p@pg-b/b"
+    assert settings.change_feed_dsns() == [
+        "postgresql://u:p@pg-a/a",
+        "postgresql://u:p@pg-b/b",
+    ]
@@ -0,0 +1,96 @@
+"""
+Тесты для сжатия ответов.
+"""
+
+import zlib
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from httpx import AsyncClient
+
+from app.core.compression import CompressionMiddleware, negotiate_encoding
+
+
+def make_app() -> FastAPI:
+    """Создает минимальное приложение с middleware сжатия."""
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+    @app.get("/small")
+    async def small():
+        return {"ok": True}
+
+    @app.get("/large")
+    async def large():
+        return {"data": "x" * 1000}
+
+    @app.get("/plain")
+    async def plain():
+        return PlainTextResponse("y" * 1000)
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for i in range(10):
+                yield ('{"chunk": %d, "pad": "%s"}\n' % (i, "z" * 50)).encode()
+
+        return StreamingResponse(chunks(), media_type="application/json")
+
+    return app
+
+
+def test_negotiate_encoding():
+    """Тест выбора кодировки по Accept-Encoding."""
+    assert negotiate_encoding("gzip, deflate", ("gzip",)) == "gzip"
+    assert negotiate_encoding("gzip;q=0", ("gzip",)) is None
+    assert negotiate_encoding("identity", ("gzip",)) is None
+    assert negotiate_encoding("*", ("br", "gzip")) == "br"
+    assert negotiate_encoding("br;q=0.5, gzip", ("br", "gzip")) == "gzip"
+
+
+@pytest.mark.asyncio
+async def test_large_response_is_compressed():
+    """Тест сжатия ответа больше порога."""
+    async with AsyncClient(app=make_app(), base_url="http://test") as ac:
+        response = await ac.get("/large", headers={"Accept-Encoding": "gzip"})
+
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert "accept-encoding" in response.headers["vary"].lower()
+    assert response.json() == {"data": "x" * 1000}
+
+
+@pytest.mark.asyncio
+async def test_small_response_is_not_compressed():
+    """Тест: ответ меньше порога отдается без сжатия."""
+    async with AsyncClient(app=make_app(), base_url="http://test") as ac:
+        response = await ac.get("/small", headers={"Accept-Encoding": "gzip"})
+
+    assert "content-encoding" not in response.headers
+    assert response.json() == {"ok": True}
+
+
+@pytest.mark.asyncio
+async def test_content_type_not_in_allowlist():
+    """Тест: Content-Type вне списка разрешенных не сжимается."""
+    async with AsyncClient(app=make_app(), base_url="http://test") as ac:
+        response = await ac.get("/plain", headers={"Accept-Encoding": "gzip"})
+
+    assert "content-encoding" not in response.headers
+    assert response.text == "y" * 1000
+
+
+@pytest.mark.asyncio
+async def test_streaming_response_is_compressed_incrementally():
+    """Тест инкрементального сжатия потокового ответа."""
+    async with AsyncClient(app=make_app(), base_url="http://test") as ac:
+        async with ac.stream(
+            "GET", "/stream", headers={"Accept-Encoding": "gzip"}
+        ) as response:
+            raw = b"".join([chunk async for chunk in response.aiter_raw()])
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    body = zlib.decompress(raw, 16 + zlib.MAX_WBITS).decode()
+    assert len(body.splitlines()) == 10
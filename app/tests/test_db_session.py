@@ -0,0 +1,92 @@
+"""
+Тесты ленивой сессии БД запроса.
+"""
+
+from typing import AsyncGenerator, Dict, List
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import event
+
+from app.db import database
+from app.main import app
+from app.tests.conftest import TestingSessionLocal, test_engine
+
+
+@pytest.fixture
+async def pool_events(monkeypatch) -> AsyncGenerator[Dict[str, int], None]:
+    """Настоящие зависимости get_db/get_user_db и счетчики событий движка."""
+    monkeypatch.setattr(database, "AsyncSessionLocal", TestingSessionLocal)
+    counters = {"checked_out": 0, "commits": 0}
+
+    def checkout(*args):
+        counters["checked_out"] += 1
+
+    def checkin(*args):
+        counters["checked_out"] -= 1
+
+    def commit(*args):
+        counters["commits"] += 1
+
+    sync_engine = test_engine.sync_engine
+    listeners = (
+        (sync_engine.pool, "checkout", checkout),
+        (sync_engine.pool, "checkin", checkin),
+        (sync_engine, "commit", commit),
+    )
+    for target, name, listener in listeners:
+        event.listen(target, name, listener)
+    yield counters
+    for target, name, listener in listeners:
+        event.remove(target, name, listener)
+
+
+@pytest.fixture
+async def probed_client(
+    pool_events: Dict[str, int],
+) -> AsyncGenerator[tuple[AsyncClient, List[int]], None]:
+    """Клиент, запоминающий число занятых соединений в начале ответа."""
+    at_response_start: List[int] = []
+
+    async def probe(scope, receive, send):
+        async def probed_send(message):
+            if message["type"] == "http.response.start":
+                at_response_start.append(pool_events["checked_out"])
+            await send(message)
+
+        await app(scope, receive, probed_send)
+
+    async with AsyncClient(app=probe, base_url="http://test") as client:
+        yield client, at_response_start
+
+
+@pytest.mark.asyncio
+async def test_read_requests_skip_commit_and_release_early(
+    probed_client, pool_events: Dict[str, int]
+):
+    """Тест: чтение без COMMIT, соединение свободно до отправки ответа."""
+    client, at_response_start = probed_client
+    credentials = {"email": "lazy@example.com", "password": "password123"}
+
+    response = await client.post("/api/v1/auth/signup", json=credentials)
+    assert response.status_code == 201
+    response = await client.post(
+        "/api/v1/auth/login",
+        data={"username": credentials["email"], "password": credentials["password"]},
+    )
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    commits = pool_events["commits"]
+    response = await client.post("/api/v1/notes/", json={"title": "A"}, headers=headers)
+    assert response.status_code == 201
+    assert pool_events["commits"] == commits + 1
+
+    commits = pool_events["commits"]
+    response = await client.get("/api/v1/notes/", headers=headers)
+    assert [note["title"] for note in response.json()] == ["A"]
+    response = await client.get("/api/v1/notes/999", headers=headers)
+    assert response.status_code == 404
+    assert pool_events["commits"] == commits
+
+    assert at_response_start and set(at_response_start) == {0}
+    assert pool_events["checked_out"] == 0
@@ -0,0 +1,272 @@
+"""
+Тесты для Idempotency-Key.
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException, status
+from httpx import AsyncClient
+from sqlalchemy import select
+from sqlalchemy.orm.exc import StaleDataError
+
+from app.crud.note import note as note_crud
+from app.db.models import IdempotencyKey
+from app.schemas.note import NoteCreate
+from app.services.idempotency import (
+    REPLAY_HEADER,
+    IdempotencyPurger,
+    IdempotencyStore,
+)
+from app.tests.conftest import TestingSessionLocal
+
+
+@pytest.mark.asyncio
+async def test_create_note_replay(client: AsyncClient, test_user: dict):
+    """Тест: повтор с тем же ключом не создает дубликат."""
+    headers = {
+        "Authorization": f"Bearer {test_user['access_token']}",
+        "Idempotency-Key": "create-1",
+    }
+    note_data = {"title": "Once", "content": "Only once"}
+
+    first = await client.post("/api/v1/notes/", json=note_data, headers=headers)
+    second = await client.post("/api/v1/notes/", json=note_data, headers=headers)
+
+    assert first.status_code == 201
+    assert second.status_code == 201
+    assert second.json() == first.json()
+    assert second.headers[REPLAY_HEADER] == "true"
+    assert REPLAY_HEADER not in first.headers
+
+    notes = await client.get("/api/v1/notes/", headers=headers)
+    assert len(notes.json()) == 1
+
+
+@pytest.mark.asyncio
+async def test_idempotency_key_reused_with_other_body(
+    client: AsyncClient, test_user: dict
+):
+    """Тест: ключ нельзя использовать для другого запроса."""
+    headers = {
+        "Authorization": f"Bearer {test_user['access_token']}",
+        "Idempotency-Key": "create-2",
+    }
+
+    await client.post("/api/v1/notes/", json={"title": "A"}, headers=headers)
+    response = await client.post("/api/v1/notes/", json={"title": "B"}, headers=headers)
+
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_batch_create_replay(client: AsyncClient, test_user: dict):
+    """Тест пакетного создания с ключом идемпотентности."""
+    headers = {
+        "Authorization": f"Bearer {test_user['access_token']}",
+        "Idempotency-Key": "batch-1",
+    }
+    batch = {"notes": [{"title": f"Batch {i}"} for i in range(3)]}
+
+    first = await client.post("/api/v1/notes/batch", json=batch, headers=headers)
+    second = await client.post("/api/v1/notes/batch", json=batch, headers=headers)
+
+    assert first.status_code == 201
+    assert len(first.json()) == 3
+    assert second.json() == first.json()
+
+    notes = await client.get("/api/v1/notes/", headers=headers)
+    assert len(notes.json()) == 3
+
+
+@pytest.mark.asyncio
+async def test_concurrent_duplicates_are_coalesced(db_session):
+    """Тест: одновременные дубликаты выполняются один раз."""
+    store = IdempotencyStore()
+    calls = []
+
+    async def handler(save):
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        save(status.HTTP_201_CREATED, {"id": 1})
+
+    responses = await asyncio.gather(
+        *(store.execute(db_session, 1, "same", "hash", handler) for _ in range(5))
+    )
+
+    assert len(calls) == 1
+    assert all(response.status_code == 201 for response in responses)
+    assert sum(REPLAY_HEADER in response.headers for response in responses) == 4
+
+
+@pytest.mark.asyncio
+async def test_stored_key_survives_cache_eviction(db_session):
+    """Тест: ответ берется из БД, если его нет в LRU-кеше."""
+    store = IdempotencyStore(cache_size=1)
+    calls = []
+
+    async def handler(save):
+        calls.append(1)
+        save(status.HTTP_201_CREATED, {"id": len(calls)})
+
+    await store.execute(db_session, 1, "k1", "hash", handler)
+    await store.execute(db_session, 1, "k2", "hash", handler)
+    replay = await store.execute(db_session, 1, "k1", "hash", handler)
+
+    assert len(calls) == 2
+    assert replay.body == b'{"id":1}'
+
+
+@pytest.mark.asyncio
+async def test_response_committed_with_write(db_session, test_user: dict):
+    """Тест: ответ коммитится вместе с записью, сбой после коммита не снимает ключ."""
+    store = IdempotencyStore()
+    owner_id = test_user["user_id"]
+
+    async def failing_after_commit(save):
+        await note_crud.create(
+            db_session,
+            NoteCreate(title="Once"),
+            owner_id,
+            before_commit=lambda note: save(status.HTTP_201_CREATED, {"id": note.id}),
+        )
+        raise RuntimeError("after commit")
+
+    with pytest.raises(RuntimeError):
+        await store.execute(db_session, owner_id, "k", "hash", failing_after_commit)
+
+    # Новый процесс (пустой кеш) воспроизводит ответ, а не создает дубликат
+    async with TestingSessionLocal() as other_db:
+        replay = await IdempotencyStore().execute(
+            other_db, owner_id, "k", "hash", failing_after_commit
+        )
+    assert replay.status_code == 201
+    assert replay.headers[REPLAY_HEADER] == "true"
+    assert len(await note_crud.get_multi(db_session, owner_id=owner_id)) == 1
+
+    async def failing_before_commit(save):
+        raise RuntimeError("before commit")
+
+    with pytest.raises(RuntimeError):
+        await store.execute(db_session, owner_id, "k2", "hash", failing_before_commit)
+
+    # Откаченный запрос не оставляет ключ: повтор выполняется заново
+    async def handler(save):
+        save(status.HTTP_201_CREATED, {"ok": True})
+
+    response = await store.execute(db_session, owner_id, "k2", "hash", handler)
+    assert REPLAY_HEADER not in response.headers
+
+
+@pytest.mark.asyncio
+async def test_abandoned_key_taken_over_after_lease(db_session, test_user: dict):
+    """Тест: ключ упавшего запроса занят только до конца аренды."""
+    owner_id = test_user["user_id"]
+    now = datetime.now()
+    record = IdempotencyKey(
+        user_id=owner_id,
+        key="k",
+        request_hash="hash",
+        locked_until=now + timedelta(minutes=1),
+        expires_at=now + timedelta(hours=1),
+    )
+    db_session.add(record)
+    await db_session.commit()
+
+    async def handler(save):
+        save(status.HTTP_201_CREATED, {"ok": True})
+
+    async with TestingSessionLocal() as other_db:
+        with pytest.raises(HTTPException) as exc_info:
+            await IdempotencyStore().execute(other_db, owner_id, "k", "hash", handler)
+    assert exc_info.value.status_code == status.HTTP_409_CONFLICT
+
+    record.locked_until = now - timedelta(seconds=1)
+    await db_session.commit()
+    async with TestingSessionLocal() as other_db:
+        response = await IdempotencyStore().execute(
+            other_db, owner_id, "k", "hash", handler
+        )
+    assert response.status_code == 201
+    assert REPLAY_HEADER not in response.headers
+
+
+@pytest.mark.asyncio
+async def test_late_original_cannot_overwrite_takeover(test_user: dict):
+    """Тест: запрос с истекшей арендой не коммитит ответ поверх перехватившего."""
+    owner_id = test_user["user_id"]
+    release = asyncio.Event()
+
+    async def slow(save):
+        await release.wait()
+        save(status.HTTP_201_CREATED, {"by": "slow"})
+
+    async def fast(save):
+        save(status.HTTP_201_CREATED, {"by": "fast"})
+
+    async with TestingSessionLocal() as first, TestingSessionLocal() as second:
+        original = asyncio.create_task(
+            IdempotencyStore(lease_seconds=0).execute(
+                first, owner_id, "k", "hash", slow
+            )
+        )
+        await asyncio.sleep(0.05)
+        retry = await IdempotencyStore().execute(second, owner_id, "k", "hash", fast)
+        release.set()
+        with pytest.raises(StaleDataError):
+            await original
+
+    assert retry.body == b'{"by":"fast"}'
+    async with TestingSessionLocal() as db:
+        replay = await IdempotencyStore().execute(db, owner_id, "k", "hash", slow)
+    assert replay.body == b'{"by":"fast"}'
+
+
+@pytest.mark.asyncio
+async def test_reservation_retried_when_key_disappears(db_session):
+    """Тест: ключ, снятый откаченным запросом после конфликта, резервируется заново."""
+    store = IdempotencyStore()
+    reserve = store._reserve
+    conflicts = []
+
+    async def conflict_once(*args):
+        if not conflicts:
+            conflicts.append(1)
+            return None
+        return await reserve(*args)
+
+    store._reserve = conflict_once
+
+    async def handler(save):
+        save(status.HTTP_201_CREATED, {"ok": True})
+
+    response = await store.execute(db_session, 1, "k", "hash", handler)
+    assert response.status_code == 201
+    assert REPLAY_HEADER not in response.headers
+
+
+@pytest.mark.asyncio
+async def test_expired_keys_purged_periodically(db_session, test_user: dict):
+    """Тест: периодическая очистка удаляет только просроченные ключи."""
+    now = datetime.now()
+    expires = {"old": now - timedelta(seconds=1), "new": now + timedelta(hours=1)}
+    for key, expires_at in expires.items():
+        db_session.add(
+            IdempotencyKey(
+                user_id=test_user["user_id"],
+                key=key,
+                request_hash="hash",
+                status_code=201,
+                expires_at=expires_at,
+            )
+        )
+    await db_session.commit()
+
+    purger = IdempotencyPurger(interval=3600)
+    await purger.start()
+    await asyncio.sleep(0.1)
+    await purger.stop()
+
+    keys = (await db_session.execute(select(IdempotencyKey.key))).scalars().all()
+    assert keys == ["new"]
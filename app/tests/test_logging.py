@@ -0,0 +1,119 @@
+"""
+Тесты структурированного логирования и access-лога.
+"""
+
+import io
+import json
+import logging
+from typing import Iterator, List
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from httpx import AsyncClient
+
+from app.core.logs import (
+    AccessLogMiddleware,
+    RequestContext,
+    request_context,
+    setup_logging,
+    shutdown_logging,
+)
+
+
+class ListHandler(logging.Handler):
+    """Собирает записи в список."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.records: List[logging.LogRecord] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.records.append(record)
+
+
+@pytest.fixture
+def access_records() -> Iterator[List[logging.LogRecord]]:
+    """Записи логгера app.access во время теста."""
+    logger = logging.getLogger("app.access")
+    handler = ListHandler()
+    level = logger.level
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    yield handler.records
+    logger.removeHandler(handler)
+    logger.setLevel(level)
+
+
+@pytest.mark.asyncio
+async def test_access_log_fields(
+    client: AsyncClient, test_user: dict, access_records: List[logging.LogRecord]
+):
+    """Тест: запись access-лога содержит запрос, пользователя, маршрут и БД."""
+    headers = {
+        "Authorization": f"Bearer {test_user['access_token']}",
+        "X-Request-ID": "req-42",
+    }
+
+    response = await client.get("/api/v1/notes/", headers=headers)
+
+    assert response.headers["X-Request-ID"] == "req-42"
+    record = access_records[-1]
+    assert record.request_id == "req-42"
+    assert record.user_id == test_user["user_id"]
+    assert record.route == "/api/v1/notes/"
+    assert record.status == 200
+    assert record.db_queries >= 2
+    assert record.db_time_ms > 0
+
+    # Невалидный ID от клиента заменяется сгенерированным
+    response = await client.get("/health", headers={"X-Request-ID": "bad id"})
+    assert len(response.headers["X-Request-ID"]) == 32
+    assert access_records[-1].user_id is None
+
+
+@pytest.mark.asyncio
+async def test_access_log_sampling(access_records: List[logging.LogRecord]):
+    """Тест: успешные запросы сэмплируются, ошибки пишутся всегда."""
+    app = FastAPI()
+
+    @app.get("/ok")
+    async def ok() -> dict:
+        return {}
+
+    @app.get("/fail")
+    async def fail() -> dict:
+        raise HTTPException(status_code=404)
+
+    logged = AccessLogMiddleware(app, sample_rate=0.0)
+    async with AsyncClient(app=logged, base_url="http://test") as client:
+        for _ in range(5):
+            await client.get("/ok")
+        await client.get("/fail")
+
+    assert [record.status for record in access_records] == [404]
+
+
+def test_json_records_through_queue():
+    """Тест: JSON-записи пишутся потоком очереди с контекстом запроса."""
+    root = logging.getLogger()
+    handlers, level = root.handlers, root.level
+    stream = io.StringIO()
+    setup_logging("INFO", stream=stream)
+    token = request_context.set(RequestContext(request_id="r1", user_id=7))
+    try:
+        logging.getLogger("app.test").info("hello %s", "world", extra={"n": 1})
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logging.getLogger("app.test").exception("failed")
+    finally:
+        request_context.reset(token)
+        shutdown_logging()
+        root.handlers, root.level = handlers, level
+
+    first, second = (json.loads(line) for line in stream.getvalue().splitlines())
+    assert first["message"] == "hello world"
+    assert (first["request_id"], first["user_id"], first["n"]) == ("r1", 7, 1)
+    assert first["logger"] == "app.test"
+    assert second["level"] == "ERROR"
+    assert "ValueError: boom" in second["exc_info"]
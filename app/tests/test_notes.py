@@ -4,6 +4,15 @@
 
 import pytest
 from httpx import AsyncClient
+from sqlalchemy import event
+from sqlalchemy.orm.exc import StaleDataError
+
+from app.crud.note import note as note_crud
+from app.crud.note_revision import DELTA, SNAPSHOT
+from app.crud.user import user as user_crud
+from app.schemas.note import NoteCreate, NoteUpdate
+from app.services.revisions import compact_revisions, revision_recorder
+from app.tests.conftest import TestingSessionLocal, test_engine
 
 
 @pytest.mark.asyncio
@@ -96,3 +105,376 @@ async def test_delete_note(client: AsyncClient, test_user: dict):
     # Проверяем, что заметка удалена
     get_response = await client.get(f"/api/v1/notes/{note_id}", headers=headers)
     assert get_response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_note_version_conflict(client: AsyncClient, test_user: dict):
+    """Тест: изменение с устаревшей версией отклоняется с 409."""
+    headers = {"Authorization": f"Bearer {test_user['access_token']}"}
+    response = await client.post(
+        "/api/v1/notes/", json={"title": "V", "content": "1"}, headers=headers
+    )
+    note_id = response.json()["id"]
+    assert response.json()["version"] == 1
+
+    response = await client.put(
+        f"/api/v1/notes/{note_id}",
+        json={"content": "2", "version": 1},
+        headers=headers,
+    )
+    assert response.json()["version"] == 2
+
+    # Второе устройство не видело первое изменение
+    response = await client.put(
+        f"/api/v1/notes/{note_id}",
+        json={"content": "stale", "version": 1},
+        headers=headers,
+    )
+    assert response.status_code == 409
+    response = await client.delete(
+        f"/api/v1/notes/{note_id}", params={"version": 1}, headers=headers
+    )
+    assert response.status_code == 409
+
+    response = await client.get(f"/api/v1/notes/{note_id}", headers=headers)
+    assert (response.json()["content"], response.json()["version"]) == ("2", 2)
+
+    response = await client.delete(
+        f"/api/v1/notes/{note_id}", params={"version": 2}, headers=headers
+    )
+    assert response.status_code == 204
+
+
+@pytest.mark.asyncio
+async def test_update_delete_single_statement(client: AsyncClient, test_user: dict):
+    """Тест: изменение и удаление заметки - один запрос к notes без SELECT."""
+    headers = {"Authorization": f"Bearer {test_user['access_token']}"}
+    response = await client.post(
+        "/api/v1/notes/", json={"title": "One"}, headers=headers
+    )
+    note_id = response.json()["id"]
+    statements = []
+
+    def collect(conn, cursor, statement, parameters, context, executemany):
+        if " notes " in f" {statement} ":
+            statements.append(statement.split()[0])
+
+    event.listen(test_engine.sync_engine, "before_cursor_execute", collect)
+    try:
+        response = await client.put(
+            f"/api/v1/notes/{note_id}", json={"title": "Two"}, headers=headers
+        )
+        assert (response.json()["title"], response.json()["version"]) == ("Two", 2)
+        response = await client.delete(f"/api/v1/notes/{note_id}", headers=headers)
+        assert response.status_code == 204
+        response = await client.delete(f"/api/v1/notes/{note_id}", headers=headers)
+        assert response.status_code == 404
+    finally:
+        event.remove(test_engine.sync_engine, "before_cursor_execute", collect)
+
+    assert statements == ["UPDATE", "DELETE", "DELETE"]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_update_not_lost(test_user: dict):
+    """Тест: запись по устаревшей версии не перезаписывает заметку."""
+    owner_id = test_user["user_id"]
+    async with TestingSessionLocal() as first, TestingSessionLocal() as second:
+        note_id = (await note_crud.create(first, NoteCreate(title="T"), owner_id)).id
+
+        await note_crud.update_owned(
+            second, note_id, owner_id, NoteUpdate(title="Second", version=1)
+        )
+        with pytest.raises(StaleDataError):
+            await note_crud.update_owned(
+                first, note_id, owner_id, NoteUpdate(title="First", version=1)
+            )
+
+        saved = await note_crud.get_by_id(first, note_id, owner_id)
+        assert (saved.title, saved.version) == ("Second", 2)
+
+
+@pytest.mark.asyncio
+async def test_get_notes_summary(client: AsyncClient, test_user: dict):
+    """Тест краткого списка заметок: превью вместо полного содержимого."""
+    headers = {"Authorization": f"Bearer {test_user['access_token']}"}
+    long_content = "a" * 5000
+
+    await client.post(
+        "/api/v1/notes/",
+        json={"title": "Long", "content": long_content},
+        headers=headers,
+    )
+
+    response = await client.get("/api/v1/notes/summary", headers=headers)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data) == 1
+    assert set(data[0]) == {"id", "title", "updated_at", "preview"}
+    assert data[0]["preview"] == long_content[:200]
+    # Полное содержимое доступно по ID
+    note_response = await client.get(f"/api/v1/notes/{data[0]['id']}", headers=headers)
+    assert note_response.json()["content"] == long_content
+
+
+@pytest.mark.asyncio
+async def test_create_note_content_too_large(client: AsyncClient, test_user: dict):
+    """Тест ограничения размера содержимого заметки."""
+    headers = {"Authorization": f"Bearer {test_user['access_token']}"}
+
+    response = await client.post(
+        "/api/v1/notes/",
+        json={"title": "Huge", "content": "x" * 100_001},
+        headers=headers,
+    )
+
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_large_content_compressed_at_rest(
+    client: AsyncClient, test_user: dict, db_session
+):
+    """Тест прозрачного сжатия большого содержимого в БД."""
+    from sqlalchemy import text
+
+    headers = {"Authorization": f"Bearer {test_user['access_token']}"}
+    content = "lorem ipsum " * 1000
+
+    create_response = await client.post(
+        "/api/v1/notes/", json={"title": "Big", "content": content}, headers=headers
+    )
+    note_id = create_response.json()["id"]
+
+    raw = (
+        await db_session.execute(
+            text("SELECT content FROM notes WHERE id = :id"), {"id": note_id}
+        )
+    ).scalar_one()
+    assert raw[:1] == b"\x01"
+    assert len(raw) < len(content) // 10
+
+    response = await client.get(f"/api/v1/notes/{note_id}", headers=headers)
+    assert response.json()["content"] == content
+
+
+@pytest.mark.asyncio
+async def test_get_notes_with_fields(client: AsyncClient, test_user: dict):
+    """Тест выборки подмножества полей заметок."""
+    headers = {"Authorization": f"Bearer {test_user['access_token']}"}
+
+    create_response = await client.post(
+        "/api/v1/notes/",
+        json={"title": "Sparse", "content": "Not needed"},
+        headers=headers,
+    )
+    note_id = create_response.json()["id"]
+
+    response = await client.get(
+        "/api/v1/notes/", params={"fields": "updated_at,title"}, headers=headers
+    )
+    assert response.status_code == 200
+    assert response.json() == [
+        {"title": "Sparse", "updated_at": create_response.json()["updated_at"]}
+    ]
+
+    response = await client.get(
+        f"/api/v1/notes/{note_id}", params={"fields": "id,title"}, headers=headers
+    )
+    assert response.status_code == 200
+    assert response.json() == {"id": note_id, "title": "Sparse"}
+
+
+@pytest.mark.asyncio
+async def test_get_notes_with_unknown_fields(client: AsyncClient, test_user: dict):
+    """Тест отказа при запросе неизвестных полей."""
+    headers = {"Authorization": f"Bearer {test_user['access_token']}"}
+
+    response = await client.get(
+        "/api/v1/notes/", params={"fields": "title,owner"}, headers=headers
+    )
+
+    assert response.status_code == 422
+    assert "owner" in response.json()["detail"]
+
+
+@pytest.mark.asyncio
+async def test_cached_queries_bind_new_parameters(db_session, test_user: dict):
+    """Тест: lambda-запросы CRUD не переиспользуют значения прошлых вызовов."""
+    owner_id = test_user["user_id"]
+    notes = await note_crud.create_many(
+        db_session, [NoteCreate(title=f"Note {i}") for i in range(5)], owner_id
+    )
+
+    for db_note in notes:
+        found = await note_crud.get_by_id(db_session, db_note.id, owner_id=owner_id)
+        assert found.title == db_note.title
+    assert await note_crud.get_by_id(db_session, notes[0].id, owner_id=-1) is None
+
+    full = [n.id for n in await note_crud.get_multi(db_session, owner_id)]
+    assert sorted(full) == sorted(n.id for n in notes)
+    for skip, limit in ((1, 2), (3, 10)):
+        page = await note_crud.get_multi(db_session, owner_id, skip=skip, limit=limit)
+        assert [n.id for n in page] == full[skip : skip + limit]
+    assert await note_crud.get_multi(db_session, owner_id=-1) == []
+
+    assert (await user_crud.get_by_id(db_session, owner_id)).email == test_user["email"]
+    assert await user_crud.get_by_id(db_session, owner_id + 1) is None
+
+
+@pytest.mark.asyncio
+async def test_notes_stats(client: AsyncClient, test_user: dict):
+    """Тест статистики заметок и заголовка X-Total-Count."""
+    headers = {"Authorization": f"Bearer {test_user['access_token']}"}
+
+    response = await client.get("/api/v1/notes/stats", headers=headers)
+    assert response.json() == {
+        "note_count": 0,
+        "archived_count": 0,
+        "content_bytes": 0,
+        "last_modified": None,
+    }
+
+    response = await client.post(
+        "/api/v1/notes/", json={"title": "A", "content": "ab"}, headers=headers
+    )
+    note_id = response.json()["id"]
+    await client.post(
+        "/api/v1/notes/batch",
+        json={"notes": [{"title": "B", "content": "я" * 10}, {"title": "C"}]},
+        headers=headers,
+    )
+    await client.put(
+        f"/api/v1/notes/{note_id}", json={"content": "abcd"}, headers=headers
+    )
+
+    response = await client.get("/api/v1/notes/stats", headers=headers)
+    stats = response.json()
+    assert (stats["note_count"], stats["content_bytes"]) == (3, 4 + 20)
+    assert stats["last_modified"] is not None
+
+    await client.delete(f"/api/v1/notes/{note_id}", headers=headers)
+
+    response = await client.get("/api/v1/notes/?limit=1", headers=headers)
+    assert len(response.json()) == 1
+    assert response.headers["X-Total-Count"] == "2"
+
+    response = await client.get("/api/v1/notes/?fields=id", headers=headers)
+    assert response.headers["X-Total-Count"] == "2"
+
+    response = await client.get("/api/v1/notes/stats", headers=headers)
+    assert (response.json()["note_count"], response.json()["content_bytes"]) == (
+        2,
+        20,
+    )
+
+
+@pytest.fixture
+async def recorder(monkeypatch):
+    """Запущенный рекордер истории с короткой цепочкой дельт."""
+    monkeypatch.setattr(revision_recorder, "snapshot_every", 3)
+    await revision_recorder.start()
+    yield revision_recorder
+    await revision_recorder.stop()
+
+
+@pytest.mark.asyncio
+async def test_note_revisions(
+    client: AsyncClient, test_user: dict, db_session, recorder
+):
+    """Тест истории изменений: дельты, снимки, восстановление и сжатие."""
+    from sqlalchemy import text
+
+    headers = {"Authorization": f"Bearer {test_user['access_token']}"}
+    lines = [f"line {i}\n" for i in range(50)]
+    contents = ["".join(lines)]
+
+    response = await client.post(
+        "/api/v1/notes/", json={"title": "T", "content": contents[0]}, headers=headers
+    )
+    note_id = response.json()["id"]
+    for i in range(1, 6):
+        lines[i * 7] = f"changed {i}\n"
+        contents.append("".join(lines))
+        await client.put(
+            f"/api/v1/notes/{note_id}", json={"content": contents[-1]}, headers=headers
+        )
+    await client.put(f"/api/v1/notes/{note_id}", json={"title": "T2"}, headers=headers)
+    contents.append(contents[-1])
+    await recorder.flush()
+
+    response = await client.get(f"/api/v1/notes/{note_id}/revisions", headers=headers)
+    assert [r["version"] for r in response.json()] == [7, 6, 5, 4, 3, 2, 1]
+    assert response.json()[0]["title"] == "T2"
+
+    for version, content in enumerate(contents, start=1):
+        response = await client.get(
+            f"/api/v1/notes/{note_id}/revisions/{version}", headers=headers
+        )
+        assert response.json()["content"] == content
+
+    kinds = (
+        (
+            await db_session.execute(
+                text(
+                    "SELECT kind FROM note_revisions"
+                    " WHERE note_id = :id ORDER BY version"
+                ),
+                {"id": note_id},
+            )
+        )
+        .scalars()
+        .all()
+    )
+    assert kinds == [SNAPSHOT, DELTA, DELTA, SNAPSHOT, DELTA, DELTA, SNAPSHOT]
+
+    assert await compact_revisions(TestingSessionLocal, keep=2) == 5
+    response = await client.get(f"/api/v1/notes/{note_id}/revisions", headers=headers)
+    assert [r["version"] for r in response.json()] == [7, 6]
+    response = await client.get(f"/api/v1/notes/{note_id}/revisions/6", headers=headers)
+    assert response.json()["content"] == contents[5]
+    response = await client.get(f"/api/v1/notes/{note_id}/revisions/1", headers=headers)
+    assert response.status_code == 404
+
+    await client.delete(f"/api/v1/notes/{note_id}", headers=headers)
+    response = await client.get(f"/api/v1/notes/{note_id}/revisions", headers=headers)
+    assert response.json() == []
+
+
+@pytest.mark.asyncio
+async def test_compact_skips_broken_revision_chain(db_session, test_user: dict):
+    """Тест: разорванная цепочка дельт не прерывает сжатие истории."""
+    from datetime import datetime
+
+    from app.crud.note_revision import note_revision as note_revision_crud
+    from app.db.models import NoteRevision
+
+    owner_id = test_user["user_id"]
+    note_id = (await note_crud.create(db_session, NoteCreate(title="T"), owner_id)).id
+    # Версии 2 нет: версию 3 восстановить нельзя
+    for version, kind, data in (
+        (1, SNAPSHOT, "a\n"),
+        (3, DELTA, '[[0,1,"c\\n"]]'),
+        (4, DELTA, '[[0,1,"d\\n"]]'),
+    ):
+        db_session.add(
+            NoteRevision(
+                owner_id=owner_id,
+                note_id=note_id,
+                version=version,
+                title="T",
+                kind=kind,
+                data=data,
+                depth=0,
+                created_at=datetime.now(),
+            )
+        )
+    await db_session.commit()
+
+    assert (
+        await note_revision_crud.get_content(db_session, owner_id, note_id, 3) is None
+    )
+    assert await note_revision_crud.compact(db_session, keep=2) == 1
+    versions = await note_revision_crud.get_multi(db_session, owner_id, note_id)
+    assert [row.version for row in versions] == [4, 3]
@@ -0,0 +1,146 @@
+"""
+Тесты отсечения секций notes (HASH по owner_id).
+
+Секция выбирается только если в условии запроса есть owner_id, поэтому
+на SQLite проверяется, что каждый запрос к notes содержит owner_id, а при
+заданном TEST_POSTGRES_URL - что план Postgres читает ровно одну секцию.
+"""
+
+import os
+import re
+from contextlib import contextmanager
+from typing import AsyncGenerator, Iterator, List, Tuple
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.crud.note import note as note_crud
+from app.db.models import User
+from app.schemas.note import NoteCreate, NoteUpdate
+from app.tests.conftest import test_engine
+from app.tests.postgres import create_tables, worker_schema
+
+TEST_POSTGRES_URL = os.environ.get("TEST_POSTGRES_URL")
+PARTITIONS = 4
+
+# Запрос читает или изменяет notes (но не notes_archive)
+NOTES_READ_OR_WRITE = re.compile(
+    r"^\s*(WITH|SELECT|UPDATE|DELETE)\b.*\bnotes\b(?!_)", re.S
+)
+OWNER_FILTER = re.compile(r"\bWHERE\b.*\bnotes\.owner_id\b", re.S)
+
+
+@contextmanager
+def capture_note_statements(sync_engine: Engine) -> Iterator[List[Tuple[str, object]]]:
+    """Собирает SELECT/UPDATE/DELETE к таблице notes с параметрами."""
+    statements: List[Tuple[str, object]] = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        if NOTES_READ_OR_WRITE.search(statement):
+            statements.append((statement, parameters))
+
+    event.listen(sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", before_cursor_execute)
+
+
+@pytest.mark.asyncio
+async def test_note_queries_filter_by_owner(client: AsyncClient, test_user: dict):
+    """Тест: все запросы API к notes содержат ключ секционирования."""
+    headers = {"Authorization": f"Bearer {test_user['access_token']}"}
+
+    with capture_note_statements(test_engine.sync_engine) as statements:
+        response = await client.post(
+            "/api/v1/notes/", json={"title": "Note", "content": "c"}, headers=headers
+        )
+        note_id = response.json()["id"]
+        await client.post(
+            "/api/v1/notes/batch",
+            json={"notes": [{"title": "A"}, {"title": "B"}]},
+            headers=headers,
+        )
+        await client.get("/api/v1/notes/", headers=headers)
+        await client.get("/api/v1/notes/?fields=id,title", headers=headers)
+        await client.get(
+            "/api/v1/notes/", params={"include_archived": True}, headers=headers
+        )
+        await client.get("/api/v1/notes/summary", headers=headers)
+        await client.get(f"/api/v1/notes/{note_id}", headers=headers)
+        await client.put(
+            f"/api/v1/notes/{note_id}", json={"title": "New"}, headers=headers
+        )
+        response = await client.delete(f"/api/v1/notes/{note_id}", headers=headers)
+        assert response.status_code == 204
+
+    assert statements
+    for statement, _ in statements:
+        assert OWNER_FILTER.search(statement), statement
+
+
+@pytest.fixture
+async def pg_session() -> AsyncGenerator[AsyncSession, None]:
+    """Сессия Postgres с секционированной таблицей notes в схеме воркера."""
+    if TEST_POSTGRES_URL is None:
+        pytest.skip("TEST_POSTGRES_URL is not set")
+
+    schema = worker_schema("partitioning_test")
+    engine = create_async_engine(
+        TEST_POSTGRES_URL, connect_args={"server_settings": {"search_path": schema}}
+    )
+    async with engine.begin() as conn:
+        await conn.execute(text(f"DROP SCHEMA IF EXISTS {schema} CASCADE"))
+        await conn.execute(text(f"CREATE SCHEMA {schema}"))
+        await conn.run_sync(create_tables, PARTITIONS)
+
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        yield session
+
+    async with engine.begin() as conn:
+        await conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+    await engine.dispose()
+
+
+async def scanned_partitions(session: AsyncSession, statement: str, params) -> set:
+    """Возвращает секции notes из плана запроса."""
+    conn = await session.connection()
+    result = await conn.exec_driver_sql(f"EXPLAIN {statement}", params)
+    plan = "\n".join(row[0] for row in result)
+    return set(re.findall(r"\bnotes_\d+\b", plan))
+
+
+@pytest.mark.asyncio
+async def test_note_crud_prunes_to_one_partition(pg_session: AsyncSession):
+    """Тест: запросы NoteCRUD в Postgres читают одну секцию."""
+    users = [User(email=f"user{i}@example.com", hashed_password="x") for i in range(8)]
+    pg_session.add_all(users)
+    await pg_session.commit()
+    owner = users[3]
+    for user in users:
+        await note_crud.create_many(
+            pg_session, [NoteCreate(title=f"Note {i}") for i in range(3)], user.id
+        )
+
+    sync_engine = pg_session.bind.sync_engine
+    with capture_note_statements(sync_engine) as statements:
+        db_note = await note_crud.create(pg_session, NoteCreate(title="N"), owner.id)
+        await note_crud.get_multi(pg_session, owner_id=owner.id)
+        await note_crud.get_multi_summary(pg_session, owner_id=owner.id)
+        await note_crud.get_multi_fields(pg_session, owner.id, ("id", "title"))
+        await note_crud.get_by_id(pg_session, db_note.id, owner_id=owner.id)
+        await note_crud.update_owned(
+            pg_session, db_note.id, owner.id, NoteUpdate(title="M", version=1)
+        )
+        await note_crud.update_owned(
+            pg_session, db_note.id, owner.id, NoteUpdate(content="c", version=2)
+        )
+        await note_crud.delete_owned(pg_session, db_note.id, owner.id, version=3)
+
+    assert statements
+    for statement, params in statements:
+        partitions = await scanned_partitions(pg_session, statement, params)
+        assert len(partitions) == 1, statement
@@ -0,0 +1,97 @@
+"""
+Тесты сэмплирующего профилировщика.
+"""
+
+import asyncio
+import time
+
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient
+
+from app.core.config import settings
+from app.core.profiling import AWAIT_FRAME, Profiler, ProfilingMiddleware
+
+
+def busy_work(seconds: float) -> None:
+    """Занимает CPU заданное время."""
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def profiled_app(profiler: Profiler) -> ProfilingMiddleware:
+    """Приложение с медленным эндпоинтом под ProfilingMiddleware."""
+    app = FastAPI()
+
+    @app.get("/slow")
+    async def slow() -> dict:
+        busy_work(0.05)
+        await asyncio.sleep(0.05)
+        return {"ok": True}
+
+    return ProfilingMiddleware(app, profiler=profiler)
+
+
+@pytest.mark.asyncio
+async def test_profiles_requests_by_header_and_rate():
+    """Тест: профилируются запросы с заголовком и каждый N-й, с CPU и await."""
+    profiler = Profiler(
+        interval=0.001, buffer_size=2, sample_rate=3, header_secret="secret"
+    )
+
+    async with AsyncClient(app=profiled_app(profiler), base_url="http://t") as client:
+        # Заголовок без секрета не включает профилирование
+        response = await client.get("/slow", headers={"X-Profile": "1"})
+        assert "X-Profile-Id" not in response.headers
+
+        response = await client.get("/slow", headers={"X-Profile": "secret"})
+        profile = profiler.get(int(response.headers["X-Profile-Id"]))
+
+        # Третий запрос профилируется по частоте
+        response = await client.get("/slow")
+        assert "X-Profile-Id" in response.headers
+        await client.get("/slow", headers={"X-Profile": "secret"})
+
+    stacks = list(profile.samples)
+    assert any(stack[-1][0] == "busy_work" for stack in stacks)
+    assert any(stack[-1] == AWAIT_FRAME and "slow" in str(stack) for stack in stacks)
+    assert all(stack[0][0] == "ProfilingMiddleware.__call__" for stack in stacks)
+    # Кольцевой буфер хранит последние профили
+    assert len(profiler.profiles()) == 2
+    assert profiler.get(profile.id) is None
+
+    speedscope = profile.to_speedscope()
+    frames = speedscope["shared"]["frames"]
+    assert {"busy_work"} <= {frame["name"] for frame in frames}
+    assert speedscope["profiles"][0]["endValue"] > 0
+    assert "ProfilingMiddleware.__call__;" in profile.to_collapsed()
+
+
+@pytest.mark.asyncio
+async def test_profile_endpoints_admin_only(
+    client: AsyncClient, test_user: dict, monkeypatch
+):
+    """Тест: эндпоинты профилирования выключены по умолчанию и только для админа."""
+    headers = {"Authorization": f"Bearer {test_user['access_token']}"}
+    url = "/api/v1/debug/profile"
+
+    response = await client.get(url, params={"seconds": 0.05}, headers=headers)
+    assert response.status_code == 404
+
+    monkeypatch.setattr(settings, "PROFILING_ENABLED", True)
+    response = await client.get(url, params={"seconds": 0.05}, headers=headers)
+    assert response.status_code == 403
+
+    monkeypatch.setattr(settings, "ADMIN_EMAILS", [test_user["email"]])
+    response = await client.get(
+        url, params={"seconds": 0.05, "format": "collapsed"}, headers=headers
+    )
+    assert response.status_code == 200
+    assert response.text.startswith("thread ")
+    assert "attachment" in response.headers["Content-Disposition"]
+
+    response = await client.get("/api/v1/debug/profiles", headers=headers)
+    profile_id = response.json()[0]["id"]
+    response = await client.get(f"/api/v1/debug/profiles/{profile_id}", headers=headers)
+    assert response.json()["profiles"][0]["type"] == "sampled"
@@ -0,0 +1,39 @@
+"""
+Тесты для конфигурации продакшен-сервера.
+"""
+
+import pytest
+
+from app.core.config import settings
+from app.serve import build_options
+
+
+def test_pool_size_split_between_workers(monkeypatch):
+    """Тест: суммарный пул всех воркеров не превышает max_connections."""
+    monkeypatch.setattr(settings, "DB_MAX_CONNECTIONS", 100)
+    monkeypatch.setattr(settings, "DB_RESERVED_CONNECTIONS", 10)
+    monkeypatch.setattr(settings, "DB_MAX_OVERFLOW", 2)
+
+    for workers in (1, 4, 8, 16, 31, 45, 64, 90):
+        monkeypatch.setattr(settings, "WEB_CONCURRENCY", workers)
+        pool_size = settings.pool_size_per_worker()
+        assert 1 <= pool_size <= settings.DB_POOL_SIZE
+        assert settings.max_overflow_per_worker() <= settings.DB_MAX_OVERFLOW
+        assert workers * (pool_size + settings.max_overflow_per_worker()) <= 90
+        assert build_options()["workers"] == workers
+
+    # Воркеров больше, чем соединений в бюджете: сервер не запускается
+    monkeypatch.setattr(settings, "WEB_CONCURRENCY", 200)
+    with pytest.raises(ValueError):
+        build_options()
+
+
+def test_build_options_preloads_app(monkeypatch):
+    """Тест: приложение загружается до fork, число воркеров из настроек."""
+    monkeypatch.setattr(settings, "WEB_CONCURRENCY", 3)
+
+    options = build_options()
+
+    assert options["workers"] == 3
+    assert options["preload_app"] is True
+    assert options["worker_class"] == "app.serve.NotesUvicornWorker"
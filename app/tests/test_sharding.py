@@ -0,0 +1,154 @@
+"""
+Тесты для шардирования пользователей.
+"""
+
+from typing import AsyncGenerator, Dict
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from app.db.database import get_db
+from app.db.models import Base
+from app.db.sharding import HashRing, shards
+from app.main import app
+from app.tests.conftest import test_engine
+
+USER_COUNT = "SELECT count(*) FROM users WHERE id = :id"
+
+
+def test_hash_ring_moves_few_keys_when_shard_added():
+    """Тест: ключи распределены равномерно, новый шард забирает ~1/N."""
+    keys = [f"user{i}@example.com" for i in range(3000)]
+    ring = HashRing(["a", "b", "c"])
+    before = {key: ring.get(key) for key in keys}
+
+    for shard in ("a", "b", "c"):
+        share = sum(1 for value in before.values() if value == shard) / len(keys)
+        assert 0.2 < share < 0.47
+
+    grown = HashRing(["a", "b", "c", "d"])
+    moved = [key for key in keys if grown.get(key) != before[key]]
+
+    assert all(grown.get(key) == "d" for key in moved)
+    assert len(moved) / len(keys) < 0.35
+    # Размещение не зависит от процесса (PYTHONHASHSEED)
+    assert HashRing(["a", "b", "c"]).get(keys[0]) == before[keys[0]]
+
+
+@pytest.fixture
+async def sharded(tmp_path) -> AsyncGenerator[Dict[str, AsyncEngine], None]:
+    """Каталог и два шарда в отдельных файлах SQLite."""
+    engines = {
+        name: create_async_engine(f"sqlite+aiosqlite:///{tmp_path / name}.db")
+        for name in ("directory", "a", "b")
+    }
+    for engine in engines.values():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    shards.configure(
+        {"a": engines["a"], "b": engines["b"]}, directory=engines["directory"]
+    )
+
+    async def override_get_db():
+        async with shards.directory_session() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield engines
+
+    app.dependency_overrides.clear()
+    shards.configure({"default": test_engine}, directory=test_engine)
+    for engine in engines.values():
+        await engine.dispose()
+
+
+async def count(engine: AsyncEngine, query: str, **params) -> int:
+    """Выполняет COUNT-запрос на движке."""
+    async with engine.connect() as conn:
+        return (await conn.execute(text(query), params)).scalar()
+
+
+@pytest.mark.asyncio
+async def test_users_and_notes_live_on_their_shard(sharded: Dict[str, AsyncEngine]):
+    """Тест: пользователи и их заметки хранятся только на своем шарде."""
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        users = {}
+        for i in range(8):
+            email = f"user{i}@example.com"
+            response = await client.post(
+                "/api/v1/auth/signup", json={"email": email, "password": "password123"}
+            )
+            assert response.status_code == 201
+            users[email] = response.json()["id"]
+
+        response = await client.post(
+            "/api/v1/auth/signup",
+            json={"email": "user0@example.com", "password": "password123"},
+        )
+        assert response.status_code == 400
+
+        # ID выдает каталог, поэтому они уникальны между шардами
+        assert sorted(users.values()) == list(range(1, 9))
+
+        placement = {}
+        for email, user_id in users.items():
+            shard = shards.place(email)
+            other = "b" if shard == "a" else "a"
+            placement[user_id] = shard
+            assert await count(sharded[shard], USER_COUNT, id=user_id) == 1
+            assert await count(sharded[other], USER_COUNT, id=user_id) == 0
+
+            response = await client.post(
+                "/api/v1/auth/login",
+                data={"username": email, "password": "password123"},
+            )
+            assert response.status_code == 200
+            headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+            response = await client.post(
+                "/api/v1/notes/", json={"title": email}, headers=headers
+            )
+            assert response.status_code == 201
+
+            response = await client.get("/api/v1/notes/", headers=headers)
+            assert [note["title"] for note in response.json()] == [email]
+
+        assert set(placement.values()) == {"a", "b"}
+        for shard in ("a", "b"):
+            expected = sum(1 for value in placement.values() if value == shard)
+            assert await count(sharded[shard], "SELECT count(*) FROM notes") == expected
+        assert await count(sharded["directory"], "SELECT count(*) FROM notes") == 0
+
+
+@pytest.mark.asyncio
+async def test_signup_removes_shard_user_if_directory_commit_fails(
+    sharded: Dict[str, AsyncEngine], monkeypatch
+):
+    """Тест: сбой коммита каталога не оставляет пользователя на шарде."""
+    email = "user0@example.com"
+    signup = {"email": email, "password": "password123"}
+    override_get_db = app.dependency_overrides[get_db]
+
+    async def failing_get_db():
+        async with shards.directory_session() as session:
+
+            async def commit() -> None:
+                raise OperationalError("COMMIT", {}, Exception("directory is down"))
+
+            monkeypatch.setattr(session, "commit", commit)
+            yield session
+
+    app.dependency_overrides[get_db] = failing_get_db
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        with pytest.raises(OperationalError):
+            await client.post("/api/v1/auth/signup", json=signup)
+        for engine in sharded.values():
+            assert await count(engine, "SELECT count(*) FROM users") == 0
+
+        app.dependency_overrides[get_db] = override_get_db
+        response = await client.post("/api/v1/auth/signup", json=signup)
+        assert response.status_code == 201
@@ -0,0 +1,62 @@
+"""
+Тесты пути запуска: импорт приложения и моделей без тяжелых зависимостей.
+"""
+
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict
+
+ROOT = Path(__file__).resolve().parents[2]
+# Бюджет суммарного времени импорта приложения, мс (без старта интерпретатора)
+IMPORT_BUDGET_MS = 3000
+# Загружаются при первом запросе или в lifespan, но не при импорте
+LAZY_MODULES = ("jose", "passlib", "cryptography", "asyncpg")
+
+
+def import_times(statement: str) -> Dict[str, int]:
+    """
+    Выполняет statement в новом интерпретаторе с -X importtime.
+
+    Args:
+        statement: Код на Python
+
+    Returns:
+        Dict[str, int]: Модуль -> собственное время импорта, мкс
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(self_us)
+    return times
+
+
+def test_app_import_budget():
+    """Тест: сборка приложения не загружает JWT, bcrypt и драйвер БД."""
+    times = import_times("from app.main import app")
+
+    loaded = sorted(name for name in times if name.split(".")[0] in LAZY_MODULES)
+    assert loaded == []
+    assert sum(times.values()) / 1000 < IMPORT_BUDGET_MS
+
+
+def test_models_import_without_engine():
+    """Тест: модели и роутер шардов импортируются без создания движка."""
+    times = import_times(
+        "import app.db.models, app.db.sharding\n"
+        "from app.db import database\n"
+        "from app.db.sharding import shards\n"
+        "assert database._engine is None and not shards.loaded"
+    )
+
+    assert "asyncpg" not in times
+    assert "sqlalchemy.ext.asyncio" not in import_times("import app.db.models")
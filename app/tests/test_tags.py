@@ -0,0 +1,137 @@
+"""
+Тесты для тегов заметок.
+"""
+
+from typing import List
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.note_tag import note_tag as note_tag_crud
+from app.db.models import NoteTag
+from app.tests.conftest import test_engine
+
+
+async def create_notes(client: AsyncClient, headers: dict, *titles: str) -> List[int]:
+    """Создает заметки и возвращает их ID."""
+    response = await client.post(
+        "/api/v1/notes/batch",
+        json={"notes": [{"title": title} for title in titles]},
+        headers=headers,
+    )
+    return [note["id"] for note in response.json()]
+
+
+async def titles(client: AsyncClient, headers: dict, **params) -> List[str]:
+    """Заголовки заметок из списка с фильтром."""
+    response = await client.get("/api/v1/notes/", params=params, headers=headers)
+    assert response.status_code == 200
+    return sorted(note["title"] for note in response.json())
+
+
+@pytest.mark.asyncio
+async def test_tag_filters_and_counts(client: AsyncClient, test_user: dict):
+    """Тест: фильтры AND/OR и счетчики тегов после добавления и снятия."""
+    headers = {"Authorization": f"Bearer {test_user['access_token']}"}
+    work, home, both = await create_notes(client, headers, "work", "home", "both")
+
+    response = await client.post(
+        "/api/v1/notes/tags/add",
+        json={"note_ids": [work, both], "tags": ["Work ", "work"]},
+        headers=headers,
+    )
+    assert response.json() == {"changed": 2}
+    await client.post(
+        "/api/v1/notes/tags/add",
+        json={"note_ids": [home, both], "tags": ["home"]},
+        headers=headers,
+    )
+    # Повторное добавление не меняет счетчики
+    response = await client.post(
+        "/api/v1/notes/tags/add",
+        json={"note_ids": [both], "tags": ["home", "work"]},
+        headers=headers,
+    )
+    assert response.json() == {"changed": 0}
+
+    assert await titles(client, headers, tag="work") == ["both", "work"]
+    assert await titles(client, headers, tag=["work", "home"]) == ["both"]
+    assert await titles(client, headers, tag=["work", "home"], tag_mode="any") == [
+        "both",
+        "home",
+        "work",
+    ]
+    assert await titles(client, headers, tag="missing") == []
+
+    response = await client.get("/api/v1/notes/tags", headers=headers)
+    assert response.json() == [
+        {"tag": "home", "count": 2},
+        {"tag": "work", "count": 2},
+    ]
+
+    response = await client.post(
+        "/api/v1/notes/tags/remove",
+        json={"note_ids": [work, both], "tags": ["work"]},
+        headers=headers,
+    )
+    assert response.json() == {"changed": 2}
+    await client.delete(f"/api/v1/notes/{home}", headers=headers)
+
+    response = await client.get("/api/v1/notes/tags", headers=headers)
+    assert response.json() == [{"tag": "home", "count": 1}]
+    assert await titles(client, headers, tag="home") == ["both"]
+
+
+@pytest.mark.asyncio
+async def test_tag_foreign_note(client: AsyncClient, test_user: dict):
+    """Тест: нельзя пометить чужую или несуществующую заметку."""
+    headers = {"Authorization": f"Bearer {test_user['access_token']}"}
+    (note_id,) = await create_notes(client, headers, "mine")
+
+    response = await client.post(
+        "/api/v1/notes/tags/add",
+        json={"note_ids": [note_id, note_id + 100], "tags": ["x"]},
+        headers=headers,
+    )
+    assert response.status_code == 404
+
+    response = await client.get("/api/v1/notes/tags", headers=headers)
+    assert response.json() == []
+
+    response = await client.get(
+        "/api/v1/notes/", params={"tag": "x" * 65}, headers=headers
+    )
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_tag_filter_uses_primary_key(db_session: AsyncSession):
+    """Тест: фильтр читает note_tags по ключу (owner_id, tag, note_id)."""
+    # Статистика для планировщика: 50 тегов на 2000 заметок
+    db_session.add_all(
+        NoteTag(owner_id=1, tag=f"tag{i % 50}", note_id=i) for i in range(2000)
+    )
+    await db_session.commit()
+    await db_session.execute(text("ANALYZE"))
+    await db_session.commit()
+
+    postgres = test_engine.dialect.name == "postgresql"
+    for match_all in (True, False):
+        query = note_tag_crud.tagged_note_ids(1, ("a", "b"), match_all)
+        compiled = query.compile(
+            test_engine.sync_engine, compile_kwargs={"literal_binds": True}
+        )
+        async with test_engine.connect() as conn:
+            result = await conn.exec_driver_sql(
+                f"EXPLAIN {compiled}" if postgres else f"EXPLAIN QUERY PLAN {compiled}"
+            )
+            plan = " ".join(row[-1] for row in result)
+
+        if postgres:
+            assert "Seq Scan" not in plan
+            assert "note_tags_pkey" in plan
+        else:
+            assert "SEARCH note_tags USING" in plan
+            assert "INDEX sqlite_autoindex_note_tags_1 (owner_id=? AND tag=?)" in plan
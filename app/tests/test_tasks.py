@@ -0,0 +1,164 @@
+"""
+Тесты для фоновых задач.
+"""
+
+import asyncio
+
+import pytest
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.db.models import BackgroundJob
+from app.services.tasks import DurableTaskQueue, TaskQueue, register_task
+from app.tests.conftest import TestingSessionLocal
+
+
+@pytest.mark.asyncio
+async def test_task_queue_runs_and_drains():
+    """Тест выполнения задач и ожидания очереди при остановке."""
+    queue = TaskQueue(concurrency=2)
+    done = []
+
+    async def job(value: int) -> None:
+        await asyncio.sleep(0.01)
+        done.append(value)
+
+    await queue.start()
+    for i in range(5):
+        assert queue.enqueue(job, i)
+    await queue.drain(timeout=5)
+
+    assert sorted(done) == [0, 1, 2, 3, 4]
+    assert not queue.running
+    # После остановки задачи не принимаются
+    assert queue.enqueue(job, 99) is False
+
+
+@pytest.mark.asyncio
+async def test_task_queue_retries_with_backoff(monkeypatch):
+    """Тест повторов упавшей задачи."""
+    monkeypatch.setattr(settings, "TASK_RETRY_BACKOFF", 0.01)
+    queue = TaskQueue(concurrency=1, max_retries=2)
+    attempts = []
+
+    async def flaky() -> None:
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise RuntimeError("temporary failure")
+
+    await queue.start()
+    queue.enqueue(flaky)
+    await queue.drain(timeout=5)
+
+    assert len(attempts) == 3
+
+
+@pytest.mark.asyncio
+async def test_task_queue_bounded():
+    """Тест: переполненная очередь отбрасывает задачи."""
+    queue = TaskQueue(concurrency=1, max_size=1)
+
+    async def job() -> None:
+        pass
+
+    assert queue.enqueue(job) is True
+    assert queue.enqueue(job) is False
+
+
+@pytest.mark.asyncio
+async def test_durable_queue_runs_batch(db_session):
+    """Тест очереди задач в БД."""
+    received = []
+
+    @register_task("test_collect")
+    async def collect(value: int) -> None:
+        received.append(value)
+
+    queue = DurableTaskQueue(TestingSessionLocal)
+    DurableTaskQueue.enqueue(db_session, "test_collect", value=42)
+    await db_session.commit()
+
+    processed = await queue.run_batch()
+
+    assert processed == 1
+    assert received == [42]
+    job = (await db_session.execute(select(BackgroundJob))).scalar_one()
+    await db_session.refresh(job)
+    assert job.status == "done"
+    assert job.attempts == 1
+    assert await queue.run_batch() == 0
+
+
+@pytest.mark.asyncio
+async def test_note_history_removed_by_durable_job(
+    db_session, test_user: dict, monkeypatch
+):
+    """Тест: история удаленной заметки удаляется задачей очереди на шарде."""
+    from datetime import datetime
+
+    from app.crud.note import note as note_crud
+    from app.db.models import NoteRevision
+    from app.schemas.note import NoteCreate
+
+    monkeypatch.setattr(settings, "TASK_DURABLE_ENABLED", True)
+    owner_id = test_user["user_id"]
+    note_id = (await note_crud.create(db_session, NoteCreate(title="T"), owner_id)).id
+    db_session.add(
+        NoteRevision(
+            owner_id=owner_id,
+            note_id=note_id,
+            version=1,
+            title="T",
+            kind="snapshot",
+            data="",
+            depth=0,
+            created_at=datetime.now(),
+        )
+    )
+    await db_session.commit()
+
+    assert await note_crud.delete_owned(db_session, note_id, owner_id)
+    # Задача закоммичена вместе с удалением, история еще на месте
+    job = (await db_session.execute(select(BackgroundJob))).scalar_one()
+    assert (job.name, job.payload) == (
+        "remove_note_revisions",
+        {"owner_id": owner_id, "note_id": note_id},
+    )
+    revisions = select(NoteRevision).where(NoteRevision.note_id == note_id)
+    assert (await db_session.execute(revisions)).scalars().all()
+
+    # Без фабрики очередь опрашивает все шарды
+    assert await DurableTaskQueue().run_batch() == 1
+    assert (await db_session.execute(revisions)).scalars().all() == []
+
+
+@pytest.mark.asyncio
+async def test_login_rehashes_outdated_password(client, test_user: dict, monkeypatch):
+    """Тест: вход с устаревшим хешем ставит пересчет в очередь процесса."""
+    from app.api.v1.endpoints import auth
+    from app.core.security import verify_password
+    from app.crud.user import user as user_crud
+    from app.services.jobs import rehash_password
+
+    enqueued = []
+    monkeypatch.setattr(auth, "password_needs_rehash", lambda hashed: True)
+    monkeypatch.setattr(
+        auth.task_queue, "enqueue", lambda func, *args: enqueued.append((func, args))
+    )
+    async with TestingSessionLocal() as db:
+        old_hash = (await user_crud.get_by_id(db, test_user["user_id"])).hashed_password
+
+    response = await client.post(
+        "/api/v1/auth/login",
+        data={"username": test_user["email"], "password": test_user["password"]},
+    )
+    assert response.status_code == 200
+    assert enqueued == [
+        (rehash_password, (test_user["user_id"], test_user["password"]))
+    ]
+
+    await rehash_password(test_user["user_id"], test_user["password"])
+    async with TestingSessionLocal() as db:
+        new_hash = (await user_crud.get_by_id(db, test_user["user_id"])).hashed_password
+    assert new_hash != old_hash
+    assert verify_password(test_user["password"], new_hash)
@@ -0,0 +1,127 @@
+"""
+Бенчмарк стоимости access-лога на запрос.
+
+Прогоняет запросы через минимальное приложение FastAPI (вызов ASGI)
+без логирования, с AccessLogMiddleware и очередью (с сэмплированием
+и без) и с обычным StreamHandler, пишущим прямо из event loop.
+Логи пишутся во временный файл, чтобы запись действительно выполнялась.
+
+Запуск:
+    python -m app.tools.bench_logging --requests 5000
+"""
+
+import argparse
+import asyncio
+import logging
+import tempfile
+import time
+from typing import Optional
+
+from fastapi import FastAPI
+from starlette.types import ASGIApp, Message
+
+from app.core.logs import (
+    AccessLogMiddleware,
+    JsonFormatter,
+    setup_logging,
+    shutdown_logging,
+)
+
+
+def build_app(sample_rate: Optional[float]) -> ASGIApp:
+    """Приложение с одним эндпоинтом, опционально под AccessLogMiddleware."""
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping() -> dict:
+        return {"ok": True}
+
+    if sample_rate is None:
+        return app
+    return AccessLogMiddleware(app, sample_rate=sample_rate)
+
+
+async def measure(app: ASGIApp, requests: int, repeats: int = 5) -> float:
+    """
+    Время запроса в микросекундах (лучшее из нескольких прогонов).
+
+    Приложение вызывается напрямую по ASGI, без HTTP-клиента:
+    иначе его накладные расходы скрывают стоимость логирования.
+
+    Args:
+        app: ASGI-приложение
+        requests: Количество запросов в прогоне
+        repeats: Количество прогонов
+
+    Returns:
+        float: Микросекунды на запрос
+    """
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/ping",
+        "raw_path": b"/ping",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 1),
+        "server": ("bench", 80),
+    }
+
+    async def receive() -> Message:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: Message) -> None:
+        pass
+
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for _ in range(requests):
+            await app(dict(scope), receive, send)
+        best = min(best, time.perf_counter() - started)
+    return best / requests * 1_000_000
+
+
+async def run(requests: int) -> None:
+    """Печатает время запроса для каждого варианта логирования."""
+    root = logging.getLogger()
+    handlers = root.handlers
+    results = [("no access log", await measure(build_app(None), requests))]
+
+    with tempfile.TemporaryFile("w") as log_file:
+        # Очередь + поток записи
+        setup_logging("INFO", stream=log_file)
+        for rate in (0.0, 0.1, 1.0):
+            results.append(
+                (f"queue, rate {rate:g}", await measure(build_app(rate), requests))
+            )
+        shutdown_logging()
+
+        # Запись в файл прямо из event loop
+        direct = logging.StreamHandler(log_file)
+        direct.setFormatter(JsonFormatter())
+        root.handlers = [direct]
+        results.append(("direct handler", await measure(build_app(1.0), requests)))
+        root.handlers = handlers
+
+    baseline = results[0][1]
+    print(f"{'variant':<18}{'us/request':>12}{'overhead, us':>14}")
+    for name, us in results:
+        print(f"{name:<18}{us:>12.1f}{us - baseline:>14.1f}")
+
+
+def main() -> None:
+    """Точка входа CLI."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+
+    asyncio.run(run(args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Бенчмарк накладных расходов Python на горячих запросах CRUD.
+
+Сравнивает обычный select(...), который строится и хешируется
+(ключ кеша компиляции) при каждом вызове, с методами NoteCRUD/UserCRUD
+на lambda_stmt, где построение и ключ кеша вычисляются один раз.
+Используется SQLite в памяти, поэтому время самой БД минимально
+и разница - это работа Python. Для списков выигрыш меньше: время
+уходит на загрузку строк в ORM-объекты.
+
+Запуск:
+    python -m app.tools.bench_queries --iterations 5000
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.crud.note import note as note_crud
+from app.crud.user import user as user_crud
+from app.db.models import Base, Note, User
+
+
+async def measure(iterations: int, query: Callable[[int], Awaitable[object]]) -> float:
+    """
+    Среднее время одного вызова в микросекундах.
+
+    Args:
+        iterations: Количество вызовов
+        query: Асинхронная функция запроса от номера итерации
+
+    Returns:
+        float: Микросекунды на вызов
+    """
+    # Прогрев: компиляция и заполнение кешей
+    for i in range(100):
+        await query(i)
+
+    started = time.perf_counter()
+    for i in range(iterations):
+        await query(i)
+    return (time.perf_counter() - started) / iterations * 1_000_000
+
+
+async def run(iterations: int, notes: int) -> None:
+    """Заполняет БД и печатает результаты сравнения."""
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    async with session_factory() as db:
+        db.add(User(id=1, email="bench@example.com", hashed_password="x"))
+        db.add_all(Note(title=f"Note {i}", owner_id=1) for i in range(notes))
+        await db.commit()
+
+        await _compare(db, iterations, notes)
+
+    await engine.dispose()
+
+
+async def _compare(db: AsyncSession, iterations: int, notes: int) -> None:
+    async def plain_note(i: int) -> object:
+        query = select(Note).where(Note.id == i % notes + 1, Note.owner_id == 1)
+        return (await db.execute(query)).scalar_one_or_none()
+
+    async def crud_note(i: int) -> object:
+        return await note_crud.get_by_id(db, i % notes + 1, owner_id=1)
+
+    async def plain_list(i: int) -> object:
+        query = (
+            select(Note)
+            .where(Note.owner_id == 1)
+            .order_by(Note.created_at.desc())
+            .offset(0)
+            .limit(20)
+        )
+        return (await db.execute(query)).scalars().all()
+
+    async def crud_list(i: int) -> object:
+        return await note_crud.get_multi(db, owner_id=1, skip=0, limit=20)
+
+    async def plain_user(i: int) -> object:
+        return (await db.execute(select(User).where(User.id == 1))).scalar_one()
+
+    async def crud_user(i: int) -> object:
+        return await user_crud.get_by_id(db, user_id=1)
+
+    print(f"{'query':<12}{'select, us':>12}{'lambda, us':>12}{'saved':>10}")
+    for name, plain, cached in (
+        ("note by id", plain_note, crud_note),
+        ("note list", plain_list, crud_list),
+        ("user by id", plain_user, crud_user),
+    ):
+        plain_us = await measure(iterations, plain)
+        cached_us = await measure(iterations, cached)
+        saved = (plain_us - cached_us) / plain_us * 100
+        print(f"{name:<12}{plain_us:>12.1f}{cached_us:>12.1f}{saved:>9.0f}%")
+
+
+def main() -> None:
+    """Точка входа CLI."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=5000)
+    parser.add_argument("--notes", type=int, default=100)
+    args = parser.parse_args()
+
+    asyncio.run(run(args.iterations, args.notes))
+
+
+if __name__ == "__main__":
+    main()
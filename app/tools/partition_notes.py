@@ -0,0 +1,324 @@
+"""
+Онлайн-переход notes на секционирование HASH (owner_id).
+
+Миграция 91b0c858941a создает notes_partitioned и триггер, который
+повторяет в ней каждое изменение notes. Дальше:
+
+    python -m app.tools.partition_notes backfill   # копирование пачками
+    python -m app.tools.partition_notes status     # сверка количества строк
+    python -m app.tools.partition_notes cutover    # переключение таблиц
+    python -m app.tools.partition_notes rollback   # возврат к старой таблице
+    python -m app.tools.partition_notes finalize   # удаление старой таблицы
+
+После cutover старая таблица остается под именем notes_unpartitioned и
+синхронизируется обратным триггером, поэтому откат не теряет записей.
+"""
+
+import argparse
+import asyncio
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from app.db.database import get_engine
+
+COLUMNS = "id, title, content, preview, owner_id, created_at, updated_at, version"
+NEW_COLUMNS = (
+    "NEW.id, NEW.title, NEW.content, NEW.preview, "
+    "NEW.owner_id, NEW.created_at, NEW.updated_at, NEW.version"
+)
+
+
+async def is_partitioned(conn: AsyncConnection) -> bool:
+    """
+    Проверяет, секционирована ли уже таблица notes.
+
+    Args:
+        conn: Соединение с БД
+
+    Returns:
+        bool: True после cutover
+    """
+    result = await conn.execute(
+        text(
+            "SELECT 1 FROM pg_partitioned_table " "WHERE partrelid = 'notes'::regclass"
+        )
+    )
+    return result.first() is not None
+
+
+async def backfill_batch(
+    conn: AsyncConnection, after_id: int, batch_size: int
+) -> Tuple[Optional[int], int]:
+    """
+    Копирует одну пачку строк notes с id > after_id.
+
+    Строки блокируются FOR SHARE до коммита пачки: параллельное удаление
+    дождется копирования, и триггер удалит копию. Уже скопированные
+    триггером строки не перезаписываются.
+
+    Args:
+        conn: Соединение с открытой транзакцией
+        after_id: Последний скопированный ID
+        batch_size: Размер пачки
+
+    Returns:
+        Tuple[Optional[int], int]: Последний ID пачки (None, если строк нет)
+            и количество прочитанных строк
+    """
+    result = await conn.execute(
+        text(f"""
+            WITH batch AS (
+                SELECT {COLUMNS} FROM notes
+                WHERE id > :after_id
+                ORDER BY id
+                LIMIT :batch_size
+                FOR SHARE
+            ), copied AS (
+                INSERT INTO notes_partitioned ({COLUMNS})
+                SELECT {COLUMNS} FROM batch
+                ON CONFLICT (owner_id, id) DO NOTHING
+            )
+            SELECT max(id), count(*) FROM batch
+            """),
+        {"after_id": after_id, "batch_size": batch_size},
+    )
+    last_id, count = result.one()
+    return last_id, count
+
+
+async def backfill(
+    db_engine: AsyncEngine,
+    batch_size: int = 5000,
+    pause: float = 0.0,
+    after_id: int = 0,
+) -> int:
+    """
+    Копирует все строки notes в notes_partitioned пачками.
+
+    Каждая пачка - отдельная короткая транзакция, поэтому копирование
+    можно прервать и продолжить с --after-id.
+
+    Args:
+        db_engine: Движок БД
+        batch_size: Размер пачки
+        pause: Пауза между пачками в секундах (снижает нагрузку)
+        after_id: ID, после которого начинать
+
+    Returns:
+        int: Количество обработанных строк
+    """
+    total = 0
+    while True:
+        async with db_engine.begin() as conn:
+            last_id, count = await backfill_batch(conn, after_id, batch_size)
+        if last_id is None:
+            return total
+
+        total += count
+        after_id = last_id
+        print(f"Copied {total} rows, last id {after_id}")
+        if pause:
+            await asyncio.sleep(pause)
+
+
+async def _columns(conn: AsyncConnection, table: str) -> List[Tuple[str, str]]:
+    result = await conn.execute(
+        text(
+            "SELECT column_name, data_type FROM information_schema.columns "
+            "WHERE table_schema = current_schema() AND table_name = :table "
+            "ORDER BY column_name"
+        ),
+        {"table": table},
+    )
+    return [tuple(row) for row in result]
+
+
+async def _rename_indexes(
+    conn: AsyncConnection, table: str, old: str, new: str
+) -> None:
+    result = await conn.execute(
+        text(
+            "SELECT indexname FROM pg_indexes "
+            "WHERE schemaname = current_schema() AND tablename = :table"
+        ),
+        {"table": table},
+    )
+    for (name,) in result.all():
+        if old in name:
+            renamed = name.replace(old, new, 1)
+            await conn.execute(text(f'ALTER INDEX "{name}" RENAME TO "{renamed}"'))
+
+
+async def _swap(conn: AsyncConnection, replacement: str, retired: str) -> None:
+    """Переименовывает notes -> retired и replacement -> notes вместе с индексами."""
+    # Блокируем обе таблицы одной командой, чтобы не было взаимоблокировок
+    await conn.execute(
+        text(f"LOCK TABLE notes, {replacement} IN ACCESS EXCLUSIVE MODE")
+    )
+    await _rename_indexes(conn, "notes", "notes", retired)
+    await conn.execute(text(f"ALTER TABLE notes RENAME TO {retired}"))
+    await _rename_indexes(conn, replacement, replacement, "notes")
+    await conn.execute(text(f"ALTER TABLE {replacement} RENAME TO notes"))
+    # Последовательность id иначе удалится вместе со старой таблицей
+    await conn.execute(text("ALTER SEQUENCE notes_id_seq OWNED BY notes.id"))
+
+
+async def cutover(db_engine: AsyncEngine) -> None:
+    """
+    Переключает notes на секционированную таблицу.
+
+    Выполняется в одной транзакции с короткой эксклюзивной блокировкой:
+    данные уже синхронизированы триггером, меняются только имена.
+    Старая таблица получает обратный триггер для возможного отката.
+
+    Args:
+        db_engine: Движок БД
+
+    Raises:
+        RuntimeError: Если таблицы уже переключены или их схемы различаются
+    """
+    async with db_engine.begin() as conn:
+        if await is_partitioned(conn):
+            raise RuntimeError("notes is already partitioned")
+
+        if await _columns(conn, "notes") != await _columns(conn, "notes_partitioned"):
+            raise RuntimeError(
+                "notes and notes_partitioned columns differ; "
+                "apply the same schema changes to notes_partitioned first"
+            )
+
+        await conn.execute(text("DROP TRIGGER notes_partition_sync ON notes"))
+        await _swap(conn, "notes_partitioned", "notes_unpartitioned")
+
+        await conn.execute(text(f"""
+                CREATE OR REPLACE FUNCTION notes_unpartitioned_sync()
+                RETURNS trigger AS $$
+                BEGIN
+                    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                        DELETE FROM notes_unpartitioned WHERE id = OLD.id;
+                    END IF;
+                    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                        INSERT INTO notes_unpartitioned ({COLUMNS})
+                        VALUES ({NEW_COLUMNS});
+                    END IF;
+                    RETURN NULL;
+                END
+                $$ LANGUAGE plpgsql
+                """))
+        await conn.execute(
+            text(
+                "CREATE TRIGGER notes_unpartitioned_sync "
+                "AFTER INSERT OR UPDATE OR DELETE ON notes "
+                "FOR EACH ROW EXECUTE FUNCTION notes_unpartitioned_sync()"
+            )
+        )
+
+
+async def rollback(db_engine: AsyncEngine) -> None:
+    """
+    Возвращает несекционированную таблицу после cutover.
+
+    Args:
+        db_engine: Движок БД
+
+    Raises:
+        RuntimeError: Если cutover не выполнялся
+    """
+    async with db_engine.begin() as conn:
+        if not await is_partitioned(conn):
+            raise RuntimeError("notes is not partitioned")
+
+        await conn.execute(text("DROP TRIGGER notes_unpartitioned_sync ON notes"))
+        await _swap(conn, "notes_unpartitioned", "notes_partitioned")
+        await conn.execute(
+            text(
+                "CREATE TRIGGER notes_partition_sync "
+                "AFTER INSERT OR UPDATE OR DELETE ON notes "
+                "FOR EACH ROW EXECUTE FUNCTION notes_partition_sync()"
+            )
+        )
+
+
+async def finalize(db_engine: AsyncEngine) -> None:
+    """
+    Удаляет старую таблицу и триггеры синхронизации после cutover.
+
+    Args:
+        db_engine: Движок БД
+
+    Raises:
+        RuntimeError: Если cutover не выполнялся
+    """
+    async with db_engine.begin() as conn:
+        if not await is_partitioned(conn):
+            raise RuntimeError("notes is not partitioned")
+
+        await conn.execute(text("DROP TRIGGER notes_unpartitioned_sync ON notes"))
+        await conn.execute(text("DROP FUNCTION notes_unpartitioned_sync()"))
+        await conn.execute(text("DROP FUNCTION notes_partition_sync()"))
+        await conn.execute(text("DROP TABLE notes_unpartitioned"))
+
+
+async def status(db_engine: AsyncEngine) -> None:
+    """
+    Печатает состояние перехода и количество строк в таблицах.
+
+    Args:
+        db_engine: Движок БД
+    """
+    async with db_engine.connect() as conn:
+        partitioned = await is_partitioned(conn)
+        other = "notes_unpartitioned" if partitioned else "notes_partitioned"
+        print(f"notes partitioned: {partitioned}")
+        for table in ("notes", other):
+            count = (await conn.execute(text(f"SELECT count(*) FROM {table}"))).scalar()
+            print(f"{table}: {count} rows")
+
+
+async def run(args: argparse.Namespace) -> None:
+    """Выполняет команду и закрывает пул соединений."""
+    engine = get_engine()
+    try:
+        if args.command == "backfill":
+            total = await backfill(
+                engine,
+                batch_size=args.batch_size,
+                pause=args.pause,
+                after_id=args.after_id,
+            )
+            print(f"Backfill done: {total} rows")
+        elif args.command == "cutover":
+            await cutover(engine)
+            print("notes is now partitioned")
+        elif args.command == "rollback":
+            await rollback(engine)
+            print("notes is unpartitioned again")
+        elif args.command == "finalize":
+            await finalize(engine)
+            print("notes_unpartitioned dropped")
+        else:
+            await status(engine)
+    finally:
+        await engine.dispose()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Точка входа CLI."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    backfill_parser = subparsers.add_parser("backfill", help="copy rows in batches")
+    backfill_parser.add_argument("--batch-size", type=int, default=5000)
+    backfill_parser.add_argument("--pause", type=float, default=0.0)
+    backfill_parser.add_argument("--after-id", type=int, default=0)
+
+    for command in ("status", "cutover", "rollback", "finalize"):
+        subparsers.add_parser(command)
+
+    asyncio.run(run(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,430 @@
+"""
+Заполнение БД синтетическими пользователями и заметками для нагрузочных проверок.
+
+Количество заметок у пользователей распределено по Zipf: немногие
+пользователи владеют большей частью заметок, у большинства их единицы.
+Размер содержимого тоже по Zipf: в основном короткие заметки с длинным
+хвостом больших. Содержимое сжимается так же, как в приложении
+(CompressedText), статистика user_note_stats заполняется сразу.
+
+Строки загружаются через COPY asyncpg пачками пользователей: каталог
+user_directory в основной БД, users, notes и user_note_stats - на шарде
+пользователя. На пустой БД результат одинаков при тех же --seed и --until.
+
+Запуск:
+    python -m app.tools.seed --users 100000 --notes-per-user 30 --seed 1
+"""
+
+import argparse
+import asyncio
+import bisect
+import random
+import string
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from itertools import accumulate
+from typing import Dict, List, Optional, Sequence, Tuple, cast
+
+from passlib.hash import bcrypt
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.config import settings
+from app.db.models import Note, User, UserDirectory, UserNoteStats
+from app.db.sharding import shards
+from app.db.types import CompressedText
+
+# Пароль всех сгенерированных пользователей
+SEED_PASSWORD = "seed-password"
+# Шаг размера содержимого в символах (ранг Zipf 1 = CONTENT_STEP символов)
+CONTENT_STEP = 64
+# Доля заметок без содержимого
+EMPTY_CONTENT_SHARE = 0.05
+# Размер общего текста, из которого нарезается содержимое
+CORPUS_SIZE = 1 << 20
+
+Row = Tuple[object, ...]
+
+
+class ZipfSampler:
+    """
+    Выборка рангов 1..n с вероятностью, пропорциональной 1 / rank ** s.
+
+    Накопленные веса считаются один раз, выборка - бинарный поиск.
+    """
+
+    def __init__(self, n: int, s: float) -> None:
+        self.cumulative = list(accumulate(1 / rank**s for rank in range(1, n + 1)))
+
+    def sample(self, rng: random.Random) -> int:
+        """
+        Возвращает ранг.
+
+        Args:
+            rng: Генератор случайных чисел
+
+        Returns:
+            int: Ранг от 1 до n
+        """
+        point = rng.random() * self.cumulative[-1]
+        return bisect.bisect_left(self.cumulative, point) + 1
+
+
+def note_counts(rng: random.Random, users: int, total: int, s: float) -> List[int]:
+    """
+    Распределяет total заметок между пользователями по закону Zipf.
+
+    Пользователь ранга r получает долю 1 / r ** s; ранги перемешаны,
+    чтобы активные пользователи не шли подряд по ID.
+
+    Args:
+        rng: Генератор случайных чисел
+        users: Количество пользователей
+        total: Общее количество заметок
+        s: Показатель Zipf (больше - сильнее перекос)
+
+    Returns:
+        List[int]: Количество заметок по порядку пользователей
+    """
+    weights = [1 / rank**s for rank in range(1, users + 1)]
+    scale = total / sum(weights)
+    by_rank = [int(weight * scale) for weight in weights]
+    # Остаток от округления - самым активным
+    for rank in range(total - sum(by_rank)):
+        by_rank[rank % users] += 1
+
+    rng.shuffle(by_rank)
+    return by_rank
+
+
+def build_corpus(rng: random.Random, size: int = CORPUS_SIZE) -> str:
+    """
+    Строит псевдотекст из случайных слов (сжимается примерно как текст).
+
+    Args:
+        rng: Генератор случайных чисел
+        size: Длина в символах
+
+    Returns:
+        str: Текст
+    """
+    vocabulary = [
+        "".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 10)))
+        for _ in range(5000)
+    ]
+    words: List[str] = []
+    length = 0
+    while length < size:
+        word = rng.choice(vocabulary)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)[:size]
+
+
+@dataclass
+class UserBatch:
+    """Строки одной пачки пользователей для COPY."""
+
+    directory: List[Row] = field(default_factory=list)
+    users: Dict[str, List[Row]] = field(default_factory=lambda: defaultdict(list))
+    notes: Dict[str, List[Row]] = field(default_factory=lambda: defaultdict(list))
+    stats: Dict[str, List[Row]] = field(default_factory=lambda: defaultdict(list))
+    note_count: int = 0
+
+
+class DataGenerator:
+    """
+    Детерминированный генератор пользователей и заметок.
+
+    У каждого пользователя свой генератор случайных чисел от (seed, номер),
+    поэтому данные не зависят от размера пачек.
+
+    Args:
+        seed: Зерно генерации
+        users: Количество пользователей
+        notes_per_user: Среднее количество заметок на пользователя
+        notes_zipf: Показатель Zipf для количества заметок
+        content_zipf: Показатель Zipf для размера содержимого
+        until: Самая поздняя дата создания и изменения
+        days: Период, за который созданы пользователи и заметки
+    """
+
+    def __init__(
+        self,
+        seed: int,
+        users: int,
+        notes_per_user: float,
+        notes_zipf: float,
+        content_zipf: float,
+        until: datetime,
+        days: int,
+    ) -> None:
+        self.seed = seed
+        rng = random.Random(seed)
+        self.counts = note_counts(rng, users, int(users * notes_per_user), notes_zipf)
+        self.corpus = build_corpus(rng)
+        self.sizes = ZipfSampler(
+            settings.NOTE_CONTENT_MAX_LENGTH // CONTENT_STEP, content_zipf
+        )
+        self.until = until
+        self.period = timedelta(days=days).total_seconds()
+        # Соль bcrypt из зерна: одинаковый хеш при каждом запуске
+        salt = "".join(rng.choices(string.ascii_letters + string.digits + "./", k=21))
+        self.password_hash = bcrypt.using(salt=salt + ".").hash(SEED_PASSWORD)
+        self.content_type = cast(CompressedText, Note.__table__.c.content.type)
+        self.dialect = postgresql.dialect()
+
+    def _moment(self, rng: random.Random, after: datetime) -> datetime:
+        """Случайный момент между after и until."""
+        span = (self.until - after).total_seconds()
+        return after + timedelta(seconds=rng.random() * span)
+
+    def _content(self, rng: random.Random) -> Optional[str]:
+        if rng.random() < EMPTY_CONTENT_SHARE:
+            return None
+        size = self.sizes.sample(rng) * CONTENT_STEP
+        start = rng.randrange(len(self.corpus) - size) if size < len(self.corpus) else 0
+        return self.corpus[start : start + size]
+
+    def add_user(self, batch: UserBatch, index: int, user_id: int) -> None:
+        """
+        Добавляет в пачку пользователя, его заметки и статистику.
+
+        Args:
+            batch: Пачка строк
+            index: Номер пользователя в генерации (0..users-1)
+            user_id: Глобальный ID пользователя
+        """
+        rng = random.Random(f"{self.seed}:{index}")
+        email = f"seed{self.seed}-user{index}@example.com"
+        shard = shards.place(email)
+        created_at = self.until - timedelta(seconds=rng.random() * self.period)
+
+        batch.directory.append((user_id, email, shard, created_at))
+        batch.users[shard].append(
+            (user_id, email, self.password_hash, True, created_at)
+        )
+
+        content_bytes = 0
+        last_modified = None
+        for number in range(self.counts[index]):
+            content = self._content(rng)
+            note_created = self._moment(rng, created_at)
+            note_updated = self._moment(rng, note_created)
+            batch.notes[shard].append(
+                (
+                    f"Note {number + 1}",
+                    self.content_type.process_bind_param(content, self.dialect),
+                    Note.make_preview(content),
+                    user_id,
+                    note_created,
+                    note_updated,
+                    1,
+                )
+            )
+            content_bytes += len(content.encode("utf-8")) if content else 0
+            last_modified = max(last_modified or note_updated, note_updated)
+
+        batch.stats[shard].append(
+            (user_id, self.counts[index], 0, content_bytes, last_modified)
+        )
+        batch.note_count += self.counts[index]
+
+
+NOTE_COLUMNS = [
+    "title",
+    "content",
+    "preview",
+    "owner_id",
+    "created_at",
+    "updated_at",
+    "version",
+]
+
+
+async def copy_rows(
+    db_engine: AsyncEngine, tables: Sequence[Tuple[str, List[str], List[Row]]]
+) -> None:
+    """
+    Загружает строки через COPY asyncpg в одной транзакции.
+
+    Args:
+        db_engine: Движок БД (asyncpg)
+        tables: (таблица, колонки, строки) в порядке загрузки
+    """
+    async with db_engine.connect() as conn:
+        raw = await conn.get_raw_connection()
+        driver = raw.driver_connection
+        if driver is None:
+            raise RuntimeError("COPY needs an open asyncpg connection")
+        async with driver.transaction():
+            for table, columns, rows in tables:
+                if rows:
+                    await driver.copy_records_to_table(
+                        table, records=rows, columns=columns
+                    )
+
+
+async def sync_sequence(db_engine: AsyncEngine, table: str) -> None:
+    """Сдвигает последовательность ID после вставки явных значений."""
+    async with db_engine.begin() as conn:
+        await conn.execute(
+            text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                f"(SELECT max(id) FROM {table}))"
+            )
+        )
+
+
+async def check_not_seeded(seed_value: int) -> None:
+    """
+    Проверяет, что пользователей с этим --seed еще нет.
+
+    Каталог и шарды загружаются разными транзакциями: после сбоя на
+    шарде в каталоге остаются записи пачки. Повтор с тем же --seed
+    дал бы дубликаты email, поэтому он отклоняется до записи.
+
+    Args:
+        seed_value: Значение --seed
+
+    Raises:
+        RuntimeError: Если такие пользователи есть в каталоге или на шарде
+    """
+    pattern = f"seed{seed_value}-user%"
+    targets = [(shards.directory, UserDirectory.__tablename__)] + [
+        (shard_engine, User.__tablename__)
+        for shard_engine in set(shards.engines.values())
+    ]
+    for db_engine, table in targets:
+        async with db_engine.connect() as conn:
+            result = await conn.execute(
+                text(f"SELECT 1 FROM {table} WHERE email LIKE :pattern LIMIT 1"),
+                {"pattern": pattern},
+            )
+            if result.first() is not None:
+                raise RuntimeError(
+                    f"{table} already has seed{seed_value} users: "
+                    "remove them or use another --seed"
+                )
+
+
+async def seed(
+    generator: DataGenerator, users: int, batch_users: int = 1000
+) -> Tuple[int, int]:
+    """
+    Генерирует и загружает данные пачками пользователей.
+
+    Args:
+        generator: Генератор данных
+        users: Количество пользователей
+        batch_users: Пользователей в пачке (одна транзакция на шард)
+
+    Returns:
+        Tuple[int, int]: Количество пользователей и заметок
+
+    Raises:
+        RuntimeError: Если данные с этим --seed уже загружались
+    """
+    await check_not_seeded(generator.seed)
+    async with shards.directory.connect() as conn:
+        result = await conn.execute(
+            text(f"SELECT coalesce(max(id), 0) FROM {UserDirectory.__tablename__}")
+        )
+        first_id = (result.scalar() or 0) + 1
+
+    total_notes = 0
+    started = time.perf_counter()
+    for offset in range(0, users, batch_users):
+        batch = UserBatch()
+        for index in range(offset, min(offset + batch_users, users)):
+            generator.add_user(batch, index, first_id + index)
+
+        await copy_rows(
+            shards.directory,
+            [
+                (
+                    UserDirectory.__tablename__,
+                    ["id", "email", "shard", "created_at"],
+                    batch.directory,
+                )
+            ],
+        )
+        for shard, shard_users in batch.users.items():
+            await copy_rows(
+                shards.engines[shard],
+                [
+                    (
+                        User.__tablename__,
+                        ["id", "email", "hashed_password", "is_active", "created_at"],
+                        shard_users,
+                    ),
+                    (Note.__tablename__, NOTE_COLUMNS, batch.notes[shard]),
+                    (
+                        UserNoteStats.__tablename__,
+                        [
+                            "owner_id",
+                            "note_count",
+                            "archived_count",
+                            "content_bytes",
+                            "last_modified",
+                        ],
+                        batch.stats[shard],
+                    ),
+                ],
+            )
+
+        total_notes += batch.note_count
+        loaded = min(offset + batch_users, users)
+        elapsed = time.perf_counter() - started
+        print(
+            f"{loaded}/{users} users, {total_notes} notes, "
+            f"{total_notes / elapsed:.0f} notes/s"
+        )
+
+    await sync_sequence(shards.directory, UserDirectory.__tablename__)
+    for shard_engine in set(shards.engines.values()):
+        await sync_sequence(shard_engine, User.__tablename__)
+
+    return users, total_notes
+
+
+async def run(args: argparse.Namespace) -> None:
+    """Выполняет заполнение и закрывает пулы соединений."""
+    until = datetime.combine(args.until, datetime.min.time())
+    generator = DataGenerator(
+        seed=args.seed,
+        users=args.users,
+        notes_per_user=args.notes_per_user,
+        notes_zipf=args.notes_zipf,
+        content_zipf=args.content_zipf,
+        until=until,
+        days=args.days,
+    )
+    try:
+        users, notes = await seed(generator, args.users, args.batch_users)
+        print(f"Seeded {users} users and {notes} notes (password: {SEED_PASSWORD})")
+    finally:
+        await shards.dispose()
+        await shards.directory.dispose()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Точка входа CLI."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--notes-per-user", type=float, default=20)
+    parser.add_argument("--notes-zipf", type=float, default=1.1)
+    parser.add_argument("--content-zipf", type=float, default=1.5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch-users", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--until", type=date.fromisoformat, default=date.today())
+
+    asyncio.run(run(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
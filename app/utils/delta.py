@@ -0,0 +1,60 @@
+"""
+Построчные дельты текста для истории изменений заметок.
+
+Дельта - JSON-список замен [начало, конец, новый текст] по строкам
+исходного текста (строки с переводами строк, как в splitlines(True)).
+Неизменные строки в дельту не попадают.
+"""
+
+import json
+from difflib import SequenceMatcher
+from typing import List, Optional
+
+
+def _lines(text: str) -> List[str]:
+    return text.splitlines(keepends=True)
+
+
+def encode_delta(base: str, text: str) -> Optional[str]:
+    """
+    Строит дельту, превращающую base в text.
+
+    Args:
+        base: Исходный текст
+        text: Новый текст
+
+    Returns:
+        Optional[str]: Дельта или None, если она не короче самого text
+            (тогда выгоднее хранить текст целиком)
+    """
+    base_lines, lines = _lines(base), _lines(text)
+    matcher = SequenceMatcher(None, base_lines, lines, autojunk=False)
+    operations = [
+        [i1, i2, "".join(lines[j1:j2])]
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+        if tag != "equal"
+    ]
+    delta = json.dumps(operations, ensure_ascii=False, separators=(",", ":"))
+    return delta if len(delta) < len(text) else None
+
+
+def apply_delta(base: str, delta: str) -> str:
+    """
+    Применяет дельту к исходному тексту.
+
+    Args:
+        base: Текст, от которого строилась дельта
+        delta: Дельта из encode_delta
+
+    Returns:
+        str: Новый текст
+    """
+    base_lines = _lines(base)
+    parts: List[str] = []
+    position = 0
+    for start, end, replacement in json.loads(delta):
+        parts.extend(base_lines[position:start])
+        parts.append(replacement)
+        position = end
+    parts.extend(base_lines[position:])
+    return "".join(parts)
@@ -17,8 +17,13 @@ from app.db.models import Base
 # Это объект конфигурации Alembic
 config = context.config
 
-# Настройка URL базы данных из конфига приложения
-config.set_main_option("sqlalchemy.url", str(settings.DATABASE_URL))
+# Настройка URL базы данных из конфига приложения.
+# Шарды мигрируются отдельно: alembic -x shard=<имя> upgrade head
+shard = context.get_x_argument(as_dictionary=True).get("shard")
+config.set_main_option(
+    "sqlalchemy.url",
+    settings.shard_urls()[shard] if shard else str(settings.DATABASE_URL),
+)
 
 # Настройка логирования
 if config.config_file_name is not None:
@@ -0,0 +1,68 @@
+"""User note stats
+
+Revision ID: 4e1f7c2b9a63
+Revises: b6dbf2a92856
+Create Date: 2026-10-19 16:48:31.557204
+
+"""
+from collections import defaultdict
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.db.types import CompressedText
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4e1f7c2b9a63'
+down_revision: Union[str, None] = 'b6dbf2a92856'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('user_note_stats',
+    sa.Column('owner_id', sa.Integer(), nullable=False),
+    sa.Column('note_count', sa.Integer(), nullable=False),
+    sa.Column('archived_count', sa.Integer(), nullable=False),
+    sa.Column('content_bytes', sa.BigInteger(), nullable=False),
+    sa.Column('last_modified', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['owner_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('owner_id')
+    )
+    # Заполнение по существующим заметкам. Содержимое хранится сжатым,
+    # поэтому размер в UTF-8 считается в Python, построчно с сервера
+    bind = op.get_bind()
+    stats = defaultdict(lambda: {'note_count': 0, 'archived_count': 0, 'content_bytes': 0, 'last_modified': None})
+    for table, counter in (('notes', 'note_count'), ('notes_archive', 'archived_count')):
+        notes = sa.table(table,
+            sa.column('owner_id', sa.Integer()),
+            sa.column('content', CompressedText()),
+            sa.column('updated_at', sa.DateTime()),
+        )
+        rows = bind.execution_options(yield_per=1000).execute(
+            sa.select(notes.c.owner_id, notes.c.content, notes.c.updated_at)
+        )
+        for owner_id, content, updated_at in rows:
+            entry = stats[owner_id]
+            entry[counter] += 1
+            entry['content_bytes'] += len(content.encode('utf-8')) if content else 0
+            if entry['last_modified'] is None or updated_at > entry['last_modified']:
+                entry['last_modified'] = updated_at
+
+    if stats:
+        op.bulk_insert(
+            sa.table('user_note_stats',
+                sa.column('owner_id', sa.Integer()),
+                sa.column('note_count', sa.Integer()),
+                sa.column('archived_count', sa.Integer()),
+                sa.column('content_bytes', sa.BigInteger()),
+                sa.column('last_modified', sa.DateTime()),
+            ),
+            [{'owner_id': owner_id, **entry} for owner_id, entry in stats.items()],
+        )
+
+
+def downgrade() -> None:
+    op.drop_table('user_note_stats')
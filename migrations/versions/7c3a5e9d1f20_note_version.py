@@ -0,0 +1,78 @@
+"""Note version for optimistic locking
+
+Колонка version добавляется в notes и notes_archive. Если переход на
+секционирование (91b0c858941a) еще не завершен, колонка добавляется и во
+вторую таблицу пары, а функции синхронизации пересоздаются с ней:
+иначе cutover остановится на сверке колонок.
+
+Revision ID: 7c3a5e9d1f20
+Revises: 4e1f7c2b9a63
+Create Date: 2026-10-19 18:02:44.913507
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c3a5e9d1f20'
+down_revision: Union[str, None] = '4e1f7c2b9a63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = "id, title, content, preview, owner_id, created_at, updated_at"
+NEW_COLUMNS = "NEW.id, NEW.title, NEW.content, NEW.preview, NEW.owner_id, NEW.created_at, NEW.updated_at"
+
+# Функция синхронизации -> (таблица-копия, условие удаления старой строки)
+SYNC_FUNCTIONS = {
+    'notes_partition_sync': ('notes_partitioned', 'owner_id = OLD.owner_id AND id = OLD.id'),
+    'notes_unpartitioned_sync': ('notes_unpartitioned', 'id = OLD.id'),
+}
+
+
+def _has_table(name: str) -> bool:
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def _replace_sync_function(function: str, table: str, condition: str, columns: str, values: str) -> None:
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION {function}() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                DELETE FROM {table} WHERE {condition};
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO {table} ({columns}) VALUES ({values});
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+
+
+def upgrade() -> None:
+    op.add_column('notes', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    op.add_column('notes_archive', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    for function, (table, condition) in SYNC_FUNCTIONS.items():
+        if not _has_table(table):
+            continue
+        op.add_column(table, sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+        _replace_sync_function(function, table, condition, f"{COLUMNS}, version", f"{NEW_COLUMNS}, NEW.version")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        for function, (table, condition) in SYNC_FUNCTIONS.items():
+            if not _has_table(table):
+                continue
+            _replace_sync_function(function, table, condition, COLUMNS, NEW_COLUMNS)
+            op.drop_column(table, 'version')
+
+    op.drop_column('notes_archive', 'version')
+    op.drop_column('notes', 'version')
@@ -0,0 +1,56 @@
+"""Note preview and compressed content
+
+Revision ID: 879667061b3e
+Revises: 662abeab86f8
+Create Date: 2026-10-19 10:12:41.118203
+
+"""
+import zlib
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '879667061b3e'
+down_revision: Union[str, None] = '662abeab86f8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PREVIEW_LENGTH = 200
+
+
+def upgrade() -> None:
+    op.add_column('notes', sa.Column('preview', sa.String(length=PREVIEW_LENGTH), nullable=True))
+    op.execute(f"UPDATE notes SET preview = left(content, {PREVIEW_LENGTH})")
+    # Существующий текст хранится без сжатия: префикс 0x00 + UTF-8
+    op.alter_column(
+        'notes',
+        'content',
+        type_=sa.LargeBinary(),
+        existing_nullable=True,
+        postgresql_using="decode('00', 'hex') || convert_to(content, 'UTF8')",
+    )
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    # Сжатые значения (префикс 0x01) распаковываем на стороне Python
+    rows = conn.execute(
+        sa.text("SELECT id, content FROM notes WHERE get_byte(content, 0) = 1")
+    ).fetchall()
+    for note_id, content in rows:
+        conn.execute(
+            sa.text("UPDATE notes SET content = :content WHERE id = :id"),
+            {"content": b"\x00" + zlib.decompress(bytes(content)[1:]), "id": note_id},
+        )
+
+    op.alter_column(
+        'notes',
+        'content',
+        type_=sa.Text(),
+        existing_nullable=True,
+        postgresql_using="convert_from(substring(content from 2), 'UTF8')",
+    )
+    op.drop_column('notes', 'preview')
@@ -0,0 +1,104 @@
+"""Notes hash partitioning by owner_id
+
+Первый шаг онлайн-перехода на секционированную таблицу notes:
+создается notes_partitioned (PARTITION BY HASH (owner_id)) и триггер,
+который зеркалирует в нее все изменения notes. Дальше данные копируются
+пачками и выполняется переключение:
+
+    python -m app.tools.partition_notes backfill
+    python -m app.tools.partition_notes cutover
+
+Число секций задается при миграции: alembic -x partitions=32 upgrade head
+
+Revision ID: 91b0c858941a
+Revises: ce399bf70ade
+Create Date: 2026-10-19 14:25:07.481925
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '91b0c858941a'
+down_revision: Union[str, None] = 'ce399bf70ade'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+DEFAULT_PARTITIONS = 16
+COLUMNS = "id, title, content, preview, owner_id, created_at, updated_at"
+
+
+def upgrade() -> None:
+    # Индекс для списков заметок владельца (нужен и несекционированной таблице)
+    op.create_index('ix_notes_owner_id_created_at', 'notes', ['owner_id', 'created_at'], unique=False)
+
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    partitions = int(context.get_x_argument(as_dictionary=True).get('partitions', DEFAULT_PARTITIONS))
+
+    # Ключ секционирования обязан входить в первичный ключ; id берется
+    # из той же последовательности, что и в notes
+    op.execute("""
+        CREATE TABLE notes_partitioned (
+            id integer NOT NULL DEFAULT nextval('notes_id_seq'),
+            title varchar(255) NOT NULL,
+            content bytea,
+            preview varchar(200),
+            owner_id integer NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+            created_at timestamp without time zone NOT NULL,
+            updated_at timestamp without time zone NOT NULL,
+            CONSTRAINT notes_partitioned_pkey PRIMARY KEY (owner_id, id)
+        ) PARTITION BY HASH (owner_id)
+    """)
+    for remainder in range(partitions):
+        op.execute(
+            f"CREATE TABLE notes_partitioned_{remainder} PARTITION OF notes_partitioned "
+            f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})"
+        )
+    op.create_index('ix_notes_partitioned_owner_id_created_at', 'notes_partitioned', ['owner_id', 'created_at'], unique=False)
+    op.create_index('ix_notes_partitioned_updated_at', 'notes_partitioned', ['updated_at'], unique=False)
+
+    # До переключения каждое изменение notes повторяется в notes_partitioned
+    op.execute(f"""
+        CREATE FUNCTION notes_partition_sync() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                DELETE FROM notes_partitioned
+                WHERE owner_id = OLD.owner_id AND id = OLD.id;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO notes_partitioned ({COLUMNS})
+                VALUES (NEW.id, NEW.title, NEW.content, NEW.preview,
+                        NEW.owner_id, NEW.created_at, NEW.updated_at);
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER notes_partition_sync
+        AFTER INSERT OR UPDATE OR DELETE ON notes
+        FOR EACH ROW EXECUTE FUNCTION notes_partition_sync()
+    """)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        partitioned = op.get_bind().execute(sa.text(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'notes'::regclass"
+        )).first()
+        if partitioned:
+            raise RuntimeError(
+                'notes is already partitioned; run '
+                '"python -m app.tools.partition_notes rollback" first'
+            )
+
+        op.execute("DROP TRIGGER IF EXISTS notes_partition_sync ON notes")
+        op.execute("DROP FUNCTION IF EXISTS notes_partition_sync()")
+        op.execute("DROP TABLE IF EXISTS notes_partitioned")
+
+    op.drop_index('ix_notes_owner_id_created_at', table_name='notes')
@@ -0,0 +1,42 @@
+"""Note tags and per-owner tag counts
+
+Revision ID: b6dbf2a92856
+Revises: d0f12c94c398
+Create Date: 2026-10-19 16:12:08.402517
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6dbf2a92856'
+down_revision: Union[str, None] = 'd0f12c94c398'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('note_tags',
+    sa.Column('owner_id', sa.Integer(), nullable=False),
+    sa.Column('tag', sa.String(length=64), nullable=False),
+    sa.Column('note_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.ForeignKeyConstraint(['owner_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('owner_id', 'tag', 'note_id')
+    )
+    op.create_index('ix_note_tags_owner_id_note_id', 'note_tags', ['owner_id', 'note_id'], unique=False)
+    op.create_table('tag_counts',
+    sa.Column('owner_id', sa.Integer(), nullable=False),
+    sa.Column('tag', sa.String(length=64), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['owner_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('owner_id', 'tag')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('tag_counts')
+    op.drop_index('ix_note_tags_owner_id_note_id', table_name='note_tags')
+    op.drop_table('note_tags')
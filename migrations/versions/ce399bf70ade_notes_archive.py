@@ -0,0 +1,42 @@
+"""Notes archive table
+
+Revision ID: ce399bf70ade
+Revises: a7e0e45e8f81
+Create Date: 2026-10-19 13:41:52.660184
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'ce399bf70ade'
+down_revision: Union[str, None] = 'a7e0e45e8f81'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('notes_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('title', sa.String(length=255), nullable=False),
+    sa.Column('content', sa.LargeBinary(), nullable=True),
+    sa.Column('preview', sa.String(length=200), nullable=True),
+    sa.Column('owner_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['owner_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_notes_archive_owner_id_created_at', 'notes_archive', ['owner_id', 'created_at'], unique=False)
+    # Архиватор выбирает заметки по updated_at
+    op.create_index(op.f('ix_notes_updated_at'), 'notes', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_notes_updated_at'), table_name='notes')
+    op.drop_index('ix_notes_archive_owner_id_created_at', table_name='notes_archive')
+    op.drop_table('notes_archive')
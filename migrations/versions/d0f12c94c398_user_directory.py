@@ -0,0 +1,44 @@
+"""User directory for sharding
+
+Revision ID: d0f12c94c398
+Revises: 91b0c858941a
+Create Date: 2026-10-19 15:02:36.914210
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd0f12c94c398'
+down_revision: Union[str, None] = '91b0c858941a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('user_directory',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('email', sa.String(length=255), nullable=False),
+    sa.Column('shard', sa.String(length=64), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_user_directory_email'), 'user_directory', ['email'], unique=True)
+    # Существующие пользователи остаются в основной БД (шард default)
+    op.execute(
+        "INSERT INTO user_directory (id, email, shard, created_at) "
+        "SELECT id, email, 'default', created_at FROM users"
+    )
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(
+            "SELECT setval(pg_get_serial_sequence('user_directory', 'id'), "
+            "coalesce(max(id), 0) + 1, false) FROM user_directory"
+        )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_user_directory_email'), table_name='user_directory')
+    op.drop_table('user_directory')
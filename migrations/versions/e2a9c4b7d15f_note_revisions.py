@@ -0,0 +1,37 @@
+"""Note revision history
+
+Revision ID: e2a9c4b7d15f
+Revises: 7c3a5e9d1f20
+Create Date: 2026-10-19 19:24:51.208614
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2a9c4b7d15f'
+down_revision: Union[str, None] = '7c3a5e9d1f20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('note_revisions',
+    sa.Column('owner_id', sa.Integer(), nullable=False),
+    sa.Column('note_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('version', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('title', sa.String(length=255), nullable=False),
+    sa.Column('kind', sa.String(length=8), nullable=False),
+    sa.Column('data', sa.LargeBinary(), nullable=True),
+    sa.Column('depth', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['owner_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('owner_id', 'note_id', 'version')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('note_revisions')
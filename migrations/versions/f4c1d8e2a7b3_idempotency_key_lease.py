@@ -0,0 +1,32 @@
+"""Idempotency key lease
+
+Ключ без ответа после сбоя процесса перехватывается повтором по
+истечении аренды locked_until. Существующие незавершенные ключи
+получают уже истекшую аренду (created_at).
+
+Revision ID: f4c1d8e2a7b3
+Revises: e2a9c4b7d15f
+Create Date: 2026-10-19 21:14:52.604118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4c1d8e2a7b3'
+down_revision: Union[str, None] = 'e2a9c4b7d15f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('idempotency_keys', sa.Column('locked_until', sa.DateTime(), nullable=True))
+    op.execute("UPDATE idempotency_keys SET locked_until = created_at")
+    op.alter_column('idempotency_keys', 'locked_until', existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade() -> None:
+    op.drop_column('idempotency_keys', 'locked_until')